@@ -13,6 +13,9 @@ from datetime import datetime
 
 
 BACKEND_BASE_URL = os.getenv("BACKEND_BASE_URL", "http://127.0.0.1:5000")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "3"))
+JOB_WAIT_TIMEOUT = int(os.getenv("JOB_WAIT_TIMEOUT", "600"))
+SUBMIT_INTERVAL_MS = int(os.getenv("SUBMIT_INTERVAL_MS", "200"))
 BIT_BROWSER_ID = os.getenv("BIT_BROWSER_ID", "6b130d1cdcb3485897b9ca81aefb1a66")
 MAX_VIDEOS = int(os.getenv("MAX_VIDEOS", "200"))
 RECENT_DAYS = int(os.getenv("RECENT_DAYS", "3"))
@@ -240,11 +243,28 @@ def append_failed_url(path: str, url: str, reason: str | None = None) -> None:
         else:
             f.write(url + "\n")
 
-def upload_to_backend(video_url: str) -> dict:
+def wait_for_job(job_id: str, timeout: int = JOB_WAIT_TIMEOUT) -> dict:
+    """轮询后端任务状态，直到成功/失败或超时"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = requests.get(f"{BACKEND_BASE_URL}/jobs/{job_id}", timeout=30)
+        data = resp.json()
+        if not resp.ok:
+            return {"ok": False, "status": resp.status_code, "data": data}
+        job = data.get("job") or {}
+        if job.get("status") == "succeeded":
+            return {"ok": True, "job_id": job_id, **(job.get("result") or {})}
+        if job.get("status") == "failed":
+            return {"ok": False, "job_id": job_id, "error": job.get("error"), "data": job.get("result")}
+        time.sleep(JOB_POLL_INTERVAL)
+    return {"ok": False, "job_id": job_id, "error": f"等待任务超时（{timeout}s）"}
+
+def submit_to_backend(video_url: str) -> dict:
+    """提交上传任务；返回 202 时包含 job_id，随后用 wait_for_job 等待结果"""
     try:
         resp = requests.post(
             f"{BACKEND_BASE_URL}/feishu/upload_record",
-            json={"page_url": video_url, "channel" :"bit_playwright"}, timeout=300,
+            json={"page_url": video_url, "channel" :"bit_playwright"}, timeout=60,
             headers={"Content-Type": "application/json"}
         )
         data = resp.json()
@@ -391,13 +411,20 @@ async def run(keyword: str):
             if uploaded_seen or failed_seen:
                 print(f"已存在 {len(uploaded_seen)} 条历史成功记录、{len(failed_seen)} 条失败记录，本次待上传 {len(urls_to_upload)} 条")
 
-            # 按 2 秒频率上传，并在成功后立刻将链接写入 uploaded_urls.txt
-            # 同时收集失败的链接（含服务器端错误）
+            # 先全部提交到后端任务队列（后端并发处理，记录批量写入飞书），再逐个等待结果；
+            # 成功后立刻将链接写入 uploaded_urls.txt，同时收集失败的链接（含服务器端错误）
+            submitted = []
+            for url in urls_to_upload:
+                submitted.append((url, submit_to_backend(url)))
+                await page.wait_for_timeout(SUBMIT_INTERVAL_MS)
+
             results = []
             failed = []
-            for idx, url in enumerate(urls_to_upload, start=1):
+            for idx, (url, submit_resp) in enumerate(submitted, start=1):
                 try:
-                    resp = upload_to_backend(url)
+                    resp = submit_resp
+                    if submit_resp.get("ok") and submit_resp.get("job_id"):
+                        resp = await asyncio.to_thread(wait_for_job, submit_resp["job_id"])
                     record = {"url": url, **resp}
                     results.append(record)
                     if not resp.get("ok", True):
@@ -419,7 +446,6 @@ async def run(keyword: str):
                     results.append({"url": url, "ok": False, "error": str(e)})
                     append_failed_url(os.path.join(os.path.dirname(UPLOADED_URLS_FILE), "failed_urls.txt"), url, reason=str(e))
                     print(f"[{idx}/{len(urls_to_upload)}] 上传异常 {url}: {e}")
-                await page.wait_for_timeout(2000)
 
             return {"urls": urls_unsorted, "ids": all_ids, "upload": {"results": results, "failed": failed}}
         finally:
@@ -1,12 +1,13 @@
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import hmac
 import json
 import logging
 import os
-import re
 import sys
+import time
 import traceback
-from typing import Any, Dict, Optional
-from urllib.parse import parse_qs, urlparse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
 
 current_dir = os.path.dirname(__file__)
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
@@ -22,24 +23,33 @@ for xhs_path in possible_xhs_paths:
     if os.path.isdir(xhs_path) and xhs_path not in sys.path:
         sys.path.insert(0, xhs_path)
 
-from product_mapping_service import load_product_mapping, map_product_name, extract_product_info
-
 from dotenv import load_dotenv
-from f2.apps.douyin.crawler import DouyinCrawler, PostDetail
-from f2.apps.douyin.db import AsyncUserDB
-from f2.apps.douyin.dl import DouyinDownloader
-from f2.apps.douyin.handler import DouyinHandler
-from f2.apps.douyin.utils import AwemeIdFetcher
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import requests
 
+import feishu_index
 import feishu_table as feishu
+import product_mapping_service
+import singleflight
+from async_runtime import run_async
+from douyin_handlers import (
+    DEFAULT_TRANSFER_MODE,
+    TRANSFER_MODE_STREAM,
+    TRANSFER_MODES,
+    create_video_record_async,
+    download_with_f2,
+    extract_video_id_from_url,
+    fetch_aweme_detail,
+    stream_video_to_feishu,
+    upload_video_file,
+)
+from job_queue import JobError, JobManager, chain
 from xhs_downloader.source import Settings, XHS
-from xhs_provider import get_xhs_apis_class
-from xhs_url_parser import normalize_xhs_url, extract_note_info_from_url
+from xhs_downloader.source.module import HostLimiter
+import xhs_provider
+from xhs_url_parser import normalize_xhs_url, extract_note_info_from_url, extract_note_urls
 from xhs_downloader_util import download_note as download_xhs_note
-from xhs_handlers import parse_note_api_mode, parse_note_web_mode, upload_note_to_feishu
+from xhs_handlers import NoteUploadPipeline, parse_note_api_mode, parse_note_web_mode, upload_note_to_feishu
 
 
 load_dotenv()
@@ -54,318 +64,542 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(mess
 XHS_COOKIE = os.getenv("XHS_COOKIE", "gid=yYd2DyDqyWi2yYd2DyDJi4fDJYDluSUTYMUqhy9l7ShU6T28S4Wuvx888qWYKqY88yi0WiDq; a1=197ce1290423idqzjsg7hsrcugu3a13wd08m7yb0q50000412668; webId=f3a1a25308658bd5b4aae8b43c32c877; customerClientId=450717816262315; x-user-id-chengfeng.xiaohongshu.com=67f0badd000000000e01e3aa; abRequestId=f3a1a25308658bd5b4aae8b43c32c877; x-user-id-pgy.xiaohongshu.com=67f0badd000000000e01e3aa; x-user-id-creator.xiaohongshu.com=637f22ae000000001f016b78; x-user-id-fuwu.xiaohongshu.com=67f0badd000000000e01e3aa; x-user-id-school.xiaohongshu.com=67f0badd000000000e01e3aa; x-user-id-ark.xiaohongshu.com=67f0badd000000000e01e3aa; access-token-ark.xiaohongshu.com=customer.ark.AT-68c517562392902439419904z7kwckuxb7t1mdgk; customer-sso-sid=68c517570751913819783169q4h64286mumotqdn; access-token-chengfeng.xiaohongshu.com=customer.ad_wind.AT-68c517570751913819799553r1o9fqeirdrgflh2; solar.beaker.session.id=AT-68c517571272176093167616dsdsuftdnydvncj6; access-token-pgy.xiaohongshu.com=customer.pgy.AT-68c517571272176093167616dsdsuftdnydvncj6; access-token-pgy.beta.xiaohongshu.com=customer.pgy.AT-68c517571272176093167616dsdsuftdnydvncj6; web_session=040069b20b61e62f3b2e7ab3233b4b6b387f9e; webBuild=4.85.1; xsecappid=xhs-pc-web; websectiga=9730ffafd96f2d09dc024760e253af6ab1feb0002827740b95a255ddf6847fc8; sec_poison_id=787efd0f-bccc-4684-b5f3-0229ede63d75; acw_tc=0a0bb06417631201434704128e73dd25e46b426462e25c369ded6cc9398049; loadts=1763120264511; unread={%22ub%22:%22691129950000000003013bc9%22%2C%22ue%22:%226915fa47000000001b0334e3%22%2C%22uc%22:11}")
 XHS_MODE = os.getenv("XHS_MODE", "api").lower()
 # XHS_MODE = os.getenv("XHS_MODE", "web").lower()
-
-def upload_video_to_feishu(aweme_data: Dict[str, Any], channel: str = "") -> Dict[str, Any]:
-    video_path = aweme_data["video_path"]
-    ct_raw = aweme_data.get("create_time")
-    try:
-        ct_sec = int(ct_raw)
-        ct_str = datetime.fromtimestamp(ct_sec).strftime("%Y年%m月%d日%H_%M_%S")
-    except Exception:
-        try:
-            dt = datetime.fromisoformat(str(ct_raw).replace("Z", "+00:00"))
-        except Exception:
-            dt = None
-        ct_str = dt.strftime("%Y年%m月%d日%H_%M_%S") if dt else str(ct_raw)
-
-    filename = f"{ct_str}_{aweme_data['author']['nickname']}_{aweme_data['aweme_id']}.mp4"
-    upload_result = feishu.upload_file_to_bitable(
-        file_path=video_path,
-        file_name=filename,
-        parent_node=feishu.APP_TOKEN,
-        parent_type="bitable_file",
-    )
+# 下载→上传流水线：文件下载完成即开始上传到飞书（XHS_PIPELINE=0 关闭，改为先全部下载再上传）
+XHS_PIPELINE = os.getenv("XHS_PIPELINE", "1") != "0"
+# 批量解析：默认并发、并发上限、单次最多链接数、短链接解析线程数
+XHS_BULK_CONCURRENCY = int(os.getenv("XHS_BULK_CONCURRENCY", "3"))
+XHS_BULK_MAX_CONCURRENCY = int(os.getenv("XHS_BULK_MAX_CONCURRENCY", "8"))
+XHS_BULK_MAX_URLS = int(os.getenv("XHS_BULK_MAX_URLS", "200"))
+XHS_BULK_RESOLVE_WORKERS = 8
+
+DOUYIN_UPLOAD_JOB = "douyin_upload"
+# 管理接口（写入 / 重载商品映射）的访问令牌，请求头 X-Admin-Token 需与之一致；未配置时管理接口一律拒绝
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def _douyin_download_stage(job, context: Dict[str, Any]) -> None:
+    """任务阶段1：disk 模式通过 f2 下载视频到 DOWNLOAD_DIR；stream 模式只获取作品详情"""
+    if job.payload.get("mode") == TRANSFER_MODE_STREAM:
+        context["aweme_data"] = run_async(fetch_aweme_detail(job.payload["video_id"], DOWNLOAD_DIR))
+    else:
+        context["aweme_data"] = run_async(download_with_f2(job.payload["video_id"], DOWNLOAD_DIR))
+
+
+def _douyin_upload_stage(job, context: Dict[str, Any]) -> None:
+    """任务阶段2：上传视频到飞书素材库（stream 模式直接从 CDN 流式上传，无法流式时回退为落盘）"""
+    def report(progress: Dict[str, Any]) -> None:
+        job.update_progress(upload=progress)
+
+    upload_result = None
+    if job.payload.get("mode") == TRANSFER_MODE_STREAM:
+        upload_result = stream_video_to_feishu(context["aweme_data"], progress_callback=report)
+        if upload_result is None:
+            context["aweme_data"] = run_async(download_with_f2(job.payload["video_id"], DOWNLOAD_DIR))
+    if upload_result is None:
+        upload_result = upload_video_file(context["aweme_data"], progress_callback=report)
     if not upload_result.get("success"):
-        return upload_result
-
-    file_token = upload_result.get("file_token")
-    if not file_token:
-        return {"success": False, "message": "上传成功但未获取到 file_token"}
-
-    access_token = upload_result.get("access_token") or feishu.get_tenant_access_token()
+        raise JobError(upload_result.get("message", "视频上传失败"), upload_result)
+    context["upload_result"] = upload_result
 
-    product_mapping = load_product_mapping()
-    product_name = extract_product_info(aweme_data)
-    mapped_product_name = map_product_name(product_name, product_mapping)
 
-    if channel and channel == "bit_playwright":
-        if not product_name:
-            return {"success": False, "message": "飞书表格记录创建失败，产品名称IS NONE"}
+def _douyin_record_stage(job, context: Dict[str, Any]) -> Future:
+    """任务阶段3：创建飞书多维表记录（经批量写入合并发送，等待结果期间不占用记录线程）"""
+    def finish(result: Dict[str, Any]) -> None:
+        if not result.get("success"):
+            raise JobError(result.get("message", "飞书表格记录创建失败"), result)
+        context["result"] = result
 
-        find = False       
-        for keyword, mapped_value in product_mapping.items():
-            if keyword in product_name:
-                find = True
-                break
+    pending = create_video_record_async(context["aweme_data"], context["upload_result"], job.payload.get("channel") or "")
+    return chain(pending, finish)
 
-        if not find:     
-            print(f"product_name: {product_name}")
-            return {"success": False, "message": "飞书表格记录创建失败，未找到对应的产品名称 "+ product_name}
 
-    title = aweme_data.get("desc") or ""
+job_manager = JobManager(future_timeout=feishu.BATCH_RESULT_TIMEOUT)
+job_manager.register(
+    DOUYIN_UPLOAD_JOB,
+    [
+        ("download", _douyin_download_stage),
+        ("upload", _douyin_upload_stage),
+        ("record", _douyin_record_stage),
+    ],
+)
 
-    record_fields = {
-        feishu.FIELD_REMARK: '速发',
-        feishu.FIELD_TITLE: title,
-        feishu.FIELD_PRODUCT_NAME: mapped_product_name,
-        feishu.FIELD_VIDEO_ID: aweme_data.get("aweme_id") or "",
-        feishu.FIELD_ATTACHMENT: [
-            {
-                "file_token": file_token,
-                "name": filename,
-                "type": "file",
-            }
-        ],
-    }
 
-    if mapped_product_name and mapped_product_name != product_name:
-        record_fields["品"] = mapped_product_name
+# 飞书查重本地索引：启动后在后台完成引导并定期对账（FEISHU_INDEX_SYNC=0 关闭）
+if os.getenv("FEISHU_INDEX_SYNC", "1") != "0":
+    feishu_index.start_sync()
 
-    record_success = feishu.create_douyin_record(record_fields, access_token=access_token)
-    if not record_success:
-        return {"success": False, "message": "飞书表格记录创建失败"}
-
-    return {
-        "success": True,
-        "file_token": file_token,
-        "message": "飞书表格记录创建成功",
-        "aweme_id": aweme_data["aweme_id"],
-    }
-def extract_video_id_from_url(page_url: str) -> str | None:
-    """支持两种格式：
-    1) https://www.douyin.com/video/{id}
-    2) https://www.douyin.com/user/...?...&modal_id={id}
-    返回提取到的 video_id 或 None。
-    """
+# Spider_XHS 预热：启动时导入 XHS_Apis（含签名 JS）并创建实例池（XHS_WARMUP=0 关闭，改为首次请求时初始化）
+if XHS_MODE == "api" and os.getenv("XHS_WARMUP", "1") != "0":
     try:
-        if not page_url:
-            return None
-        # 优先匹配 /video/{id}
-        m = re.search(r"/video/(\d+)", page_url)
-        if m:
-            return m.group(1)
-        # 再从查询参数 modal_id 抓取
-        parsed = urlparse(page_url)
-        qs = parse_qs(parsed.query or "")
-        modal_id = qs.get("modal_id")
-        if modal_id and len(modal_id) > 0 and modal_id[0].isdigit():
-            return modal_id[0]
-        return None
-    except Exception:
-        return None
-
-async  def download_with_f2(video_id: str):
-    kwargs = {
-        "headers": {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0",
-            "Referer": "https://www.douyin.com/",
-        },
-        "proxies": {"http://": None, "https://": None},
-        "cookie": "bd_ticket_guard_client_web_domain=2; live_use_vvc=%22false%22; store-region=cn-hb; store-region-src=uid; hevc_supported=true; SelfTabRedDotControl=%5B%5D; xgplayer_user_id=73509612205; xgplayer_device_id=97526515781; n_mh=9-mIeuD4wZnlYrrOvfzG3MuT6aQmCUtmr8FxV8Kl8xY; __live_version__=%221.1.3.519%22; SearchMultiColumnLandingAbVer=1; SEARCH_RESULT_LIST_TYPE=%22multi%22; theme=%22light%22; enter_pc_once=1; is_staff_user=false; d_ticket=37143149636914e9578d19de548f6905cfb72; passport_assist_user=Cj8Ts8FVwRqJr1v98EWtLj_Gy9RxQdvd1QBRP_ljzu_gvNNnalyA8fR3UDv2RDRmZn3EUOdysavh9ERIDpMUChEaSgo8AAAAAAAAAAAAAE891LiUK62M1U20pNLuK_iec-5n14zYMF6qyhMBeH5-pmBooHTxvvZIiPxkQ0kYdT9CEN7y9g0Yia_WVCABIgEDEPxTnQ%3D%3D; uid_tt=6feaf6442a589053a8fd82c49b31d519; uid_tt_ss=6feaf6442a589053a8fd82c49b31d519; sid_tt=8d310cc387442877d3aa4076790d75d4; sessionid_ss=8d310cc387442877d3aa4076790d75d4; login_time=1752669402602; __druidClientInfo=JTdCJTIyY2xpZW50V2lkdGglMjIlM0EyOTglMkMlMjJjbGllbnRIZWlnaHQlMjIlM0E0NDclMkMlMjJ3aWR0aCUyMiUzQTI5OCUyQyUyMmhlaWdodCUyMiUzQTQ0NyUyQyUyMmRldmljZVBpeGVsUmF0aW8lMjIlM0EyLjM5MjUwMDE2MjEyNDYzNCUyQyUyMnVzZXJBZ2VudCUyMiUzQSUyMk1vemlsbGElMkY1LjAlMjAoV2luZG93cyUyME5UJTIwMTAuMCUzQiUyMFdpbjY0JTNCJTIweDY0KSUyMEFwcGxlV2ViS2l0JTJGNTM3LjM2JTIwKEtIVE1MJTJDJTIwbGlrZSUyMEdlY2tvKSUyMENocm9tZSUyRjEzNi4wLjAuMCUyMFNhZmFyaSUyRjUzNy4zNiUyMiU3RA==; UIFID_TEMP=28ea90c1b0cf804752225259882c701fb12323f08ef828fc1032b615e29efbbe284c71b6b91371623513ffcf74f19a3685d9b5481ee218c0226c15853a3987f771501a4cd016d2934472916e0fe218aa; fpk1=U2FsdGVkX1/Nox6hMzmakvRdvL55xEuVxx0/Qgy2zFFtXA3ogvorvBlxwwK2eahHRoI8eYBFqj0rx3y2SWAYDw==; fpk2=0e0369e2813db7deb26e5937c353aab4; UIFID=28ea90c1b0cf804752225259882c701fb12323f08ef828fc1032b615e29efbbe35cc4916a88c9a1d2c4f38e526102eecaba3629149dc23be141a59b83c16f86f2e9e5c5c1923c027773de62a4dee2b618f6cf724c95615849c9dc3636d2f2ef1a13956440290f0ca734787dbd691848f5ac1c981de663d8f0cd05af54b924e53b07a44b6e05a5d7aaa565ae8875085625b75a1c5cb83670d36e1b43d7271b5b0; __security_mc_1_s_sdk_crypt_sdk=9c09da64-4128-a242; __security_mc_1_s_sdk_cert_key=a882b0fc-4b8d-8390; passport_csrf_token=92674daafb36b50004014d008e155001; passport_csrf_token_default=92674daafb36b50004014d008e155001; s_v_web_id=verify_mfweipo0_kNeXCV5e_PNz1_4KhU_B6fn_KVYujburyP1Z; __security_mc_1_s_sdk_sign_data_key_web_protect=531caaa7-460e-baf7; is_dash_user=1; sid_guard=8d310cc387442877d3aa4076790d75d4%7C1760694863%7C5184000%7CTue%2C+16-Dec-2025+09%3A54%3A23+GMT; sessionid=8d310cc387442877d3aa4076790d75d4; sid_ucp_v1=1.0.0-KGFmMjJjNGEwOGUzMzEzNmFjNzAyZDViYWQzOGQ4MTA3YTRjNWU0NGUKIAjj1JCqhM0GEM-kyMcGGO8xIAwwwKmRrAY4B0D0B0gEGgJobCIgOGQzMTBjYzM4NzQ0Mjg3N2QzYWE0MDc2NzkwZDc1ZDQ; ssid_ucp_v1=1.0.0-KGFmMjJjNGEwOGUzMzEzNmFjNzAyZDViYWQzOGQ4MTA3YTRjNWU0NGUKIAjj1JCqhM0GEM-kyMcGGO8xIAwwwKmRrAY4B0D0B0gEGgJobCIgOGQzMTBjYzM4NzQ0Mjg3N2QzYWE0MDc2NzkwZDc1ZDQ; publish_badge_show_info=%220%2C0%2C0%2C1760946606136%22; download_guide=%223%2F20251020%2F0%22; session_tlb_tag=sttt%7C13%7CjTEMw4dEKHfTqkB2eQ111P_________AFMFsDkfR2RWWZu4UOI714T_KV-nrHbwCQ5EoI_22oZE%3D; playRecommendGuideTagCount=13; totalRecommendGuideTagCount=13; dy_swidth=1325; dy_sheight=745; stream_recommend_feed_params=%22%7B%5C%22cookie_enabled%5C%22%3Atrue%2C%5C%22screen_width%5C%22%3A1325%2C%5C%22screen_height%5C%22%3A745%2C%5C%22browser_online%5C%22%3Atrue%2C%5C%22cpu_core_num%5C%22%3A24%2C%5C%22device_memory%5C%22%3A8%2C%5C%22downlink%5C%22%3A10%2C%5C%22effective_type%5C%22%3A%5C%224g%5C%22%2C%5C%22round_trip_time%5C%22%3A50%7D%22; volume_info=%7B%22isUserMute%22%3Afalse%2C%22isMute%22%3Atrue%2C%22volume%22%3A0.976%7D; WallpaperGuide=%7B%22showTime%22%3A1760947412272%2C%22closeTime%22%3A0%2C%22showCount%22%3A3%2C%22cursor1%22%3A86%2C%22cursor2%22%3A28%7D; __ac_nonce=068f90467006fa53e1dde; __ac_signature=_02B4Z6wo00f01Ef3sJAAAIDAybrGpBc2NsxH17QAAHkMa1; strategyABtestKey=%221761150057.502%22; ttwid=1%7CeG1xfsoe_CWPEpcGmmRqV6VGOr2TwQnfHP5012UIHGg%7C1761150056%7C89a27cc0424490a1a4d906dc673af79c17b655cf2506d07c9c2190a9a94317d5; sdk_source_info=7e276470716a68645a606960273f276364697660272927676c715a6d6069756077273f276364697660272927666d776a68605a607d71606b766c6a6b5a7666776c7571273f275e5927666d776a686028607d71606b766c6a6b3f2a2a646063606d616d61666c6c606a66646e636a677564646a696d6c756e667562662a666a6b71606b715a7666776c7571762a666a757c2b6f765927295927666d776a686028607d71606b766c6a6b3f2a2a61676f67606875696f6d66686d69637563646664696a686a6b6f756469756e6a2a7666776c7571762a6c6b76756066716a772b6f76592758272927666a6b766a69605a696c6061273f27636469766027292762696a6764695a7364776c6467696076273f275e582729277672715a646971273f2763646976602729277f6b5a666475273f2763646976602729276d6a6e5a6b6a716c273f2763646976602729276c6b6f5a7f6367273f27636469766027292771273f273d363436333535303434333234272927676c715a75776a716a666a69273f2763646976602778; bit_env=KyGujVy1BHnPGXHbUj1rhYqAvMzTMs0IlZUWX8883LhiJm4VEripCHKWh8PXo1Rg69ofjFdXXX5ZZdHKPIauf8DT3CiP31pUQ-4DuzsawZQ6pPC_xnA4VPyqgLSyn8AECnOi3jfyf8pbVkMeGxmGAMNY2okCUNyoRlvQh2u1VnfG42GdLVSm4yLnm2BFLaxn5Z-IPQgd8AVdmjQ0hkVRNnncsXgOeYNAmwNYzSi_6lUba5PQrqGiityhxxRtziKuXJLqKwDTejbYLJ0kTLkL966FXvc5ylyyh5ZNt86BpxHqDbaytTdOUEQ0e17e3ub7h43LBBRHGUZHOZClrJ-m6z-TcVm728bmkD52fK1IzCd2ktLppOvgFdH_73nomfkFTN153ajby92eME5NubQjp-dUzUkZjs-29IFBjTobCBV0Z480Pll_JJJ8VinErc8WJSkpTmYazUMiu8c9TNe86cgoUF8QfvDJvyK-lFIIVHFKl1qMPGSA16M0qnYy1tzp; gulu_source_res=eyJwX2luIjoiYmM5OWY5NGU3MmYzZDQ4ZDRiMWU2Mzc1MzQ3MzY4YTYwNzI5OTJmZWE2ZDJhMDFiZDE3ZWVmZjAzMTk3ZDk3NyJ9; passport_auth_mix_state=cvovi23y6uge1gxyl18oxsz13c0m2dcp; odin_tt=b9efcd00b3cf615069a082bcd3307278e4be61d61e089b9f811acaa975b54481fd23937ec9628b1740e60460a2cee11a8f857dee614a3c03a45dca2b8c210162; biz_trace_id=af6fa95c; IsDouyinActive=true; FOLLOW_LIVE_POINT_INFO=%22MS4wLjABAAAAk33rRYtXKgtE1sOVuGF19VouIP6KwRZw49L6iJntY7E%2F1761235200000%2F0%2F0%2F1761150881480%22; FOLLOW_NUMBER_YELLOW_POINT_INFO=%22MS4wLjABAAAAk33rRYtXKgtE1sOVuGF19VouIP6KwRZw49L6iJntY7E%2F1761235200000%2F0%2F1761150281480%2F0%22; home_can_add_dy_2_desktop=%221%22; bd_ticket_guard_client_data=eyJiZC10aWNrZXQtZ3VhcmQtdmVyc2lvbiI6MiwiYmQtdGlja2V0LWd1YXJkLWl0ZXJhdGlvbi12ZXJzaW9uIjoxLCJiZC10aWNrZXQtZ3VhcmQtcmVlLXB1YmxpYy1rZXkiOiJCQytIbWhFbklkQitDU1dmQlVoQTNKRnVlOHFNcFJ4Q1ZlV1MrZEVyQ2xZNVFGdC9odnZqa0RUM1B5MEQwMGswOGpuaUR1UnJFaVp4eklnMkF6WXdFckE9IiwiYmQtdGlja2V0LWd1YXJkLXdlYi12ZXJzaW9uIjoyfQ%3D%3D; bd_ticket_guard_client_data_v2=eyJyZWVfcHVibGljX2tleSI6IkJDK0htaEVuSWRCK0NTV2ZCVWhBM0pGdWU4cU1wUnhDVmVXUytkRXJDbFk1UUZ0L2h2dmprRFQzUHkwRDAwazA4am5pRHVSckVpWnh6SWcyQXpZd0VyQT0iLCJ0c19zaWduIjoidHMuMi4wOGJkMDhiNGEzMTllMWI2YjkxMGEyOWUyMWZmYzc0NWRjMjkyN2ZmN2I0MDg2YWI5ZWZiZGNmMzdhMGU5Zjg4YzRmYmU4N2QyMzE5Y2YwNTMxODYyNGNlZGExNDkxMWNhNDA2ZGVkYmViZWRkYjJlMzBmY2U4ZDRmYTAyNTc1ZCIsInJlcV9jb250ZW50Ijoic2VjX3RzIiwicmVxX3NpZ24iOiJvdTVHSjRJa3N3dTE5TW45TDNTcjlwQWRSdW8vdStkdnBHeWh2VVhrbWs4PSIsInNlY190cyI6IiNSM0lUQzMxWUF6NVBnYnhqeVJFdXA5SmYyRC91UURaZHRUMWFpVzlQM01OMlgyeVZsb0xrRjhsMERuQjIifQ%3D%3D",
-        "url": f"https://www.douyin.com/{video_id}",
-        'video': True,  # 下载视频
-        'music': False,  # 不下载音乐
-        'cover': False,  # 不下载封面
-        'desc': False,  # 不下载文案
-        'folderize': False,  # 不创建子文件夹
-        'interval': 'all',  # 下载所有
-        'path': DOWNLOAD_DIR,
-        'naming':"{aweme_id}_{create}",
-        'timeout': 30,  # 设置超时时间
-    }
+        xhs_provider.warm_up()
+    except Exception as e:
+        logging.warning("XHS_Apis 预热失败，将在首次请求时重试: %s", e)
 
-    async with DouyinCrawler(kwargs) as crawler:
-        params = PostDetail(aweme_id=video_id)
-        post_detail = await crawler.fetch_post_detail(params)
-    aweme_data = post_detail['aweme_detail']
-    
-
-    # aweme_data = await DouyinHandler(kwargs).fetch_one_video(aweme_id=video_id)
-    user_path = DOWNLOAD_DIR
-    downloader = DouyinDownloader(kwargs)
-
-    aweme_datas = []
-    dl_aweme_data = {
-                    'aweme_id': aweme_data['aweme_id'],
-                    'desc': aweme_data['desc'],
-                    'create_time': aweme_data['create_time'],
-                    'sec_user_id': aweme_data['author']['sec_uid'],
-                    'video_play_addr': aweme_data['video']['play_addr']['url_list'][0],
-                    'is_prohibited': False,
-                    'private_status': 0,
-                    'aweme_type': 0,  # 视频类型,
-                    'nickname': aweme_data['author']['nickname']
-    }
-    aweme_datas.append(dl_aweme_data)
-    await downloader.create_download_tasks(kwargs=kwargs, aweme_datas=aweme_datas, user_path=user_path)
+# 商品映射配置：后台线程监视文件变化并热更新（PRODUCT_MAPPING_WATCH=0 关闭，回退为请求时按间隔检查）
+if os.getenv("PRODUCT_MAPPING_WATCH", "1") != "0":
+    product_mapping_service.reload_product_mapping()
+    product_mapping_service.start_watcher()
 
-    video_path = os.path.join(user_path, f"{aweme_data['aweme_id']}_{aweme_data['create_time']}_video.mp4")
-    if not video_path or not os.path.isfile(video_path):
-        logging.error("视频未找到或未成功下载: %s", video_path)
-        raise FileNotFoundError(f"视频未找到: {video_path}")
-        
-    aweme_data["video_path"] = video_path
 
-    return aweme_data
+def submit_douyin_upload(j: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    抖音视频上传（异步）
 
+    校验链接并查重后立即返回 202 和任务ID，下载/上传/建记录在后台任务队列中执行，
+    通过 GET /jobs/<job_id> 轮询进度与结果。
 
-@app.route("/feishu/upload_record", methods=["POST"])
-def upload_record():
+    参数：page_url（必填）、channel、mode（disk/stream，默认取 DOUYIN_TRANSFER_MODE）
+    """
     #  检查链接
-    j = request.get_json(force=True, silent=True) or {}
     page_url = j.get("page_url")
     channel = j.get("channel")
     if channel:
         logging.info("upload_record channel=%s", channel)
+    # 传输模式：disk（默认，保留本地副本）或 stream（CDN 直传飞书，不落盘）
+    mode = (j.get("mode") or DEFAULT_TRANSFER_MODE).lower()
+    if mode not in TRANSFER_MODES:
+        return {"ok": False, "error": f"mode 只支持 {', '.join(TRANSFER_MODES)}"}, 400
 
     if not page_url or not isinstance(page_url, str):
-        return jsonify({"ok": False, "error": "缺少或非法的 page_url"}), 400
+        return {"ok": False, "error": "缺少或非法的 page_url"}, 400
     parsed = urlparse(page_url)
     if parsed.scheme not in ("http", "https") or parsed.netloc not in ("www.douyin.com", "douyin.com"):
-        return jsonify({"ok": False, "error": "链接不合法，只支持抖音页面URL"}), 400
+        return {"ok": False, "error": "链接不合法，只支持抖音页面URL"}, 400
     video_id = extract_video_id_from_url(page_url)
     if not video_id:
-        return jsonify({"ok": False, "error": "无法从链接提取 video_id"}), 400
+        return {"ok": False, "error": "无法从链接提取 video_id"}, 400
+
+    # 同一 video_id 的并发提交（插件与 bit_playwright 同时提交等）合并为一次查重+入队，跨 worker 生效
+    (result, status), shared = singleflight.do(
+        f"douyin_upload:{video_id}",
+        lambda: _check_and_enqueue_douyin(video_id, page_url, channel or "", mode),
+    )
+    if shared and status == 202:
+        result = dict(result, message="该视频已在处理队列中")
+    return result, status
 
+
+def _check_and_enqueue_douyin(video_id: str, page_url: str, channel: str, mode: str) -> Tuple[Dict[str, Any], int]:
     try:
         # 下载前：先在飞书多维表中按 video_id 检索是否已存在
         existing = feishu.search_record_by_video_id(video_id, page_size=1)
         # 以 total 是否大于 0 来判断是否存在
         if isinstance(existing, dict) and existing.get("total", 0) > 0:
-            return jsonify({
+            return {
                 "ok": True,
                 "message": "该视频已上传过（根据 video_id 命中）",
                 "exists": True,
                 "records": existing.get("items", []),
                 "total": existing.get("total", 0)
-            }), 200
-
-        # 下载视频
-        import asyncio
-        
-        # 修复事件循环冲突问题 - 使用现有的事件循环
-        aweme_data = asyncio.run(download_with_f2(video_id))
-
-        # 上传视频到飞书
-        upload_result = upload_video_to_feishu(aweme_data, channel)
-        if isinstance(upload_result, dict) and upload_result.get("success"):
-            return jsonify({"ok": True, "message": upload_result.get("message", "视频上传成功"), "result": upload_result}), 200
-        else:
-            # 失败时也返回详细信息，便于前端展示与排查
-            return jsonify({"ok": False, "message": (upload_result or {}).get("message", "视频上传失败"), "result": upload_result}), 500
+            }, 200
+
+        # 入队：同一 video_id 正在处理时直接返回已有任务
+        job, created = job_manager.submit(
+            DOUYIN_UPLOAD_JOB,
+            video_id,
+            {"video_id": video_id, "page_url": page_url, "channel": channel, "mode": mode},
+        )
+        return {
+            "ok": True,
+            "message": "已加入上传队列" if created else "该视频已在处理队列中",
+            "exists": False,
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/jobs/{job['id']}",
+        }, 202
     except Exception as e:
         logging.error("upload_record failed: %s", e)
         traceback.print_exc()
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
 
-@app.route("/xhs/parse_note", methods=["GET", "POST"])
-def parse_xhs_note():
+
+@app.route("/feishu/upload_record", methods=["POST"])
+def upload_record():
+    """抖音视频上传接口（异步，见 submit_douyin_upload）"""
+    result, status = submit_douyin_upload(request.get_json(force=True, silent=True) or {})
+    return jsonify(result), status
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    """查询任务状态、当前阶段、进度与结果"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "任务不存在或已过期"}), 404
+    return jsonify({"ok": True, "job": job}), 200
+
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
     """
-    解析小红书笔记接口
+    任务列表
 
-    支持 GET 和 POST 请求
-    参数：url - 小红书笔记链接（支持短链接、discovery、explore格式）
+    参数：limit（默认50）、status（queued/running/succeeded/failed）、kind
+    返回：jobs 列表与各阶段队列深度
     """
-    try:
-        # 1. 获取请求参数
-        if request.method == "GET":
-            base_url = request.args.get("url", "").strip()
-
-            # 特殊处理：如果 URL 参数中包含未编码的 &，Flask 会将其拆分为多个参数
-            # 例如：url=...?source=webshare&xsec_token=xxx 会被拆分为 url=...?source=webshare 和 xsec_token=xxx
-            # 需要检查是否有 xsec_token、xsec_source、xhsshare 等参数需要重新拼接
-            if 'xiaohongshu.com' in base_url and '?' in base_url:
-                # 检查是否有被拆分的查询参数
-                extra_params = {}
-                for key in ['xsec_token', 'xsec_source', 'xhsshare', 'source']:
-                    if key in request.args and key not in base_url:
-                        extra_params[key] = request.args.get(key)
-
-                # 如果有额外的参数，重新拼接
-                if extra_params:
-                    # 手动拼接参数，避免 urlencode 对 = 进行编码
-                    params_list = [f"{k}={v}" for k, v in extra_params.items()]
-                    param_str = '&'.join(params_list)
-                    # 如果 base_url 已经有查询参数，用 & 连接，否则用 ?
-                    separator = '&' if '?' in base_url else '?'
-                    base_url = base_url + separator + param_str
-                    logging.info(f"重新组装 URL，添加参数: {list(extra_params.keys())}")
-        else:
-            payload = request.get_json(force=True, silent=True) or {}
-            base_url = payload.get("url", "").strip()
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+    jobs = job_manager.list_jobs(
+        limit=limit,
+        status=request.args.get("status") or None,
+        kind=request.args.get("kind") or None,
+    )
+    return jsonify({"ok": True, "jobs": jobs, "queue": job_manager.stats()}), 200
 
-        if not base_url:
-            return jsonify({"ok": False, "error": "缺少必需参数 url"}), 400
 
-        # 2. 解析并标准化链接
-        note_id, xsec_token, url = extract_note_info_from_url(base_url, XHS_COOKIE)
+@app.route("/feishu/index", methods=["GET"])
+def feishu_index_stats():
+    """查看本地查重索引的同步状态"""
+    return jsonify({"ok": True, "tables": feishu_index.stats()}), 200
 
-        if not url or not note_id or not xsec_token:
-            return jsonify({
-                "ok": False,
-                "error": "无法解析小红书链接，请检查链接格式（需要包含笔记ID和xsec_token）"
-            }), 400
 
-        logging.info(f"解析小红书链接: note_id={note_id}, url={url}")
+@app.route("/feishu/index/sync", methods=["POST"])
+def feishu_index_sync():
+    """立即与飞书对账本地查重索引"""
+    results = feishu_index.sync_all(force=True)
+    return jsonify({"ok": all("error" not in r for r in results), "results": results}), 200
 
-        # 3. 根据模式解析笔记
-        if XHS_MODE == 'api':
-            result = parse_note_api_mode(url, XHS_COOKIE, DOWNLOAD_DIR)
-        else:
-            result = parse_note_web_mode(url, XHS_COOKIE, DOWNLOAD_DIR)
 
-        # 4. 上传到飞书（如果解析成功）
-        if result.get("ok") and isinstance(result.get("data"), list) and len(result["data"]) > 0:
-            note_data = result["data"][0]
-            feishu_result = upload_note_to_feishu(note_data)
-            result["feishu"] = feishu_result
+def note_url_from_args(args) -> str:
+    """
+    从 GET 查询参数中取出笔记链接
 
-            # 如果飞书上传失败，整体标记为失败
-            if not feishu_result.get("ok"):
-                result["ok"] = False
-                result["error"] = f"笔记解析成功，但上传到飞书失败: {feishu_result.get('error', '未知错误')}"
+    如果 URL 参数中包含未编码的 &，会被拆分为多个参数，
+    例如：url=...?source=webshare&xsec_token=xxx 会被拆分为 url=...?source=webshare 和 xsec_token=xxx，
+    需要把 xsec_token、xsec_source、xhsshare 等参数重新拼接回去
+    """
+    base_url = (args.get("url") or "").strip()
+    if 'xiaohongshu.com' in base_url and '?' in base_url:
+        # 检查是否有被拆分的查询参数
+        extra_params = {}
+        for key in ['xsec_token', 'xsec_source', 'xhsshare', 'source']:
+            if key in args and key not in base_url:
+                extra_params[key] = args.get(key)
+
+        # 如果有额外的参数，重新拼接
+        if extra_params:
+            # 手动拼接参数，避免 urlencode 对 = 进行编码
+            params_list = [f"{k}={v}" for k, v in extra_params.items()]
+            param_str = '&'.join(params_list)
+            # 如果 base_url 已经有查询参数，用 & 连接，否则用 ?
+            separator = '&' if '?' in base_url else '?'
+            base_url = base_url + separator + param_str
+            logging.info(f"重新组装 URL，添加参数: {list(extra_params.keys())}")
+    return base_url
+
+
+def resolve_note_url(base_url: str) -> Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]:
+    """解析并标准化笔记链接，返回 (note_id, url, 错误结果)"""
+    if not base_url:
+        return None, None, {"ok": False, "error": "缺少必需参数 url"}
+    note_id, xsec_token, url = extract_note_info_from_url(base_url, XHS_COOKIE)
+    if not url or not note_id or not xsec_token:
+        return None, None, {
+            "ok": False,
+            "error": "无法解析小红书链接，请检查链接格式（需要包含笔记ID和xsec_token）"
+        }
+    logging.info(f"解析小红书链接: note_id={note_id}, url={url}")
+    return note_id, url, None
 
-        # 根据结果决定状态码
-        if result.get("ok"):
-            # 成功时添加 success 字段
-            result["success"] = True
-            return jsonify(result), 200
-        else:
-            # 解析失败或上传失败，返回 500，不包含 success 字段
-            return jsonify(result), 500
+
+def finish_note_result(result: Dict[str, Any], pipeline: Optional[NoteUploadPipeline]) -> Tuple[Dict[str, Any], int]:
+    """笔记解析成功后上传到飞书，并生成响应与状态码"""
+    if result.get("ok") and isinstance(result.get("data"), list) and len(result["data"]) > 0:
+        note_data = result["data"][0]
+        feishu_result = upload_note_to_feishu(note_data, pipeline=pipeline)
+        result["feishu"] = feishu_result
+
+        # 如果飞书上传失败，整体标记为失败
+        if not feishu_result.get("ok"):
+            result["ok"] = False
+            result["error"] = f"笔记解析成功，但上传到飞书失败: {feishu_result.get('error', '未知错误')}"
+
+    # 根据结果决定状态码
+    if result.get("ok"):
+        # 成功时添加 success 字段
+        result["success"] = True
+        return result, 200
+    # 解析失败或上传失败，返回 500，不包含 success 字段
+    return result, 500
+
+
+def _parse_and_upload_note(url: str) -> Tuple[Dict[str, Any], int]:
+    pipeline = NoteUploadPipeline() if XHS_PIPELINE else None
+    if XHS_MODE == 'api':
+        result = parse_note_api_mode(url, XHS_COOKIE, DOWNLOAD_DIR, pipeline=pipeline)
+    else:
+        result = parse_note_web_mode(url, XHS_COOKIE, DOWNLOAD_DIR, pipeline=pipeline)
+    return finish_note_result(result, pipeline)
+
+
+def _coalesced_note(note_id: str, url: str) -> Tuple[Dict[str, Any], int]:
+    """同一笔记的并发请求只解析、上传一次"""
+    outcome, _ = singleflight.do(f"xhs_note:{note_id}", lambda: _parse_and_upload_note(url))
+    return outcome
+
+
+def process_xhs_note(base_url: str) -> Tuple[Dict[str, Any], int]:
+    """解析小红书笔记并上传到飞书（流水线模式下载的同时开始上传）"""
+    try:
+        note_id, url, error = resolve_note_url(base_url)
+        if error:
+            return error, 400
+        return _coalesced_note(note_id, url)
     except Exception as e:
         logging.error("parse_xhs_note failed: %s", e)
         traceback.print_exc()
         # 失败时不包含 success 字段
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
 
 
-@app.route("/xhs/parse_author", methods=["GET", "POST"])
-def parse_xhs_author():
+def product_mapping_state() -> Dict[str, Any]:
+    """当前生效的商品映射配置"""
+    mapping = product_mapping_service.load_product_mapping()
+    return {"ok": True, "count": len(mapping), "product_name_mapping": dict(mapping)}
+
+
+def check_admin_token(token: Optional[str]) -> Optional[Tuple[Dict[str, Any], int]]:
+    """校验管理令牌，通过返回 None，否则返回 (错误信息, 状态码)"""
+    if not ADMIN_TOKEN:
+        return {"ok": False, "error": "管理接口未启用：未配置 ADMIN_TOKEN"}, 403
+    if not token or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return {"ok": False, "error": f"缺少或错误的 {ADMIN_TOKEN_HEADER}"}, 401
+    return None
+
+
+def update_product_mapping(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """校验并写入商品映射配置，当前 worker 立即生效，其他 worker 由监视线程重载"""
+    try:
+        result = product_mapping_service.save_product_mapping(payload.get("product_name_mapping"))
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}, 400
+    except OSError as e:
+        logging.error("写入商品映射配置失败: %s", e)
+        return {"ok": False, "error": f"写入配置失败: {e}"}, 500
+    return result, (200 if result.get("ok") else 500)
+
+
+@app.route("/product_mapping", methods=["GET"])
+def get_product_mapping():
+    """查看当前生效的商品名称映射"""
+    return jsonify(product_mapping_state()), 200
+
+
+@app.route("/product_mapping", methods=["PUT", "POST"])
+def put_product_mapping():
     """
-    解析小红书作者信息接口
+    覆盖写入商品名称映射（需要 X-Admin-Token）
 
-    支持 GET 和 POST 请求
-    参数：url - 作者主页链接或包含链接的文本
+    请求体：{"product_name_mapping": {"关键词": "产品名称", ...}}
     """
+    denied = check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER))
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    result, status = update_product_mapping(request.get_json(force=True, silent=True) or {})
+    return jsonify(result), status
+
+
+@app.route("/product_mapping/reload", methods=["POST"])
+def reload_product_mapping():
+    """立即从文件重新加载商品名称映射（需要 X-Admin-Token）"""
+    denied = check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER))
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    result = product_mapping_service.reload_product_mapping(force=True)
+    return jsonify(result), (200 if result.get("ok") else 500)
+
+
+@app.route("/xhs/rate_limits", methods=["GET"])
+def xhs_rate_limits():
+    """查看当前 worker 内各域名的自适应请求速率（Web 模式 XHS 实例共享）"""
+    return jsonify({"ok": True, "pid": os.getpid(), "hosts": HostLimiter.shared().stats()}), 200
+
+
+def parse_bulk_request(payload: Dict[str, Any]) -> Tuple[List[str], int, Optional[str]]:
+    """
+    解析批量请求体，返回 (链接列表, 并发数, 错误信息)
+
+    urls 为链接或分享文案列表，text 为包含多条分享文案的文本，两者可同时提供
+    """
+    raw_items = payload.get("urls") or []
+    if isinstance(raw_items, str):
+        raw_items = [raw_items]
+    if not isinstance(raw_items, list):
+        return [], 0, "urls 必须是数组"
+    texts = [item for item in raw_items if isinstance(item, str)]
+    if isinstance(payload.get("text"), str):
+        texts.append(payload["text"])
+
+    inputs: List[str] = []
+    for text in texts:
+        for url in extract_note_urls(text):
+            if url not in inputs:
+                inputs.append(url)
+    if not inputs:
+        return [], 0, "缺少必需参数 urls 或 text"
+    if len(inputs) > XHS_BULK_MAX_URLS:
+        return [], 0, f"单次最多 {XHS_BULK_MAX_URLS} 条链接"
+
     try:
-        # 1. 获取请求参数
-        if request.method == "GET":
-            base_url = request.args.get("url", "").strip()
-        else:
-            payload = request.get_json(force=True, silent=True) or {}
-            base_url = payload.get("url", "").strip()
+        concurrency = int(payload.get("concurrency") or XHS_BULK_CONCURRENCY)
+    except (TypeError, ValueError):
+        return [], 0, "concurrency 必须是整数"
+    return inputs, max(1, min(concurrency, XHS_BULK_MAX_CONCURRENCY)), None
+
+
+def _bulk_note_event(text: str, note_id: str, outcome: Tuple[Dict[str, Any], int]) -> Dict[str, Any]:
+    result, status = outcome
+    # 原始接口响应体积大，批量结果中不返回
+    result = {key: value for key, value in result.items() if key != "raw"}
+    return {"type": "note", "input": text, "note_id": note_id, "ok": bool(result.get("ok")), "status": status, "result": result}
+
+
+def iter_bulk_notes(inputs: List[str], concurrency: int) -> Iterator[Dict[str, Any]]:
+    """
+    批量解析笔记并上传到飞书，每完成一条产出一个事件，最后产出汇总
+
+    短链接解析并发进行；解析完成即按 note_id 去重并提交到 concurrency 个工作线程执行解析、下载与上传
+    """
+    started = time.time()
+    counts = {"succeeded": 0, "failed": 0, "duplicates": 0, "invalid": 0}
+    resolver = ThreadPoolExecutor(max_workers=min(len(inputs), XHS_BULK_RESOLVE_WORKERS), thread_name_prefix="xhs-bulk-resolve")
+    workers = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="xhs-bulk")
+    resolving: Dict[Future, str] = {resolver.submit(resolve_note_url, text): text for text in inputs}
+    processing: Dict[Future, Tuple[str, str]] = {}
+    seen: Dict[str, str] = {}
+    pending = set(resolving)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in resolving:
+                    text = resolving.pop(future)
+                    try:
+                        note_id, url, error = future.result()
+                    except Exception as e:
+                        note_id, url, error = None, None, {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}
+                    if error:
+                        counts["invalid"] += 1
+                        yield {"type": "invalid", "input": text, "ok": False, "error": error.get("error")}
+                    elif note_id in seen:
+                        counts["duplicates"] += 1
+                        yield {"type": "duplicate", "input": text, "note_id": note_id, "duplicate_of": seen[note_id]}
+                    else:
+                        seen[note_id] = text
+                        task = workers.submit(_coalesced_note, note_id, url)
+                        processing[task] = (text, note_id)
+                        pending.add(task)
+                    continue
+
+                text, note_id = processing.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logging.error("批量解析笔记失败 note_id=%s: %s", note_id, e)
+                    outcome = ({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500)
+                event = _bulk_note_event(text, note_id, outcome)
+                counts["succeeded" if event["ok"] else "failed"] += 1
+                yield event
+    finally:
+        # 客户端提前断开时取消尚未开始的任务
+        resolver.shutdown(wait=False, cancel_futures=True)
+        workers.shutdown(wait=False, cancel_futures=True)
+
+    yield {
+        "type": "summary",
+        "total": len(inputs),
+        "unique": len(seen),
+        **counts,
+        "elapsed": round(time.time() - started, 2),
+    }
+
+
+def format_bulk_event(event: Dict[str, Any], sse: bool) -> str:
+    """NDJSON：每行一个 JSON；SSE：event 为事件类型，data 为 JSON"""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    if sse:
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def wants_sse(payload: Dict[str, Any], accept: str) -> bool:
+    fmt = str(payload.get("format") or "").lower()
+    return fmt == "sse" or (not fmt and "text/event-stream" in (accept or ""))
+
+
+@app.route("/xhs/parse_notes", methods=["POST"])
+def parse_xhs_notes():
+    """
+    批量解析小红书笔记接口（流式返回）
+
+    请求体：
+    - urls: 链接或分享文案数组；text: 包含多条分享文案的文本（两者至少提供一个）
+    - concurrency: 同时处理的笔记数（默认 XHS_BULK_CONCURRENCY，上限 XHS_BULK_MAX_CONCURRENCY）
+    - format: ndjson（默认）或 sse；也可通过 Accept: text/event-stream 选择 SSE
+
+    每条笔记完成即返回一个事件（note / duplicate / invalid），最后返回 summary
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    inputs, concurrency, error = parse_bulk_request(payload)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    sse = wants_sse(payload, request.headers.get("Accept", ""))
+    logging.info("批量解析小红书笔记: %s 条，并发 %s", len(inputs), concurrency)
+    body = (format_bulk_event(event, sse) for event in iter_bulk_notes(inputs, concurrency))
+    return Response(
+        stream_with_context(body),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
+
+@app.route("/xhs/parse_note", methods=["GET", "POST"])
+def parse_xhs_note():
+    """
+    解析小红书笔记接口
+
+    支持 GET 和 POST 请求
+    参数：url - 小红书笔记链接（支持短链接、discovery、explore格式）
+    """
+    if request.method == "GET":
+        base_url = note_url_from_args(request.args)
+    else:
+        payload = request.get_json(force=True, silent=True) or {}
+        base_url = payload.get("url", "").strip()
+    result, status = process_xhs_note(base_url)
+    return jsonify(result), status
+
+
+def process_xhs_author(base_url: str) -> Tuple[Dict[str, Any], int]:
+    """解析小红书作者信息并上传到飞书"""
+    try:
         if not base_url:
-            return jsonify({"ok": False, "error": "缺少必需参数 url"}), 400
+            return {"ok": False, "error": "缺少必需参数 url"}, 400
 
         logging.info(f"解析小红书作者: {base_url[:100]}")
 
-        # 2. 解析作者信息
+        # 同一作者的并发请求只解析、上传一次（短链接按链接本身合并）
+        from xhs_author_parser import extract_author_url_from_text, extract_user_id_from_url
+        author_url = extract_author_url_from_text(base_url) or base_url
+        key = extract_user_id_from_url(author_url) or author_url
+        outcome, _ = singleflight.do(f"xhs_author:{key}", lambda: _parse_and_upload_author(base_url))
+        return outcome
+
+    except Exception as e:
+        logging.error("parse_xhs_author failed: %s", e)
+        traceback.print_exc()
+        # 失败时不包含 success 字段
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
+
+
+def _parse_and_upload_author(base_url: str) -> Tuple[Dict[str, Any], int]:
+    try:
+        # 1. 解析作者信息
         from xhs_author_parser import parse_author
         result = parse_author(base_url, XHS_COOKIE)
 
-        # 3. 如果解析成功，上传到飞书
+        # 2. 如果解析成功，上传到飞书
         if result.get("ok") and result.get("data"):
             from xhs_author_uploader import upload_author_to_feishu
             author_data = result["data"]
@@ -381,44 +615,63 @@ def parse_xhs_author():
         if result.get("ok"):
             # 成功时添加 success 字段
             result["success"] = True
-            return jsonify(result), 200
-        else:
-            # 解析失败或上传失败，返回 500，不包含 success 字段
-            return jsonify(result), 500
+            return result, 200
+        # 解析失败或上传失败，返回 500，不包含 success 字段
+        return result, 500
 
     except Exception as e:
         logging.error("parse_xhs_author failed: %s", e)
         traceback.print_exc()
         # 失败时不包含 success 字段
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
 
 
-@app.route("/xhs/parse_goods", methods=["GET", "POST"])
-def parse_xhs_goods():
+@app.route("/xhs/parse_author", methods=["GET", "POST"])
+def parse_xhs_author():
     """
-    解析小红书商品信息接口
+    解析小红书作者信息接口
 
     支持 GET 和 POST 请求
-    参数：url - 商品链接或包含链接的文本
+    参数：url - 作者主页链接或包含链接的文本
     """
-    try:
-        # 1. 获取请求参数
-        if request.method == "GET":
-            base_url = request.args.get("url", "").strip()
-        else:
-            payload = request.get_json(force=True, silent=True) or {}
-            base_url = payload.get("url", "").strip()
+    if request.method == "GET":
+        base_url = request.args.get("url", "").strip()
+    else:
+        payload = request.get_json(force=True, silent=True) or {}
+        base_url = payload.get("url", "").strip()
+    result, status = process_xhs_author(base_url)
+    return jsonify(result), status
+
 
+def process_xhs_goods(base_url: str) -> Tuple[Dict[str, Any], int]:
+    """解析小红书商品信息并上传到飞书"""
+    try:
         if not base_url:
-            return jsonify({"ok": False, "error": "缺少必需参数 url"}), 400
+            return {"ok": False, "error": "缺少必需参数 url"}, 400
 
         logging.info(f"解析小红书商品: {base_url[:100]}")
 
-        # 2. 解析商品信息
+        # 同一商品的并发请求只解析、上传一次（短链接按链接本身合并）
+        from xhs_goods_parser import extract_goods_id_from_url, extract_goods_url_from_text
+        goods_url = extract_goods_url_from_text(base_url) or base_url
+        key = extract_goods_id_from_url(goods_url) or goods_url
+        outcome, _ = singleflight.do(f"xhs_goods:{key}", lambda: _parse_and_upload_goods(base_url))
+        return outcome
+
+    except Exception as e:
+        logging.error("parse_xhs_goods failed: %s", e)
+        traceback.print_exc()
+        # 失败时不包含 success 字段
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
+
+
+def _parse_and_upload_goods(base_url: str) -> Tuple[Dict[str, Any], int]:
+    try:
+        # 1. 解析商品信息
         from xhs_goods_parser import parse_goods
         result = parse_goods(base_url, XHS_COOKIE)
 
-        # 3. 如果解析成功，上传到飞书
+        # 2. 如果解析成功，上传到飞书
         if result.get("ok") and result.get("data"):
             from xhs_goods_uploader import upload_goods_to_feishu
             goods_data = result["data"]
@@ -434,45 +687,43 @@ def parse_xhs_goods():
         if result.get("ok"):
             # 成功时添加 success 字段
             result["success"] = True
-            return jsonify(result), 200
-        else:
-            # 解析失败或上传失败，返回 500，不包含 success 字段
-            return jsonify(result), 500
+            return result, 200
+        # 解析失败或上传失败，返回 500，不包含 success 字段
+        return result, 500
 
     except Exception as e:
         logging.error("parse_xhs_goods failed: %s", e)
         traceback.print_exc()
         # 失败时不包含 success 字段
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
 
 
-@app.route("/feishu/check_video_exists", methods=["GET", "POST"])
-def check_video_exists():
+@app.route("/xhs/parse_goods", methods=["GET", "POST"])
+def parse_xhs_goods():
     """
-    检查视频在飞书多维表格中是否存在
-
-    参数：
-    - video_id: 视频ID（字符串）
+    解析小红书商品信息接口
 
-    返回：
-    - success: True 表示查询成功
-    - exists: True/False 表示视频是否存在
-    - record_id: 如果存在，返回记录ID
+    支持 GET 和 POST 请求
+    参数：url - 商品链接或包含链接的文本
     """
-    try:
-        # 获取 video_id 参数（支持 GET 和 POST）
-        if request.method == "GET":
-            video_id = request.args.get('video_id', '').strip()
-        else:
-            video_id = request.json.get('video_id', '').strip() if request.is_json else request.form.get('video_id', '').strip()
+    if request.method == "GET":
+        base_url = request.args.get("url", "").strip()
+    else:
+        payload = request.get_json(force=True, silent=True) or {}
+        base_url = payload.get("url", "").strip()
+    result, status = process_xhs_goods(base_url)
+    return jsonify(result), status
 
+
+def check_video(video_id: str) -> Tuple[Dict[str, Any], int]:
+    """查询 video_id 在飞书多维表格中是否存在"""
+    try:
         if not video_id:
-            return jsonify({"ok": False, "error": "缺少必需参数 video_id"}), 400
+            return {"ok": False, "error": "缺少必需参数 video_id"}, 400
 
         logging.info(f"检查视频是否存在: video_id={video_id}")
 
         # 获取飞书访问令牌
-        import feishu_table as feishu
         access_token = feishu.get_tenant_access_token()
 
         # 查询 video_id 是否存在
@@ -483,66 +734,63 @@ def check_video_exists():
             record_id = existing["items"][0].get("record_id")
             logging.info(f"视频存在: video_id={video_id}, record_id={record_id}")
 
-            return jsonify({
+            return {
                 "ok": True,
                 "success": True,
                 "exists": True,
                 "video_id": video_id,
                 "record_id": record_id
-            }), 200
+            }, 200
         else:
             # 视频不存在
             logging.info(f"视频不存在: video_id={video_id}")
 
-            return jsonify({
+            return {
                 "ok": True,
                 "success": True,
                 "exists": False,
                 "video_id": video_id
-            }), 200
+            }, 200
 
     except Exception as e:
         logging.error(f"check_video_exists failed: {e}")
         traceback.print_exc()
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
 
 
-@app.route("/feishu/upload_file", methods=["POST"])
-def upload_file_to_feishu_table():
+@app.route("/feishu/check_video_exists", methods=["GET", "POST"])
+def check_video_exists():
     """
-    上传文件到飞书多维表格接口
+    检查视频在飞书多维表格中是否存在
 
     参数：
-    - file: 文件（multipart/form-data）
     - video_id: 视频ID（字符串）
 
     返回：
-    - success: True 表示成功
-    - ok: True/False
-    - record_id: 飞书记录ID
-    - file_token: 文件token
+    - success: True 表示查询成功
+    - exists: True/False 表示视频是否存在
+    - record_id: 如果存在，返回记录ID
     """
-    try:
-        # 1. 检查参数
-        if 'file' not in request.files:
-            return jsonify({"ok": False, "error": "缺少必需参数 file"}), 400
+    # 获取 video_id 参数（支持 GET 和 POST）
+    if request.method == "GET":
+        video_id = request.args.get('video_id', '').strip()
+    else:
+        video_id = request.json.get('video_id', '').strip() if request.is_json else request.form.get('video_id', '').strip()
+    result, status = check_video(video_id)
+    return jsonify(result), status
 
-        if 'video_id' not in request.form:
-            return jsonify({"ok": False, "error": "缺少必需参数 video_id"}), 400
 
-        file = request.files['file']
-        video_id = request.form.get('video_id', '').strip()
-
-        if not video_id:
-            return jsonify({"ok": False, "error": "video_id 不能为空"}), 400
-
-        if file.filename == '':
-            return jsonify({"ok": False, "error": "未选择文件"}), 400
+def store_video_file(video_id: str, file_name: str, save: Callable[[str], Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    保存上传的文件并写入飞书多维表格
 
-        logging.info(f"上传文件到飞书: video_id={video_id}, filename={file.filename}")
+    save(path) 负责把请求中的文件写到 path（Flask / ASGI 的文件对象接口不同）
+    """
+    temp_path = None
+    try:
+        logging.info(f"上传文件到飞书: video_id={video_id}, filename={file_name}")
 
-        # 2. 获取飞书访问令牌并检查 video_id 是否已存在
-        import feishu_table as feishu
+        # 1. 获取飞书访问令牌并检查 video_id 是否已存在
         access_token = feishu.get_tenant_access_token()
 
         existing = feishu.search_record_by_video_id(video_id, access_token=access_token)
@@ -552,38 +800,33 @@ def upload_file_to_feishu_table():
             record_id = existing["items"][0].get("record_id")
             logging.info(f"video_id {video_id} 已存在，record_id: {record_id}")
 
-            return jsonify({
+            return {
                 "ok": False,
                 "error": f"video_id {video_id} 已存在，record_id: {record_id}"
-            }), 400
+            }, 400
 
-        # 3. video_id 不存在，保存临时文件到项目 tmp 目录
+        # 2. video_id 不存在，保存临时文件到项目 tmp 目录
         temp_dir = os.path.join(os.path.dirname(__file__), "tmp")
         os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, file.filename)
+        temp_path = os.path.join(temp_dir, file_name)
 
-        file.save(temp_path)
+        save(temp_path)
         logging.info(f"文件已保存到临时目录: {temp_path}")
 
-        # 4. 上传文件到飞书云盘
+        # 3. 上传文件到飞书云盘
         upload_result = feishu.upload_file_to_bitable(
             file_path=temp_path,
-            file_name=file.filename,
+            file_name=file_name,
             access_token=access_token
         )
 
         if not upload_result or not upload_result.get("file_token"):
-            # 删除临时文件
-            try:
-                os.remove(temp_path)
-            except:
-                pass
-            return jsonify({"ok": False, "error": "文件上传到飞书云盘失败"}), 500
+            return {"ok": False, "error": "文件上传到飞书云盘失败"}, 500
 
         file_token = upload_result["file_token"]
         logging.info(f"文件上传成功，file_token: {file_token}")
 
-        # 5. 创建新记录
+        # 4. 创建新记录
         FEISHU_APP_TOKEN = os.getenv("FEISHU_APP_TOKEN", "Pyw7bsxDiaSkKXsBwUqc9DH4n5c")
         FEISHU_TABLE_ID = os.getenv("FEISHU_TABLE_ID", "tblm8VXL99Bt9lcK")
         FEISHU_FIELD_ATTACHMENT = os.getenv("FEISHU_FIELD_ATTACHMENT", "视频")
@@ -591,7 +834,7 @@ def upload_file_to_feishu_table():
 
         fields = {
             FEISHU_FIELD_VIDEO_ID: str(video_id),
-            FEISHU_FIELD_ATTACHMENT: [{"file_token": file_token, "name": file.filename,"type": "file"}]
+            FEISHU_FIELD_ATTACHMENT: [{"file_token": file_token, "name": file_name,"type": "file"}]
         }
 
         record = feishu.create_record(
@@ -601,35 +844,65 @@ def upload_file_to_feishu_table():
             table_id=FEISHU_TABLE_ID
         )
 
-        # 删除临时文件
-        try:
-            os.remove(temp_path)
-        except:
-            pass
-
         if record:
             record_id = record.get("record_id")
             logging.info(f"成功创建飞书记录: {record_id}")
-            return jsonify({
+            return {
                 "ok": True,
                 "success": True,
                 "record_id": record_id,
                 "file_token": file_token,
                 "video_id": video_id
-            }), 200
+            }, 200
         else:
-            return jsonify({"ok": False, "error": "创建飞书记录失败"}), 500
+            return {"ok": False, "error": "创建飞书记录失败"}, 500
 
     except Exception as e:
         logging.error(f"upload_file_to_feishu_table failed: {e}")
         traceback.print_exc()
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}, 500
+    finally:
         # 删除临时文件
         try:
-            if 'temp_path' in locals():
+            if temp_path:
                 os.remove(temp_path)
-        except:
+        except OSError:
             pass
-        return jsonify({"ok": False, "error": f"{type(e).__name__}: {str(e)}"}), 500
+
+
+@app.route("/feishu/upload_file", methods=["POST"])
+def upload_file_to_feishu_table():
+    """
+    上传文件到飞书多维表格接口
+
+    参数：
+    - file: 文件（multipart/form-data）
+    - video_id: 视频ID（字符串）
+
+    返回：
+    - success: True 表示成功
+    - ok: True/False
+    - record_id: 飞书记录ID
+    - file_token: 文件token
+    """
+    # 检查参数
+    if 'file' not in request.files:
+        return jsonify({"ok": False, "error": "缺少必需参数 file"}), 400
+
+    if 'video_id' not in request.form:
+        return jsonify({"ok": False, "error": "缺少必需参数 video_id"}), 400
+
+    file = request.files['file']
+    video_id = request.form.get('video_id', '').strip()
+
+    if not video_id:
+        return jsonify({"ok": False, "error": "video_id 不能为空"}), 400
+
+    if file.filename == '':
+        return jsonify({"ok": False, "error": "未选择文件"}), 400
+
+    result, status = store_video_file(video_id, file.filename, file.save)
+    return jsonify(result), status
 
 
 if __name__ == "__main__":
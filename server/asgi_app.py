@@ -0,0 +1,235 @@
+"""
+ASGI 入口（FastAPI + uvicorn）
+
+与 app.py（Flask + gevent）提供相同的接口，业务逻辑共用 app.py 中的处理函数：
+- 启动时把常驻事件循环（async_runtime）接管为 uvicorn 的事件循环，
+  f2 / XHS 引擎等异步 I/O 直接在服务循环上 await，任务队列线程中的 run_async() 也提交到该循环
+- 飞书 requests 客户端、Spider_XHS 等阻塞调用放到有界线程池（ASGI_BLOCKING_THREADS）执行，不阻塞事件循环
+
+启动：gunicorn asgi_app:app --config gunicorn_asgi_conf.py
+"""
+import asyncio
+import functools
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Tuple
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import app as backend
+import feishu_index
+import product_mapping_service
+from async_runtime import get_runtime
+from xhs_downloader.source.module import HostLimiter
+
+# 阻塞调用线程池大小：决定同时进行的飞书请求 / 同步解析数量
+BLOCKING_THREADS = int(os.getenv("ASGI_BLOCKING_THREADS", "64"))
+
+_limiter = anyio.CapacityLimiter(BLOCKING_THREADS)
+
+
+async def _blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在有界线程池中执行阻塞函数"""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_limiter)
+
+
+def _respond(outcome: Tuple[Dict[str, Any], int]) -> JSONResponse:
+    result, status = outcome
+    return JSONResponse(result, status_code=status)
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    """等价于 Flask 的 get_json(force=True, silent=True)"""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    runtime = get_runtime()
+    runtime.attach(asyncio.get_running_loop())
+    logging.info("ASGI 模式：常驻事件循环已接管为服务循环，阻塞线程池 %s", BLOCKING_THREADS)
+    try:
+        yield
+    finally:
+        await runtime.close_resources()
+
+
+app = FastAPI(title="chrome_plugin_server", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@app.post("/feishu/upload_record")
+async def upload_record(request: Request):
+    """抖音视频上传接口（异步，见 app.submit_douyin_upload）"""
+    return _respond(await _blocking(backend.submit_douyin_upload, await _json_body(request)))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询任务状态、当前阶段、进度与结果"""
+    job = await _blocking(backend.job_manager.get, job_id)
+    if not job:
+        return JSONResponse({"ok": False, "error": "任务不存在或已过期"}, status_code=404)
+    return {"ok": True, "job": job}
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50, status: str = "", kind: str = ""):
+    """任务列表（参数同 Flask 版本）"""
+    jobs = await _blocking(
+        backend.job_manager.list_jobs,
+        limit=max(1, min(limit, 500)),
+        status=status or None,
+        kind=kind or None,
+    )
+    return {"ok": True, "jobs": jobs, "queue": backend.job_manager.stats()}
+
+
+@app.get("/feishu/index")
+async def feishu_index_stats():
+    """查看本地查重索引的同步状态"""
+    return {"ok": True, "tables": await _blocking(feishu_index.stats)}
+
+
+@app.post("/feishu/index/sync")
+async def feishu_index_sync():
+    """立即与飞书对账本地查重索引"""
+    results = await _blocking(feishu_index.sync_all, force=True)
+    return {"ok": all("error" not in r for r in results), "results": results}
+
+
+@app.get("/product_mapping")
+async def get_product_mapping():
+    """查看当前生效的商品名称映射"""
+    return await _blocking(backend.product_mapping_state)
+
+
+@app.api_route("/product_mapping", methods=["PUT", "POST"])
+async def put_product_mapping(request: Request):
+    """覆盖写入商品名称映射：{"product_name_mapping": {...}}（需要 X-Admin-Token）"""
+    denied = backend.check_admin_token(request.headers.get(backend.ADMIN_TOKEN_HEADER))
+    if denied:
+        return _respond(denied)
+    return _respond(await _blocking(backend.update_product_mapping, await _json_body(request)))
+
+
+@app.post("/product_mapping/reload")
+async def reload_product_mapping(request: Request):
+    """立即从文件重新加载商品名称映射（需要 X-Admin-Token）"""
+    denied = backend.check_admin_token(request.headers.get(backend.ADMIN_TOKEN_HEADER))
+    if denied:
+        return _respond(denied)
+    result = await _blocking(product_mapping_service.reload_product_mapping, force=True)
+    return JSONResponse(result, status_code=200 if result.get("ok") else 500)
+
+
+@app.get("/xhs/rate_limits")
+async def xhs_rate_limits():
+    """查看当前 worker 内各域名的自适应请求速率"""
+    return {"ok": True, "pid": os.getpid(), "hosts": HostLimiter.shared().stats()}
+
+
+@app.post("/xhs/parse_notes")
+async def parse_xhs_notes(request: Request):
+    """批量解析小红书笔记接口（参数同 Flask 版本，NDJSON / SSE 流式返回）"""
+    payload = await _json_body(request)
+    inputs, concurrency, error = backend.parse_bulk_request(payload)
+    if error:
+        return JSONResponse({"ok": False, "error": error}, status_code=400)
+
+    sse = backend.wants_sse(payload, request.headers.get("accept", ""))
+    logging.info("批量解析小红书笔记: %s 条，并发 %s", len(inputs), concurrency)
+    # 同步生成器由 Starlette 在线程池中迭代
+    body = (backend.format_bulk_event(event, sse) for event in backend.iter_bulk_notes(inputs, concurrency))
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.api_route("/xhs/parse_note", methods=["GET", "POST"])
+async def parse_xhs_note(request: Request):
+    """解析小红书笔记接口（参数同 Flask 版本）"""
+    if request.method == "GET":
+        base_url = backend.note_url_from_args(request.query_params)
+    else:
+        base_url = str((await _json_body(request)).get("url", "")).strip()
+    # Web 模式的笔记提取协程经 run_async 提交到服务循环执行；线程只承担下载、飞书上传与请求合并的等待
+    return _respond(await _blocking(backend.process_xhs_note, base_url))
+
+
+async def _request_url(request: Request) -> str:
+    if request.method == "GET":
+        return request.query_params.get("url", "").strip()
+    return str((await _json_body(request)).get("url", "")).strip()
+
+
+@app.api_route("/xhs/parse_author", methods=["GET", "POST"])
+async def parse_xhs_author(request: Request):
+    """解析小红书作者信息接口"""
+    return _respond(await _blocking(backend.process_xhs_author, await _request_url(request)))
+
+
+@app.api_route("/xhs/parse_goods", methods=["GET", "POST"])
+async def parse_xhs_goods(request: Request):
+    """解析小红书商品信息接口"""
+    return _respond(await _blocking(backend.process_xhs_goods, await _request_url(request)))
+
+
+@app.api_route("/feishu/check_video_exists", methods=["GET", "POST"])
+async def check_video_exists(request: Request):
+    """检查视频在飞书多维表格中是否存在"""
+    if request.method == "GET":
+        video_id = request.query_params.get("video_id", "")
+    elif request.headers.get("content-type", "").startswith("application/json"):
+        video_id = (await _json_body(request)).get("video_id", "")
+    else:
+        video_id = (await request.form()).get("video_id", "")
+    return _respond(await _blocking(backend.check_video, str(video_id).strip()))
+
+
+@app.post("/feishu/upload_file")
+async def upload_file_to_feishu_table(request: Request):
+    """上传文件到飞书多维表格接口（multipart/form-data：file、video_id）"""
+    form = await request.form()
+    file = form.get("file")
+    if file is None or isinstance(file, str):
+        return JSONResponse({"ok": False, "error": "缺少必需参数 file"}, status_code=400)
+    if "video_id" not in form:
+        return JSONResponse({"ok": False, "error": "缺少必需参数 video_id"}, status_code=400)
+
+    video_id = str(form.get("video_id") or "").strip()
+    if not video_id:
+        return JSONResponse({"ok": False, "error": "video_id 不能为空"}, status_code=400)
+    if not file.filename:
+        return JSONResponse({"ok": False, "error": "未选择文件"}, status_code=400)
+
+    def save(path: str) -> None:
+        # 在线程池中执行：同步读取 SpooledTemporaryFile 并写盘
+        file.file.seek(0)
+        with open(path, "wb") as fp:
+            while True:
+                chunk = file.file.read(1024 * 1024)
+                if not chunk:
+                    break
+                fp.write(chunk)
+
+    try:
+        return _respond(await _blocking(backend.store_video_file, video_id, file.filename, save))
+    finally:
+        await file.close()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,153 @@
+"""
+后台常驻事件循环
+
+同步的 Flask 处理函数 / 任务队列线程通过 run_async() 把协程提交到同一个常驻事件循环执行，
+代替每次 asyncio.run() 新建事件循环。DouyinCrawler、XHS 等持有 httpx 连接池、aiosqlite 连接的对象
+通过 resource() 在该循环上只创建一次，跨请求复用。
+
+注意：resource() 创建的对象绑定在常驻循环上，相关协程必须经 run_async() 执行。
+ASGI 模式下通过 attach() 直接使用 uvicorn 的事件循环，协程在服务循环上 await，
+工作线程里的 run_async() 也提交到该循环。
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Factory = Callable[[], Awaitable[Any]]
+Closer = Callable[[Any], Awaitable[Any]]
+
+
+def _native_thread_class():
+    """gevent monkey patch 后 threading.Thread 是 greenlet，事件循环需要运行在真正的系统线程中"""
+    try:
+        from gevent import monkey
+
+        if monkey.is_module_patched("threading"):
+            return monkey.get_original("threading", "Thread")
+    except ImportError:
+        pass
+    return threading.Thread
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class BackgroundLoop:
+    """在独立线程中运行的常驻事件循环及其上的长生命周期对象"""
+
+    def __init__(self, name: str = "async-runtime"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._resources: Dict[str, Tuple[Any, Optional[Closer]]] = {}
+        self._resource_locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # attach 的外部循环停止后回退到后台线程循环
+            detached = self._loop is not None and self._thread is None and not self._loop.is_running()
+            if self._loop is None or self._loop.is_closed() or detached:
+                # 旧循环上创建的常驻对象已无法使用
+                self._resources.clear()
+                self._resource_locks.clear()
+                # 先创建循环再启动线程：run_coroutine_threadsafe 在 run_forever 之前提交的任务也会被执行
+                self._loop = asyncio.new_event_loop()
+                self._thread = _native_thread_class()(
+                    target=self._run_forever, args=(self._loop,), name=self.name, daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """改用外部已在运行的事件循环（ASGI 服务循环），不再启动后台线程"""
+        with self._lock:
+            if self._thread is not None and self._loop is not None and not self._loop.is_closed():
+                raise RuntimeError("常驻事件循环已在后台线程启动，无法切换")
+            self._loop = loop
+            self._thread = None
+
+    @staticmethod
+    def _run_forever(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """在常驻循环上执行协程并阻塞等待结果（异常原样抛出）"""
+        loop = self.loop
+        if loop.is_running() and _running_loop() is loop:
+            coro.close()
+            raise RuntimeError("不能在常驻事件循环线程内同步等待协程，请直接 await")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def resource(self, name: str, factory: Factory, closer: Optional[Closer] = None) -> Any:
+        """获取（首次调用时创建）常驻循环上的长生命周期对象；并发首次调用只创建一次"""
+        cached = self._resources.get(name)
+        if cached:
+            return cached[0]
+        lock = self._resource_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            cached = self._resources.get(name)
+            if cached:
+                return cached[0]
+            value = await factory()
+            self._resources[name] = (value, closer)
+            logger.info("常驻对象已创建: %s", name)
+            return value
+
+    async def discard(self, name: str) -> None:
+        """丢弃并关闭某个常驻对象（例如连接已失效），下次 resource() 时重新创建"""
+        value, closer = self._resources.pop(name, (None, None))
+        if value is not None and closer:
+            try:
+                await closer(value)
+            except Exception as exc:  # pragma: no cover
+                logger.warning("关闭常驻对象失败 %s: %s", name, exc)
+
+    async def close_resources(self) -> None:
+        """关闭全部常驻对象（需在常驻循环上执行）"""
+        for name in list(self._resources):
+            await self.discard(name)
+
+    def shutdown(self) -> None:
+        """关闭全部常驻对象并停止后台事件循环（attach 的外部循环由其所有者负责）"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running() or self._thread is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self.close_resources(), loop).result(10)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("关闭常驻对象超时: %s", exc)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_runtime = BackgroundLoop()
+atexit.register(_runtime.shutdown)
+
+
+def get_runtime() -> BackgroundLoop:
+    return _runtime
+
+
+def run_async(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """同步代码中执行协程（代替 asyncio.run）"""
+    return _runtime.run(coro, timeout)
+
+
+__all__ = ["BackgroundLoop", "get_runtime", "run_async"]
@@ -0,0 +1,81 @@
+"""
+小红书页面 window.__INITIAL_STATE__ 解析基准：lxml + YAML（旧实现） vs 字符串扫描 + JSON（Converter）
+
+用法（在 server 目录下）：
+    python benchmarks/bench_initial_state.py page1.html page2.html ...
+    python benchmarks/bench_initial_state.py --save-fixture note.html   # 生成合成页面并保存，供下次使用
+
+不传页面文件时使用合成页面（结构与笔记详情页一致，含 undefined 值）。
+报告每个页面两条路径的平均解析耗时与峰值内存（tracemalloc），并校验结果一致。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml.etree import HTML  # noqa: E402
+from yaml import safe_load  # noqa: E402
+
+from fixtures import synthetic_page  # noqa: E402
+from xhs_downloader.source.expansion.converter import Converter  # noqa: E402
+
+
+def legacy_parse(html):
+    scripts = HTML(html).xpath(Converter.INITIAL_STATE)
+    return safe_load(Converter.get_script(scripts).lstrip("window.__INITIAL_STATE__="))
+
+
+def fast_parse(html):
+    return Converter._convert_object(Converter.find_script(html))
+
+
+def measure(func, html, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(html)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", help="保存的小红书页面 HTML 文件")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save-fixture", metavar="PATH", help="把合成页面写入 PATH 后退出")
+    args = parser.parse_args()
+
+    if args.save_fixture:
+        with open(args.save_fixture, "w", encoding="utf-8") as handle:
+            handle.write(synthetic_page())
+        print(f"已保存合成页面: {args.save_fixture}")
+        return
+
+    pages = []
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as handle:
+            pages.append((os.path.basename(path), handle.read()))
+    if not pages:
+        pages.append(("synthetic.html", synthetic_page()))
+
+    for name, html in pages:
+        legacy, legacy_time, legacy_peak = measure(legacy_parse, html, args.repeat)
+        fast, fast_time, fast_peak = measure(fast_parse, html, args.repeat)
+        # YAML 把 undefined 解析为字符串，JSON 路径归一化为 null，比较前统一
+        same = json.dumps(legacy, sort_keys=True).replace('"undefined"', "null") == json.dumps(fast, sort_keys=True)
+        print(f"{name}（{len(html.encode('utf-8')) / 1024:.0f} KB）")
+        print(f"  lxml + YAML : {legacy_time * 1000:9.1f} ms  峰值内存 {legacy_peak / 1024 / 1024:7.1f} MB")
+        print(f"  扫描 + JSON : {fast_time * 1000:9.1f} ms  峰值内存 {fast_peak / 1024 / 1024:7.1f} MB")
+        print(f"  加速比 {legacy_time / fast_time:.0f}x，结果{'一致' if same else '不一致'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+笔记字段提取基准：旧版 Namespace（整树 SimpleNamespace + 每次 deepcopy） vs 预编译路径直接在 dict 上取值
+
+用法（在 server 目录下）：
+    python benchmarks/bench_namespace.py note1.html note2.json ...
+    python benchmarks/bench_namespace.py --repeat 2000
+
+页面可以是保存的笔记 HTML（经 Converter 提取）或已提取的笔记 JSON；不传时使用合成笔记页面。
+每轮执行一次与 Explore.run / Image.get_image_link / Video.get_video_link 相同的取值序列（含构造 Namespace），
+报告每篇笔记的平均耗时，并校验两种实现取到的值一致。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from copy import deepcopy
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_page  # noqa: E402
+from xhs_downloader.source.expansion import Converter, Namespace  # noqa: E402
+
+NOTE_CHAINS = [
+    ("interactInfo.collectedCount", "-1"),
+    ("interactInfo.commentCount", "-1"),
+    ("interactInfo.shareCount", "-1"),
+    ("interactInfo.likedCount", "-1"),
+    ("tagList", []),
+    ("noteId", ""),
+    ("title", ""),
+    ("desc", ""),
+    ("type", ""),
+    ("imageList", []),
+    ("time", ""),
+    ("lastUpdateTime", ""),
+    ("time", ""),
+    ("user.nickname", ""),
+    ("user.userId", ""),
+    ("video.consumer.originVideoKey", ""),
+    ("imageList", []),
+]
+ITEM_CHAINS = {"tagList": ["name"], "imageList": ["urlDefault", "stream.h264[0].masterUrl"]}
+
+
+class LegacyNamespace:
+    """改造前的实现：构造时转换整棵树，每次取值 deepcopy 整个对象"""
+
+    def __init__(self, data: dict) -> None:
+        self.data = Namespace.generate_data_object(data)
+
+    def safe_extract(self, attribute_chain, default=""):
+        return self.object_extract(self.data, attribute_chain, default)
+
+    @staticmethod
+    def object_extract(data_object, attribute_chain, default=""):
+        data = deepcopy(data_object)
+        for attribute in attribute_chain.split("."):
+            if "[" in attribute:
+                parts = attribute.split("[", 1)
+                attribute = parts[0]
+                index = parts[1][:-1]
+                try:
+                    index = int(index)
+                    data = getattr(data, attribute, None)[index]
+                except (IndexError, TypeError, ValueError):
+                    return default
+            else:
+                data = getattr(data, attribute, None)
+                if not data:
+                    return default
+        return data or default
+
+
+def extract_note(cls, note: dict) -> list:
+    data = cls(note)
+    values = []
+    for chain, default in NOTE_CHAINS:
+        value = data.safe_extract(chain, default)
+        if chain in ITEM_CHAINS:
+            value = [[cls.object_extract(item, c) for c in ITEM_CHAINS[chain]] for item in value]
+        values.append(value)
+    return values
+
+
+def load_note(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as handle:
+        content = handle.read()
+    if path.endswith(".json"):
+        return json.loads(content)
+    return Converter().run(content)
+
+
+def normalise(value):
+    return json.dumps(value, default=lambda o: vars(o) if isinstance(o, SimpleNamespace) else str(o), sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("notes", nargs="*", help="笔记 HTML 页面或 JSON 文件")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    notes = [(os.path.basename(path), load_note(path)) for path in args.notes]
+    if not notes:
+        notes.append(("synthetic.html", Converter().run(synthetic_page())))
+
+    for name, note in notes:
+        if not note:
+            print(f"{name}: 未提取到笔记数据，跳过")
+            continue
+        timings = {}
+        for label, cls in (("旧版 deepcopy", LegacyNamespace), ("预编译路径", Namespace)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                result = extract_note(cls, note)
+            timings[label] = ((time.perf_counter() - started) / args.repeat, result)
+        (legacy_time, legacy), (fast_time, fast) = timings.values()
+        same = normalise(legacy) == normalise(fast)
+        print(f"{name}（{len(json.dumps(note, ensure_ascii=False)) / 1024:.0f} KB）")
+        for label, (elapsed, _) in timings.items():
+            print(f"  {label}: {elapsed * 1e6:9.1f} µs/篇")
+        print(f"  加速比 {legacy_time / fast_time:.0f}x，结果{'一致' if same else '不一致'}")
+
+
+if __name__ == "__main__":
+    main()
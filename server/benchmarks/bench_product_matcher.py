@@ -0,0 +1,80 @@
+"""
+商品关键词匹配基准：逐个关键词 `in` 扫描（旧实现） vs Aho-Corasick 自动机（ProductMatcher）
+
+用法（在 server 目录下）：
+    python benchmarks/bench_product_matcher.py [--keywords 10000] [--names 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_mapping_service import ProductMatcher  # noqa: E402
+
+# 常用汉字区间，随机拼出关键词与商品标题
+CHARSET = [chr(code) for code in range(0x4E00, 0x4E00 + 800)]
+
+
+def legacy_map(product_name, mapping):
+    for keyword, mapped_value in mapping.items():
+        if keyword in product_name:
+            return mapped_value
+    return product_name
+
+
+def build_mapping(count, rng):
+    mapping = {}
+    while len(mapping) < count:
+        keyword = "".join(rng.choice(CHARSET) for _ in range(rng.randint(2, 6)))
+        mapping[keyword] = f"SKU{len(mapping):05d}"
+    return mapping
+
+
+def build_names(count, keywords, rng):
+    names = []
+    for _ in range(count):
+        parts = ["".join(rng.choice(CHARSET) for _ in range(rng.randint(4, 12)))]
+        # 约一半的标题包含某个关键词
+        if rng.random() < 0.5:
+            parts.insert(rng.randint(0, 1), rng.choice(keywords))
+        parts.append("".join(rng.choice(CHARSET) for _ in range(rng.randint(0, 20))))
+        names.append("".join(parts))
+    return names
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", type=int, default=10000)
+    parser.add_argument("--names", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mapping = build_mapping(args.keywords, rng)
+    names = build_names(args.names, list(mapping), rng)
+
+    matcher, build_time = timed(ProductMatcher, mapping)
+    legacy, legacy_time = timed(lambda: [legacy_map(name, mapping) for name in names])
+    compiled, compiled_time = timed(matcher.map_many, names)
+
+    hits = sum(1 for name, mapped in zip(names, compiled) if mapped != name)
+    differs = sum(1 for old, new in zip(legacy, compiled) if old != new)
+    print(f"关键词 {len(mapping)} 个，商品标题 {len(names)} 条，命中 {hits} 条")
+    print(f"自动机构建: {build_time * 1000:.1f} ms")
+    print(f"旧实现逐词扫描: {legacy_time * 1000:.1f} ms（{legacy_time / len(names) * 1e6:.1f} µs/条）")
+    print(f"ProductMatcher: {compiled_time * 1000:.1f} ms（{compiled_time / len(names) * 1e6:.1f} µs/条）")
+    print(f"加速比: {legacy_time / compiled_time:.1f}x")
+    print(f"结果不同: {differs} 条（旧实现取字典顺序的首个命中，新实现取最长关键词）")
+
+
+if __name__ == "__main__":
+    main()
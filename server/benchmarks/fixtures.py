@@ -0,0 +1,52 @@
+"""
+基准脚本共用的合成数据（只依赖标准库，各基准按需引入自己的第三方依赖）
+"""
+import json
+import random
+import time
+
+
+def synthetic_page(size_kb=400, seed=3):
+    rng = random.Random(seed)
+
+    def text(length):
+        return "".join(chr(rng.randint(0x4E00, 0x4FFF)) for _ in range(length))
+
+    comments = []
+    while len(json.dumps(comments, ensure_ascii=False)) < size_kb * 1024:
+        comments.append({
+            "id": f"{rng.getrandbits(96):024x}",
+            "content": text(rng.randint(10, 80)),
+            "likeCount": str(rng.randint(0, 9999)),
+            "userInfo": {"nickname": text(6), "image": f"https://sns-avatar-qc.xhscdn.com/avatar/{rng.getrandbits(64):x}"},
+            "subComments": [],
+            "ipLocation": "__UNDEFINED__",
+        })
+    state = {
+        "global": {"appSettings": {"notificationInterval": 30}, "serverTime": int(time.time() * 1000)},
+        "user": {"loggedIn": False, "userInfo": "__UNDEFINED__"},
+        "note": {
+            "noteDetailMap": {
+                "66a0c0f5000000001e01a5b3": {
+                    "comments": {"list": comments, "cursor": "", "hasMore": True},
+                    "note": {
+                        "noteId": "66a0c0f5000000001e01a5b3",
+                        "title": text(20),
+                        "desc": text(300),
+                        "type": "normal",
+                        "interactInfo": {"likedCount": "1.2万", "collectedCount": "3456", "commentCount": "789"},
+                        "imageList": [{"urlDefault": f"https://sns-webpic-qc.xhscdn.com/{i}"} for i in range(9)],
+                        "video": "__UNDEFINED__",
+                    },
+                }
+            }
+        },
+    }
+    blob = json.dumps(state, ensure_ascii=False, separators=(",", ":")).replace('"__UNDEFINED__"', "undefined")
+    filler = "".join(f'<div class="feed-{i}"><a href="/explore/{i}">{text(12)}</a></div>' for i in range(300))
+    return (
+        "<!doctype html><html><head><meta charset=\"utf-8\"><title>小红书</title>"
+        "<script>window.__SSR__=true</script></head><body>"
+        f"{filler}<script>window.__INITIAL_STATE__={blob}</script>"
+        "<script src=\"/static/main.js\"></script></body></html>"
+    )
@@ -0,0 +1,337 @@
+"""
+抖音视频处理辅助函数
+下载（f2）→ 上传飞书素材 → 创建多维表记录，各阶段拆分为独立函数，
+既可在请求中串行调用，也可由任务队列按阶段调度。
+"""
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from f2.apps.douyin.crawler import DouyinCrawler, PostDetail
+from f2.apps.douyin.dl import DouyinDownloader
+from requests.adapters import HTTPAdapter
+
+import feishu_table as feishu
+from async_runtime import get_runtime
+from job_queue import chain
+from product_mapping_service import load_product_mapping, map_product_name, extract_product_info, find_product_keyword
+
+logger = logging.getLogger(__name__)
+
+# 视频传输模式：disk 先下载到 DOWNLOAD_DIR 再上传；stream 从 CDN 直接流式上传到飞书，不落盘
+TRANSFER_MODE_DISK = "disk"
+TRANSFER_MODE_STREAM = "stream"
+TRANSFER_MODES = (TRANSFER_MODE_DISK, TRANSFER_MODE_STREAM)
+DEFAULT_TRANSFER_MODE = os.getenv("DOUYIN_TRANSFER_MODE", TRANSFER_MODE_DISK).lower()
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_stream_session: Optional[requests.Session] = None
+_stream_session_lock = threading.Lock()
+
+DOUYIN_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0"
+DOUYIN_COOKIE = os.getenv("DOUYIN_COOKIE", "bd_ticket_guard_client_web_domain=2; live_use_vvc=%22false%22; store-region=cn-hb; store-region-src=uid; hevc_supported=true; SelfTabRedDotControl=%5B%5D; xgplayer_user_id=73509612205; xgplayer_device_id=97526515781; n_mh=9-mIeuD4wZnlYrrOvfzG3MuT6aQmCUtmr8FxV8Kl8xY; __live_version__=%221.1.3.519%22; SearchMultiColumnLandingAbVer=1; SEARCH_RESULT_LIST_TYPE=%22multi%22; theme=%22light%22; enter_pc_once=1; is_staff_user=false; d_ticket=37143149636914e9578d19de548f6905cfb72; passport_assist_user=Cj8Ts8FVwRqJr1v98EWtLj_Gy9RxQdvd1QBRP_ljzu_gvNNnalyA8fR3UDv2RDRmZn3EUOdysavh9ERIDpMUChEaSgo8AAAAAAAAAAAAAE891LiUK62M1U20pNLuK_iec-5n14zYMF6qyhMBeH5-pmBooHTxvvZIiPxkQ0kYdT9CEN7y9g0Yia_WVCABIgEDEPxTnQ%3D%3D; uid_tt=6feaf6442a589053a8fd82c49b31d519; uid_tt_ss=6feaf6442a589053a8fd82c49b31d519; sid_tt=8d310cc387442877d3aa4076790d75d4; sessionid_ss=8d310cc387442877d3aa4076790d75d4; login_time=1752669402602; __druidClientInfo=JTdCJTIyY2xpZW50V2lkdGglMjIlM0EyOTglMkMlMjJjbGllbnRIZWlnaHQlMjIlM0E0NDclMkMlMjJ3aWR0aCUyMiUzQTI5OCUyQyUyMmhlaWdodCUyMiUzQTQ0NyUyQyUyMmRldmljZVBpeGVsUmF0aW8lMjIlM0EyLjM5MjUwMDE2MjEyNDYzNCUyQyUyMnVzZXJBZ2VudCUyMiUzQSUyMk1vemlsbGElMkY1LjAlMjAoV2luZG93cyUyME5UJTIwMTAuMCUzQiUyMFdpbjY0JTNCJTIweDY0KSUyMEFwcGxlV2ViS2l0JTJGNTM3LjM2JTIwKEtIVE1MJTJDJTIwbGlrZSUyMEdlY2tvKSUyMENocm9tZSUyRjEzNi4wLjAuMCUyMFNhZmFyaSUyRjUzNy4zNiUyMiU3RA==; UIFID_TEMP=28ea90c1b0cf804752225259882c701fb12323f08ef828fc1032b615e29efbbe284c71b6b91371623513ffcf74f19a3685d9b5481ee218c0226c15853a3987f771501a4cd016d2934472916e0fe218aa; fpk1=U2FsdGVkX1/Nox6hMzmakvRdvL55xEuVxx0/Qgy2zFFtXA3ogvorvBlxwwK2eahHRoI8eYBFqj0rx3y2SWAYDw==; fpk2=0e0369e2813db7deb26e5937c353aab4; UIFID=28ea90c1b0cf804752225259882c701fb12323f08ef828fc1032b615e29efbbe35cc4916a88c9a1d2c4f38e526102eecaba3629149dc23be141a59b83c16f86f2e9e5c5c1923c027773de62a4dee2b618f6cf724c95615849c9dc3636d2f2ef1a13956440290f0ca734787dbd691848f5ac1c981de663d8f0cd05af54b924e53b07a44b6e05a5d7aaa565ae8875085625b75a1c5cb83670d36e1b43d7271b5b0; __security_mc_1_s_sdk_crypt_sdk=9c09da64-4128-a242; __security_mc_1_s_sdk_cert_key=a882b0fc-4b8d-8390; passport_csrf_token=92674daafb36b50004014d008e155001; passport_csrf_token_default=92674daafb36b50004014d008e155001; s_v_web_id=verify_mfweipo0_kNeXCV5e_PNz1_4KhU_B6fn_KVYujburyP1Z; __security_mc_1_s_sdk_sign_data_key_web_protect=531caaa7-460e-baf7; is_dash_user=1; sid_guard=8d310cc387442877d3aa4076790d75d4%7C1760694863%7C5184000%7CTue%2C+16-Dec-2025+09%3A54%3A23+GMT; sessionid=8d310cc387442877d3aa4076790d75d4; sid_ucp_v1=1.0.0-KGFmMjJjNGEwOGUzMzEzNmFjNzAyZDViYWQzOGQ4MTA3YTRjNWU0NGUKIAjj1JCqhM0GEM-kyMcGGO8xIAwwwKmRrAY4B0D0B0gEGgJobCIgOGQzMTBjYzM4NzQ0Mjg3N2QzYWE0MDc2NzkwZDc1ZDQ; ssid_ucp_v1=1.0.0-KGFmMjJjNGEwOGUzMzEzNmFjNzAyZDViYWQzOGQ4MTA3YTRjNWU0NGUKIAjj1JCqhM0GEM-kyMcGGO8xIAwwwKmRrAY4B0D0B0gEGgJobCIgOGQzMTBjYzM4NzQ0Mjg3N2QzYWE0MDc2NzkwZDc1ZDQ; publish_badge_show_info=%220%2C0%2C0%2C1760946606136%22; download_guide=%223%2F20251020%2F0%22; session_tlb_tag=sttt%7C13%7CjTEMw4dEKHfTqkB2eQ111P_________AFMFsDkfR2RWWZu4UOI714T_KV-nrHbwCQ5EoI_22oZE%3D; playRecommendGuideTagCount=13; totalRecommendGuideTagCount=13; dy_swidth=1325; dy_sheight=745; stream_recommend_feed_params=%22%7B%5C%22cookie_enabled%5C%22%3Atrue%2C%5C%22screen_width%5C%22%3A1325%2C%5C%22screen_height%5C%22%3A745%2C%5C%22browser_online%5C%22%3Atrue%2C%5C%22cpu_core_num%5C%22%3A24%2C%5C%22device_memory%5C%22%3A8%2C%5C%22downlink%5C%22%3A10%2C%5C%22effective_type%5C%22%3A%5C%224g%5C%22%2C%5C%22round_trip_time%5C%22%3A50%7D%22; volume_info=%7B%22isUserMute%22%3Afalse%2C%22isMute%22%3Atrue%2C%22volume%22%3A0.976%7D; WallpaperGuide=%7B%22showTime%22%3A1760947412272%2C%22closeTime%22%3A0%2C%22showCount%22%3A3%2C%22cursor1%22%3A86%2C%22cursor2%22%3A28%7D; __ac_nonce=068f90467006fa53e1dde; __ac_signature=_02B4Z6wo00f01Ef3sJAAAIDAybrGpBc2NsxH17QAAHkMa1; strategyABtestKey=%221761150057.502%22; ttwid=1%7CeG1xfsoe_CWPEpcGmmRqV6VGOr2TwQnfHP5012UIHGg%7C1761150056%7C89a27cc0424490a1a4d906dc673af79c17b655cf2506d07c9c2190a9a94317d5; sdk_source_info=7e276470716a68645a606960273f276364697660272927676c715a6d6069756077273f276364697660272927666d776a68605a607d71606b766c6a6b5a7666776c7571273f275e5927666d776a686028607d71606b766c6a6b3f2a2a646063606d616d61666c6c606a66646e636a677564646a696d6c756e667562662a666a6b71606b715a7666776c7571762a666a757c2b6f765927295927666d776a686028607d71606b766c6a6b3f2a2a61676f67606875696f6d66686d69637563646664696a686a6b6f756469756e6a2a7666776c7571762a6c6b76756066716a772b6f76592758272927666a6b766a69605a696c6061273f27636469766027292762696a6764695a7364776c6467696076273f275e582729277672715a646971273f2763646976602729277f6b5a666475273f2763646976602729276d6a6e5a6b6a716c273f2763646976602729276c6b6f5a7f6367273f27636469766027292771273f273d363436333535303434333234272927676c715a75776a716a666a69273f2763646976602778; bit_env=KyGujVy1BHnPGXHbUj1rhYqAvMzTMs0IlZUWX8883LhiJm4VEripCHKWh8PXo1Rg69ofjFdXXX5ZZdHKPIauf8DT3CiP31pUQ-4DuzsawZQ6pPC_xnA4VPyqgLSyn8AECnOi3jfyf8pbVkMeGxmGAMNY2okCUNyoRlvQh2u1VnfG42GdLVSm4yLnm2BFLaxn5Z-IPQgd8AVdmjQ0hkVRNnncsXgOeYNAmwNYzSi_6lUba5PQrqGiityhxxRtziKuXJLqKwDTejbYLJ0kTLkL966FXvc5ylyyh5ZNt86BpxHqDbaytTdOUEQ0e17e3ub7h43LBBRHGUZHOZClrJ-m6z-TcVm728bmkD52fK1IzCd2ktLppOvgFdH_73nomfkFTN153ajby92eME5NubQjp-dUzUkZjs-29IFBjTobCBV0Z480Pll_JJJ8VinErc8WJSkpTmYazUMiu8c9TNe86cgoUF8QfvDJvyK-lFIIVHFKl1qMPGSA16M0qnYy1tzp; gulu_source_res=eyJwX2luIjoiYmM5OWY5NGU3MmYzZDQ4ZDRiMWU2Mzc1MzQ3MzY4YTYwNzI5OTJmZWE2ZDJhMDFiZDE3ZWVmZjAzMTk3ZDk3NyJ9; passport_auth_mix_state=cvovi23y6uge1gxyl18oxsz13c0m2dcp; odin_tt=b9efcd00b3cf615069a082bcd3307278e4be61d61e089b9f811acaa975b54481fd23937ec9628b1740e60460a2cee11a8f857dee614a3c03a45dca2b8c210162; biz_trace_id=af6fa95c; IsDouyinActive=true; FOLLOW_LIVE_POINT_INFO=%22MS4wLjABAAAAk33rRYtXKgtE1sOVuGF19VouIP6KwRZw49L6iJntY7E%2F1761235200000%2F0%2F0%2F1761150881480%22; FOLLOW_NUMBER_YELLOW_POINT_INFO=%22MS4wLjABAAAAk33rRYtXKgtE1sOVuGF19VouIP6KwRZw49L6iJntY7E%2F1761235200000%2F0%2F1761150281480%2F0%22; home_can_add_dy_2_desktop=%221%22; bd_ticket_guard_client_data=eyJiZC10aWNrZXQtZ3VhcmQtdmVyc2lvbiI6MiwiYmQtdGlja2V0LWd1YXJkLWl0ZXJhdGlvbi12ZXJzaW9uIjoxLCJiZC10aWNrZXQtZ3VhcmQtcmVlLXB1YmxpYy1rZXkiOiJCQytIbWhFbklkQitDU1dmQlVoQTNKRnVlOHFNcFJ4Q1ZlV1MrZEVyQ2xZNVFGdC9odnZqa0RUM1B5MEQwMGswOGpuaUR1UnJFaVp4eklnMkF6WXdFckE9IiwiYmQtdGlja2V0LWd1YXJkLXdlYi12ZXJzaW9uIjoyfQ%3D%3D; bd_ticket_guard_client_data_v2=eyJyZWVfcHVibGljX2tleSI6IkJDK0htaEVuSWRCK0NTV2ZCVWhBM0pGdWU4cU1wUnhDVmVXUytkRXJDbFk1UUZ0L2h2dmprRFQzUHkwRDAwazA4am5pRHVSckVpWnh6SWcyQXpZd0VyQT0iLCJ0c19zaWduIjoidHMuMi4wOGJkMDhiNGEzMTllMWI2YjkxMGEyOWUyMWZmYzc0NWRjMjkyN2ZmN2I0MDg2YWI5ZWZiZGNmMzdhMGU5Zjg4YzRmYmU4N2QyMzE5Y2YwNTMxODYyNGNlZGExNDkxMWNhNDA2ZGVkYmViZWRkYjJlMzBmY2U4ZDRmYTAyNTc1ZCIsInJlcV9jb250ZW50Ijoic2VjX3RzIiwicmVxX3NpZ24iOiJvdTVHSjRJa3N3dTE5TW45TDNTcjlwQWRSdW8vdStkdnBHeWh2VVhrbWs4PSIsInNlY190cyI6IiNSM0lUQzMxWUF6NVBnYnhqeVJFdXA5SmYyRC91UURaZHRUMWFpVzlQM01OMlgyeVZsb0xrRjhsMERuQjIifQ%3D%3D")
+
+
+def extract_video_id_from_url(page_url: str) -> str | None:
+    """支持两种格式：
+    1) https://www.douyin.com/video/{id}
+    2) https://www.douyin.com/user/...?...&modal_id={id}
+    返回提取到的 video_id 或 None。
+    """
+    try:
+        if not page_url:
+            return None
+        # 优先匹配 /video/{id}
+        m = re.search(r"/video/(\d+)", page_url)
+        if m:
+            return m.group(1)
+        # 再从查询参数 modal_id 抓取
+        parsed = urlparse(page_url)
+        qs = parse_qs(parsed.query or "")
+        modal_id = qs.get("modal_id")
+        if modal_id and len(modal_id) > 0 and modal_id[0].isdigit():
+            return modal_id[0]
+        return None
+    except Exception:
+        return None
+
+
+def build_f2_kwargs(video_id: str, download_dir: str) -> Dict[str, Any]:
+    """构建 f2 爬虫/下载器参数"""
+    return {
+        "headers": {
+            "User-Agent": DOUYIN_USER_AGENT,
+            "Referer": "https://www.douyin.com/",
+        },
+        "proxies": {"http://": None, "https://": None},
+        "cookie": DOUYIN_COOKIE,
+        "url": f"https://www.douyin.com/{video_id}",
+        'video': True,  # 下载视频
+        'music': False,  # 不下载音乐
+        'cover': False,  # 不下载封面
+        'desc': False,  # 不下载文案
+        'folderize': False,  # 不创建子文件夹
+        'interval': 'all',  # 下载所有
+        'path': download_dir,
+        'naming': "{aweme_id}_{create}",
+        'timeout': 30,  # 设置超时时间
+    }
+
+
+async def _get_crawler() -> DouyinCrawler:
+    """常驻事件循环上共享的 DouyinCrawler（复用 httpx 连接池）"""
+    async def _create() -> DouyinCrawler:
+        crawler = DouyinCrawler(build_f2_kwargs("", ""))
+        await crawler.__aenter__()
+        return crawler
+
+    return await get_runtime().resource(
+        "douyin_crawler", _create, lambda crawler: crawler.__aexit__(None, None, None)
+    )
+
+
+async def _get_downloader() -> DouyinDownloader:
+    """常驻事件循环上共享的 DouyinDownloader；保存路径等参数在每次下载时单独传入"""
+    async def _create() -> DouyinDownloader:
+        return DouyinDownloader(build_f2_kwargs("", ""))
+
+    return await get_runtime().resource("douyin_downloader", _create)
+
+
+async def fetch_aweme_detail(video_id: str, download_dir: str = "") -> Dict[str, Any]:
+    """通过 f2 获取作品详情（不下载视频）；需经 async_runtime.run_async 执行"""
+    crawler = await _get_crawler()
+    try:
+        post_detail = await crawler.fetch_post_detail(PostDetail(aweme_id=video_id))
+    except Exception:
+        # 连接可能已失效，丢弃后下次重新创建
+        await get_runtime().discard("douyin_crawler")
+        raise
+    return post_detail['aweme_detail']
+
+
+async def download_with_f2(video_id: str, download_dir: str):
+    """获取作品详情并下载视频到 download_dir；需经 async_runtime.run_async 执行"""
+    kwargs = build_f2_kwargs(video_id, download_dir)
+    aweme_data = await fetch_aweme_detail(video_id, download_dir)
+
+    user_path = download_dir
+    downloader = await _get_downloader()
+
+    aweme_datas = []
+    dl_aweme_data = {
+                    'aweme_id': aweme_data['aweme_id'],
+                    'desc': aweme_data['desc'],
+                    'create_time': aweme_data['create_time'],
+                    'sec_user_id': aweme_data['author']['sec_uid'],
+                    'video_play_addr': aweme_data['video']['play_addr']['url_list'][0],
+                    'is_prohibited': False,
+                    'private_status': 0,
+                    'aweme_type': 0,  # 视频类型,
+                    'nickname': aweme_data['author']['nickname']
+    }
+    aweme_datas.append(dl_aweme_data)
+    await downloader.create_download_tasks(kwargs=kwargs, aweme_datas=aweme_datas, user_path=user_path)
+
+    video_path = os.path.join(user_path, f"{aweme_data['aweme_id']}_{aweme_data['create_time']}_video.mp4")
+    if not video_path or not os.path.isfile(video_path):
+        logger.error("视频未找到或未成功下载: %s", video_path)
+        raise FileNotFoundError(f"视频未找到: {video_path}")
+
+    aweme_data["video_path"] = video_path
+
+    return aweme_data
+
+
+def build_video_filename(aweme_data: Dict[str, Any]) -> str:
+    """按 {创建时间}_{作者昵称}_{aweme_id}.mp4 生成上传文件名"""
+    ct_raw = aweme_data.get("create_time")
+    try:
+        ct_sec = int(ct_raw)
+        ct_str = datetime.fromtimestamp(ct_sec).strftime("%Y年%m月%d日%H_%M_%S")
+    except Exception:
+        try:
+            dt = datetime.fromisoformat(str(ct_raw).replace("Z", "+00:00"))
+        except Exception:
+            dt = None
+        ct_str = dt.strftime("%Y年%m月%d日%H_%M_%S") if dt else str(ct_raw)
+
+    return f"{ct_str}_{aweme_data['author']['nickname']}_{aweme_data['aweme_id']}.mp4"
+
+
+def upload_video_file(
+    aweme_data: Dict[str, Any],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """上传阶段：把已下载的视频文件上传到飞书多维表素材库"""
+    filename = build_video_filename(aweme_data)
+    upload_result = feishu.upload_file_to_bitable(
+        file_path=aweme_data["video_path"],
+        file_name=filename,
+        parent_node=feishu.APP_TOKEN,
+        parent_type="bitable_file",
+        progress_callback=progress_callback,
+    )
+    if not upload_result.get("success"):
+        return upload_result
+
+    if not upload_result.get("file_token"):
+        return {"success": False, "message": "上传成功但未获取到 file_token"}
+
+    upload_result["file_name"] = filename
+    return upload_result
+
+
+def _get_stream_session() -> requests.Session:
+    global _stream_session
+    with _stream_session_lock:
+        if _stream_session is None:
+            session = requests.Session()
+            session.headers.update({"User-Agent": DOUYIN_USER_AGENT, "Referer": "https://www.douyin.com/"})
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _stream_session = session
+        return _stream_session
+
+
+def stream_video_to_feishu(
+    aweme_data: Dict[str, Any],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    上传阶段（stream 模式）：CDN 响应体直接分片上传到飞书，不写本地文件
+
+    先根据 Content-Length 选择 upload_all 或分片上传；
+    CDN 未返回 Content-Length 时返回 None，由调用方回退到 disk 模式。
+    """
+    play_addr = aweme_data["video"]["play_addr"]["url_list"][0]
+    filename = build_video_filename(aweme_data)
+
+    with _get_stream_session().get(play_addr, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        content_length = int(response.headers.get("Content-Length") or 0)
+        if content_length <= 0 or response.headers.get("Content-Encoding"):
+            logger.warning("视频响应缺少 Content-Length，回退为落盘上传: %s", aweme_data.get("aweme_id"))
+            return None
+
+        logger.info("流式上传视频 %s（%.2fMB）", filename, content_length / 1024 / 1024)
+        upload_result = feishu.upload_stream_to_bitable(
+            response.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+            filename,
+            content_length,
+            parent_node=feishu.APP_TOKEN,
+            parent_type="bitable_file",
+            progress_callback=progress_callback,
+        )
+
+    if upload_result.get("success") and not upload_result.get("file_token"):
+        return {"success": False, "message": "上传成功但未获取到 file_token"}
+    upload_result["file_name"] = filename
+    return upload_result
+
+
+def _build_video_record(aweme_data: Dict[str, Any], upload_result: Dict[str, Any], channel: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """校验产品名称映射并组装记录字段，返回 (字段, None)；校验失败返回 (None, 失败结果)"""
+    file_token = upload_result["file_token"]
+    filename = upload_result.get("file_name") or build_video_filename(aweme_data)
+
+    product_mapping = load_product_mapping()
+    product_name = extract_product_info(aweme_data)
+    mapped_product_name = map_product_name(product_name, product_mapping)
+
+    if channel and channel == "bit_playwright":
+        if not product_name:
+            return None, {"success": False, "message": "飞书表格记录创建失败，产品名称IS NONE"}
+
+        if not find_product_keyword(product_name, product_mapping):
+            print(f"product_name: {product_name}")
+            return None, {"success": False, "message": "飞书表格记录创建失败，未找到对应的产品名称 "+ product_name}
+
+    title = aweme_data.get("desc") or ""
+
+    record_fields = {
+        feishu.FIELD_REMARK: '速发',
+        feishu.FIELD_TITLE: title,
+        feishu.FIELD_PRODUCT_NAME: mapped_product_name,
+        feishu.FIELD_VIDEO_ID: aweme_data.get("aweme_id") or "",
+        feishu.FIELD_ATTACHMENT: [
+            {
+                "file_token": file_token,
+                "name": filename,
+                "type": "file",
+            }
+        ],
+    }
+
+    if mapped_product_name and mapped_product_name != product_name:
+        record_fields["品"] = mapped_product_name
+    return record_fields, None
+
+
+def _video_record_result(aweme_data: Dict[str, Any], upload_result: Dict[str, Any], record_success: bool) -> Dict[str, Any]:
+    if not record_success:
+        return {"success": False, "message": "飞书表格记录创建失败"}
+
+    return {
+        "success": True,
+        "file_token": upload_result["file_token"],
+        "message": "飞书表格记录创建成功",
+        "aweme_id": aweme_data["aweme_id"],
+    }
+
+
+def create_video_record(aweme_data: Dict[str, Any], upload_result: Dict[str, Any], channel: str = "") -> Dict[str, Any]:
+    """记录阶段：校验产品名称映射并在抖音多维表中创建记录"""
+    record_fields, failure = _build_video_record(aweme_data, upload_result, channel)
+    if failure:
+        return failure
+    access_token = upload_result.get("access_token") or feishu.get_tenant_access_token()
+    record_success = feishu.create_douyin_record(record_fields, access_token=access_token)
+    return _video_record_result(aweme_data, upload_result, record_success)
+
+
+def create_video_record_async(aweme_data: Dict[str, Any], upload_result: Dict[str, Any], channel: str = "") -> Future:
+    """
+    create_video_record 的非阻塞版本，Future 结果与其返回值相同。
+
+    记录进入批量写入缓冲区后立即返回，任务队列的记录线程不必等待批次发送，
+    并发的多个任务因此能合并进同一次 records/batch_create。
+    """
+    record_fields, failure = _build_video_record(aweme_data, upload_result, channel)
+    if failure:
+        future: Future = Future()
+        future.set_result(failure)
+        return future
+    return chain(
+        feishu.create_douyin_record_async(record_fields),
+        lambda record_success: _video_record_result(aweme_data, upload_result, record_success),
+    )
+
+
+def upload_video_to_feishu(aweme_data: Dict[str, Any], channel: str = "") -> Dict[str, Any]:
+    """上传视频并创建记录（上传阶段 + 记录阶段串行执行）"""
+    upload_result = upload_video_file(aweme_data)
+    if not upload_result.get("success"):
+        return upload_result
+    return create_video_record(aweme_data, upload_result, channel)
+
+
+__all__ = [
+    "extract_video_id_from_url",
+    "TRANSFER_MODES",
+    "DEFAULT_TRANSFER_MODE",
+    "fetch_aweme_detail",
+    "download_with_f2",
+    "stream_video_to_feishu",
+    "upload_video_file",
+    "create_video_record",
+    "create_video_record_async",
+    "upload_video_to_feishu",
+]
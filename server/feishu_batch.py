@@ -0,0 +1,195 @@
+"""
+飞书多维表批量写入（records/batch_create）
+
+BatchRecordWriter 按 app_token + table_id 缓冲待创建的记录：
+- 攒够 FEISHU_BATCH_MAX_SIZE 条（上限 500）或最早一条等待超过 FEISHU_BATCH_MAX_DELAY 秒即发送
+- 每个调用方拿到自己的 Future，结果为该行创建出的 record（失败为 None）
+- 行数据校验失败时二分重试，单条坏数据只影响它自己
+- 限流、写冲突、服务端错误、网络异常与数据无关，整批退避重试（client_token 保证不会重复创建），仍失败则整批失败
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import feishu_index
+from feishu_client import TOKEN_INVALID_CODES, FeishuClient, get_client
+
+BATCH_CREATE_LIMIT = 500
+BATCH_MAX_SIZE = min(BATCH_CREATE_LIMIT, int(os.getenv("FEISHU_BATCH_MAX_SIZE", "100")))
+BATCH_MAX_DELAY = float(os.getenv("FEISHU_BATCH_MAX_DELAY", "0.5"))
+# 同步等待批量结果的超时（秒）
+BATCH_RESULT_TIMEOUT = float(os.getenv("FEISHU_BATCH_RESULT_TIMEOUT", "60"))
+# 整批重试：次数与初始退避秒数（指数增长）
+BATCH_RETRIES = int(os.getenv("FEISHU_BATCH_RETRIES", "3"))
+BATCH_RETRY_BACKOFF = 0.5
+
+# 行数据校验失败（1254001 请求体错误、1254045 字段不存在、1254060~1254074 字段值转换失败）：
+# batch_create 整批原子失败，需要二分定位坏行
+DATA_ERROR_CODES = {1254001, 1254045, *range(1254060, 1254075)}
+# 与数据无关的失败：限流 1254290、写冲突 1254291、数据未就绪 1254607、服务端内部错误 1255001~1255040、
+# token 失效，以及网络异常 / 非 JSON 响应（code=-1）
+TRANSIENT_ERROR_CODES = {-1, 1254290, 1254291, 1254607, *range(1255001, 1255041), *TOKEN_INVALID_CODES}
+
+_TableKey = Tuple[str, str]
+_Pending = Tuple[Dict[str, Any], Future, float]
+
+
+class BatchRecordWriter:
+    """缓冲式记录写入器（线程安全，进程内共享一个实例）"""
+
+    def __init__(
+        self,
+        client: Optional[FeishuClient] = None,
+        *,
+        max_size: int = BATCH_MAX_SIZE,
+        max_delay: float = BATCH_MAX_DELAY,
+    ):
+        self.client = client or get_client()
+        self.max_size = max(1, min(max_size, BATCH_CREATE_LIMIT))
+        self.max_delay = max_delay
+        self._buffers: Dict[_TableKey, List[_Pending]] = {}
+        self._cond = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+
+    def submit(self, fields: Dict[str, Any], *, app_token: str, table_id: str) -> Future:
+        """加入缓冲区，返回 Future（结果为 record 字典，失败为 None）"""
+        future: Future = Future()
+        key = (app_token, table_id)
+        with self._cond:
+            self._ensure_flusher()
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append((fields, future, time.time()))
+            full = len(buffer) >= self.max_size
+            batch = self._buffers.pop(key) if full else None
+            self._cond.notify()
+        if batch:
+            self._send(key, batch)
+        return future
+
+    def flush(self) -> None:
+        """立即发送所有缓冲中的记录"""
+        with self._cond:
+            batches = list(self._buffers.items())
+            self._buffers.clear()
+        for key, batch in batches:
+            self._send(key, batch)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="feishu-batch-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffers:
+                    self._cond.wait()
+                now = time.time()
+                oldest = min(batch[0][2] for batch in self._buffers.values())
+                wait_for = self.max_delay - (now - oldest)
+                if wait_for > 0:
+                    self._cond.wait(wait_for)
+                    continue
+                due = [key for key, batch in self._buffers.items() if now - batch[0][2] >= self.max_delay]
+                batches = [(key, self._buffers.pop(key)) for key in due]
+            for key, batch in batches:
+                self._send(key, batch)
+
+    def _send(self, key: _TableKey, batch: List[_Pending]) -> None:
+        for start in range(0, len(batch), BATCH_CREATE_LIMIT):
+            chunk = batch[start:start + BATCH_CREATE_LIMIT]
+            try:
+                self._send_chunk(key, chunk)
+            except Exception as exc:
+                # 发送线程不能因异常退出，也不能留下永远不完成的 Future
+                logging.exception("批量创建飞书记录时出现未预期的异常（%s 条）: %s", len(chunk), exc)
+                for _, future, _ in chunk:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _send_chunk(self, key: _TableKey, batch: List[_Pending]) -> None:
+        app_token, table_id = key
+        data = self._post_batch(app_token, table_id, batch)
+        code = data.get("code")
+
+        if code == 0:
+            records = (data.get("data") or {}).get("records") or []
+            for index, (fields, future, _) in enumerate(batch):
+                record = records[index] if index < len(records) else None
+                if record:
+                    try:
+                        feishu_index.record_created(app_token, table_id, fields, record)
+                    except Exception as exc:
+                        # 记录已创建成功，本地索引写入失败只影响查重，下次对账时补齐
+                        logging.warning("写入本地查重索引失败: %s", exc)
+                future.set_result(record)
+            logging.info("批量创建飞书记录成功: %s 条", len(batch))
+            return
+
+        if code in DATA_ERROR_CODES:
+            # batch_create 整批原子失败：二分后分别重试，定位并隔离坏数据
+            if len(batch) > 1:
+                logging.warning("批量创建失败（%s 条）code=%s msg=%s，拆分重试", len(batch), code, data.get("msg"))
+                middle = len(batch) // 2
+                self._send_chunk(key, batch[:middle])
+                self._send_chunk(key, batch[middle:])
+                return
+            fields, future, _ = batch[0]
+            logging.warning("创建飞书记录失败: code=%s msg=%s fields=%s", code, data.get("msg"), fields)
+            future.set_result(None)
+            return
+
+        logging.error("批量创建飞书记录失败（%s 条）: code=%s msg=%s", len(batch), code, data.get("msg"))
+        for _, future, _ in batch:
+            future.set_result(None)
+
+    def _post_batch(self, app_token: str, table_id: str, batch: List[_Pending]) -> Dict[str, Any]:
+        """发送一次 batch_create；遇到与数据无关的失败时整批退避重试，同一 client_token 保证重试不会重复创建"""
+        client_token = str(uuid.uuid4())
+        for attempt in range(BATCH_RETRIES + 1):
+            try:
+                data = self.client.post(
+                    f"/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create",
+                    params={"client_token": client_token},
+                    json={"records": [{"fields": fields} for fields, _, _ in batch]},
+                )
+            except Exception as exc:
+                data = {"code": -1, "msg": f"{type(exc).__name__}: {exc}"}
+            if data.get("code") not in TRANSIENT_ERROR_CODES or attempt >= BATCH_RETRIES:
+                return data
+            delay = BATCH_RETRY_BACKOFF * (2 ** attempt)
+            logging.warning(
+                "批量创建飞书记录暂时失败（%s 条）code=%s msg=%s，%.1f 秒后整批重试",
+                len(batch), data.get("code"), data.get("msg"), delay,
+            )
+            time.sleep(delay)
+        return data
+
+
+_writer: Optional[BatchRecordWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_batch_writer() -> BatchRecordWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchRecordWriter()
+        return _writer
+
+
+__all__ = [
+    "BATCH_MAX_SIZE",
+    "BATCH_MAX_DELAY",
+    "BATCH_RESULT_TIMEOUT",
+    "BATCH_RETRIES",
+    "BatchRecordWriter",
+    "get_batch_writer",
+]
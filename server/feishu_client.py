@@ -0,0 +1,318 @@
+"""
+飞书开放平台 HTTP 客户端
+
+所有飞书接口共用一个带连接池的 requests.Session（keep-alive），
+超时、重试策略、tenant_access_token 缓存与失效重取集中在 FeishuClient 中，
+feishu_table 等模块只做参数拼装。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+APP_ID = os.getenv("FEISHU_APP_ID", "cli_a5d2851ae93a900c")
+APP_SECRET = os.getenv("FEISHU_APP_SECRET", "hSROo4WwzjbVCdqg1aZIffLhFAGUbT0O")
+
+BASE_URL = "https://open.feishu.cn/open-apis"
+TOKEN_URL = f"{BASE_URL}/auth/v3/tenant_access_token/internal"
+
+# 连接池：pool_maxsize 决定同一 host 可复用的并发连接数（分片并行上传时需要足够大）
+POOL_CONNECTIONS = int(os.getenv("FEISHU_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("FEISHU_POOL_MAXSIZE", "16"))
+# 超时：(连接, 读取)；上传类接口使用更长的读取超时
+DEFAULT_TIMEOUT: Tuple[float, float] = (10, 30)
+UPLOAD_TIMEOUT: Tuple[float, float] = (30, 300)
+# 重试：连接失败对所有请求重试（请求未发出，安全）；
+# 429/5xx 与读超时只对幂等请求重试，避免重复创建记录
+MAX_RETRIES = int(os.getenv("FEISHU_MAX_RETRIES", "2"))
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 飞书返回的 token 失效错误码：99991663 token 无效，99991668 token 过期
+TOKEN_INVALID_CODES = {99991663, 99991668}
+# 距离过期不足该秒数时在后台提前刷新；已过期（或剩余不足 TOKEN_MIN_TTL）时同步刷新
+TOKEN_REFRESH_AHEAD = int(os.getenv("FEISHU_TOKEN_REFRESH_AHEAD", "600"))
+TOKEN_MIN_TTL = 60
+
+
+def is_token_invalid(data: Optional[Dict[str, Any]]) -> bool:
+    """判断飞书接口响应是否为 token 失效错误"""
+    return isinstance(data, dict) and data.get("code") in TOKEN_INVALID_CODES
+
+
+class _TenantTokenCache:
+    """
+    进程内 tenant_access_token 缓存
+
+    - 按 expire 字段计算过期时间，未过期直接返回缓存
+    - 进入提前刷新窗口后由后台线程刷新，调用方继续使用旧 token
+    - 单飞：同一时刻只有一个刷新请求，其他调用方等待并共享结果
+    - threading 原语在 gevent worker 下会被 monkey patch，线程/协程均安全
+    """
+
+    def __init__(self, fetch: Callable[[], Dict[str, Any]]):
+        self._fetch = fetch
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> str:
+        token, remaining = self._token, self._expires_at - time.time()
+        if token and remaining > TOKEN_MIN_TTL:
+            if remaining < TOKEN_REFRESH_AHEAD:
+                self._refresh_in_background()
+            return token
+
+        with self._lock:
+            # 等锁期间可能已被其他调用方刷新
+            if self._token and self._expires_at - time.time() > TOKEN_MIN_TTL:
+                return self._token
+            return self._refresh_locked()
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """使缓存失效；传入 token 时仅当它仍是当前缓存时才清除，避免误删刚刷新的新 token。"""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _refresh_locked(self) -> str:
+        data = self._fetch()
+        if data.get("code") != 0:
+            raise RuntimeError(f"获取tenant_access_token失败: {data.get('code')} {data.get('msg')}")
+        self._token = data["tenant_access_token"]
+        self._expires_at = time.time() + int(data.get("expire") or 7200)
+        logging.info("tenant_access_token 已刷新，%s 秒后过期", data.get("expire"))
+        return self._token
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="feishu-token-refresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._lock:
+                if self._expires_at - time.time() >= TOKEN_REFRESH_AHEAD:
+                    return
+                self._refresh_locked()
+        except Exception as exc:  # pragma: no cover - 网络异常，下次调用再试
+            logging.warning("后台刷新 tenant_access_token 失败: %s", exc)
+        finally:
+            self._refreshing = False
+
+
+class FeishuClient:
+    """带连接池的飞书开放平台客户端（线程安全，进程内共享一个实例）"""
+
+    def __init__(
+        self,
+        app_id: Optional[str] = None,
+        app_secret: Optional[str] = None,
+        *,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        max_retries: int = MAX_RETRIES,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    ):
+        self.app_id = app_id or APP_ID
+        self.app_secret = app_secret or APP_SECRET
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        # 适配器只负责连接级重试与 GET 的状态码重试，POST 的重试由 request(idempotent=True) 控制
+        adapter_retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=RETRY_STATUS,
+            backoff_factor=RETRY_BACKOFF,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=adapter_retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._token_cache = _TenantTokenCache(self._fetch_token)
+
+    # ---------- token ----------
+
+    def _fetch_token(self) -> Dict[str, Any]:
+        response = self.session.post(
+            TOKEN_URL,
+            json={"app_id": self.app_id, "app_secret": self.app_secret},
+            timeout=self.timeout,
+        )
+        return response.json()
+
+    def tenant_access_token(self) -> str:
+        return self._token_cache.get()
+
+    def invalidate_token(self, token: Optional[str] = None) -> None:
+        self._token_cache.invalidate(token)
+
+    # ---------- 请求 ----------
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        access_token: Optional[str] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+        idempotent: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """
+        调用飞书接口并返回解析后的 JSON
+
+        - path 可以是 /open-apis 之后的路径，也可以是完整 URL
+        - 响应为 token 失效时作废旧 token 并用新 token 重发一次
+        - idempotent=True 时对 429/5xx/超时按指数退避重试
+        - 网络异常在重试耗尽后原样抛出，由调用方决定如何处理
+        """
+        url = path if path.startswith("http") else f"{BASE_URL}{path}"
+        token = access_token or self.tenant_access_token()
+        attempts = (self.max_retries + 1) if idempotent else 1
+
+        for attempt in range(attempts):
+            try:
+                response = self._send(method, url, token, timeout, headers, kwargs)
+                data = self._parse(response)
+                if is_token_invalid(data):
+                    logging.info("tenant_access_token 已失效，重新获取后重试")
+                    self.invalidate_token(token)
+                    token = self.tenant_access_token()
+                    response = self._send(method, url, token, timeout, headers, kwargs)
+                    data = self._parse(response)
+                if idempotent and response.status_code in RETRY_STATUS and attempt < attempts - 1:
+                    self._backoff(attempt, response)
+                    continue
+                return data
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                if attempt >= attempts - 1:
+                    raise
+                self._backoff(attempt)
+        return {}
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        token: str,
+        timeout: Optional[Tuple[float, float]],
+        headers: Optional[Dict[str, str]],
+        kwargs: Dict[str, Any],
+    ) -> requests.Response:
+        # 文件句柄在重发前回到开头
+        for value in (kwargs.get("files") or {}).values():
+            handle = value[1] if isinstance(value, tuple) else value
+            if hasattr(handle, "seek"):
+                handle.seek(0)
+        merged_headers = {"Authorization": f"Bearer {token}"}
+        if headers:
+            merged_headers.update(headers)
+        return self.session.request(method, url, headers=merged_headers, timeout=timeout or self.timeout, **kwargs)
+
+    @staticmethod
+    def _parse(response: requests.Response) -> Dict[str, Any]:
+        try:
+            return response.json()
+        except ValueError:
+            return {"code": -1, "msg": f"HTTP {response.status_code}: 非 JSON 响应"}
+
+    @staticmethod
+    def _backoff(attempt: int, response: Optional[requests.Response] = None) -> None:
+        delay = RETRY_BACKOFF * (2 ** attempt)
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        time.sleep(delay)
+
+    def post(self, path: str, **kwargs: Any) -> Dict[str, Any]:
+        return self.request("POST", path, **kwargs)
+
+    def get(self, path: str, **kwargs: Any) -> Dict[str, Any]:
+        return self.request("GET", path, idempotent=True, **kwargs)
+
+    # ---------- 多维表 ----------
+
+    def search_records(
+        self,
+        app_token: str,
+        table_id: str,
+        conditions: List[Dict[str, Any]],
+        *,
+        page_size: int = 1,
+        conjunction: str = "and",
+        access_token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        body = {
+            "filter": {"conditions": conditions, "conjunction": conjunction},
+            "page_size": page_size,
+        }
+        return self.post(
+            f"/bitable/v1/apps/{app_token}/tables/{table_id}/records/search",
+            json=body,
+            access_token=access_token,
+            idempotent=True,
+        )
+
+    def create_record(
+        self,
+        app_token: str,
+        table_id: str,
+        fields: Dict[str, Any],
+        *,
+        access_token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return self.post(
+            f"/bitable/v1/apps/{app_token}/tables/{table_id}/records",
+            json={"fields": fields},
+            access_token=access_token,
+        )
+
+
+_clients: Dict[Tuple[str, str], FeishuClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(app_id: Optional[str] = None, app_secret: Optional[str] = None) -> FeishuClient:
+    """按应用凭证返回进程内共享的 FeishuClient"""
+    key = (app_id or APP_ID, app_secret or APP_SECRET)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = FeishuClient(*key)
+        return client
+
+
+__all__ = [
+    "APP_ID",
+    "APP_SECRET",
+    "BASE_URL",
+    "DEFAULT_TIMEOUT",
+    "UPLOAD_TIMEOUT",
+    "TOKEN_INVALID_CODES",
+    "FeishuClient",
+    "get_client",
+    "is_token_invalid",
+]
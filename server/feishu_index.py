@@ -0,0 +1,385 @@
+"""
+飞书多维表记录的本地镜像索引（SQLite）
+
+为查重用的主键字段（抖音 video_id、商品 商品链接）维护 key → record_id 的本地索引：
+- 首次同步通过 records/list 分页拉取全表（只取主键字段）完成引导
+- create_record 成功后立即写入索引
+- 后台定时增量同步：按“修改时间”字段只拉取上次同步后变更的记录；
+  每隔 INDEX_FULL_SYNC_INTERVAL（或表中没有修改时间字段时每次）全量对账，清理飞书界面中删除的记录
+- 所有 worker 共享一份 sync_state：距上次同步不足 INDEX_SYNC_INTERVAL 时直接跳过，同一时刻只有一个 worker 执行
+- 查重先查本地索引；索引未就绪、过期或出错时才回退到远程 records/search
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import state_db
+from feishu_client import get_client
+
+INDEX_DB_NAME = "feishu_index.db"
+INDEX_SYNC_INTERVAL = int(os.getenv("FEISHU_INDEX_SYNC_INTERVAL", "600"))
+# 距上次同步超过该秒数视为索引过期，查重回退到远程搜索
+INDEX_MAX_STALENESS = int(os.getenv("FEISHU_INDEX_MAX_STALENESS", str(INDEX_SYNC_INTERVAL * 3)))
+# 全量对账（可发现删除）的间隔，其余同步只拉取增量
+INDEX_FULL_SYNC_INTERVAL = int(os.getenv("FEISHU_INDEX_FULL_SYNC_INTERVAL", str(6 * 3600)))
+# 多维表中“修改时间”类型字段的名称，用于增量同步；表中不存在时退化为全量同步
+INDEX_MODIFIED_FIELD = os.getenv("FEISHU_INDEX_MODIFIED_FIELD", "修改时间")
+# 增量同步的回看余量（秒），覆盖各 worker 时钟误差与同步期间的写入
+INDEX_INCREMENTAL_MARGIN = 300
+INDEX_PAGE_SIZE = 500
+# 飞书返回字段不存在（FieldNameNotFound）时不再对该表做增量同步
+FIELD_NOT_FOUND_CODES = {1254045}
+
+# name -> {"app_token", "table_id", "field_name", "modified_field"}
+_tables: Dict[str, Dict[str, str]] = {}
+_sync_thread: Optional[threading.Thread] = None
+_sync_lock = threading.Lock()
+_schema_ready = False
+
+
+def register_table(
+    name: str,
+    app_token: str,
+    table_id: str,
+    field_name: str,
+    modified_field: Optional[str] = INDEX_MODIFIED_FIELD,
+) -> None:
+    """登记需要建立索引的多维表及其主键字段；modified_field 为空时每次同步都全量拉取"""
+    _tables[name] = {
+        "app_token": app_token,
+        "table_id": table_id,
+        "field_name": field_name,
+        "modified_field": modified_field or "",
+    }
+
+
+def find_table(app_token: str, table_id: str, field_name: Optional[str] = None) -> Optional[str]:
+    """按 app_token + table_id（+ 主键字段）查找已登记的索引名"""
+    for name, spec in _tables.items():
+        if spec["app_token"] == app_token and spec["table_id"] == table_id:
+            if field_name is None or spec["field_name"] == field_name:
+                return name
+    return None
+
+
+def _ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS index_keys (
+                table_name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (table_name, key)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_index_keys_record ON index_keys (table_name, record_id)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name TEXT PRIMARY KEY,
+                last_sync REAL,
+                lease_until REAL NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                last_full_sync REAL
+            )
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sync_state)")}
+        if "last_full_sync" not in columns:
+            conn.execute("ALTER TABLE sync_state ADD COLUMN last_full_sync REAL")
+    _schema_ready = True
+
+
+def field_text(value: Any) -> str:
+    """把飞书字段值（文本、富文本片段、超链接等）归一化为字符串"""
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float)):
+        return str(value).strip()
+    if isinstance(value, dict):
+        return str(value.get("link") or value.get("text") or "").strip()
+    if isinstance(value, list):
+        return "".join(field_text(item) for item in value).strip()
+    return str(value).strip()
+
+
+# ---------- 查询 ----------
+
+def lookup(name: str, key: str) -> Tuple[Optional[str], bool]:
+    """
+    本地查重
+
+    返回 (record_id, authoritative)：
+    - record_id 非空表示命中
+    - authoritative 为 True 表示索引已就绪且未过期，未命中即可判定不存在
+    """
+    if name not in _tables or not key:
+        return None, False
+    _ensure_schema()
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        row = conn.execute(
+            "SELECT record_id FROM index_keys WHERE table_name = ? AND key = ?", (name, key)
+        ).fetchone()
+        state = conn.execute("SELECT last_sync FROM sync_state WHERE table_name = ?", (name,)).fetchone()
+    fresh = bool(state and state["last_sync"] and time.time() - state["last_sync"] <= INDEX_MAX_STALENESS)
+    return (row["record_id"] if row else None), fresh
+
+
+def remember(name: str, key: str, record_id: str) -> None:
+    """写入/更新一条索引（create_record 成功或远程搜索命中时调用）"""
+    if name not in _tables or not key or not record_id:
+        return
+    _ensure_schema()
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO index_keys (table_name, key, record_id, updated_at) VALUES (?, ?, ?, ?)",
+            (name, key, record_id, time.time()),
+        )
+
+
+def record_created(app_token: str, table_id: str, fields: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """create_record 成功后的钩子：若该表已登记索引则写入主键"""
+    name = find_table(app_token, table_id)
+    if not name:
+        return
+    try:
+        key = field_text(fields.get(_tables[name]["field_name"]))
+        remember(name, key, (record or {}).get("record_id") or "")
+    except Exception as exc:  # pragma: no cover - 索引写入失败不影响主流程
+        logging.warning("更新本地索引失败 table=%s: %s", name, exc)
+
+
+# ---------- 同步 ----------
+
+def _list_keys(spec: Dict[str, str]) -> Dict[str, str]:
+    """分页拉取整张表的主键字段，返回 key -> record_id"""
+    client = get_client()
+    keys: Dict[str, str] = {}
+    page_token = None
+    while True:
+        params = {"page_size": INDEX_PAGE_SIZE, "field_names": json.dumps([spec["field_name"]], ensure_ascii=False)}
+        if page_token:
+            params["page_token"] = page_token
+        data = client.get(f"/bitable/v1/apps/{spec['app_token']}/tables/{spec['table_id']}/records", params=params)
+        if data.get("code") != 0:
+            raise RuntimeError(f"records/list 失败: {data.get('code')} {data.get('msg')}")
+        payload = data.get("data") or {}
+        for item in payload.get("items") or []:
+            key = field_text((item.get("fields") or {}).get(spec["field_name"]))
+            if key:
+                keys[key] = item.get("record_id")
+        if not payload.get("has_more"):
+            return keys
+        page_token = payload.get("page_token")
+
+
+class IndexSyncError(RuntimeError):
+    def __init__(self, code: Any, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _search_modified_keys(spec: Dict[str, str], since: float) -> Dict[str, str]:
+    """
+    分页拉取 since 之后修改过的记录主键，返回 key -> record_id
+
+    飞书的日期条件按天比较：用 isGreaterEqual 包含 since 当天，并再往前放宽一天，
+    避免多维表时区与服务器时区不同时漏掉跨零点的修改，拉到的是变更记录的超集
+    """
+    client = get_client()
+    keys: Dict[str, str] = {}
+    page_token = None
+    body = {
+        "field_names": [spec["field_name"]],
+        "filter": {
+            "conjunction": "and",
+            "conditions": [
+                {
+                    "field_name": spec["modified_field"],
+                    "operator": "isGreaterEqual",
+                    "value": ["ExactDate", str(int((since - 86400) * 1000))],
+                }
+            ],
+        },
+    }
+    while True:
+        params = {"page_size": INDEX_PAGE_SIZE}
+        if page_token:
+            params["page_token"] = page_token
+        data = client.post(
+            f"/bitable/v1/apps/{spec['app_token']}/tables/{spec['table_id']}/records/search",
+            params=params,
+            json=body,
+            idempotent=True,
+        )
+        if data.get("code") != 0:
+            raise IndexSyncError(data.get("code"), f"records/search 失败: {data.get('code')} {data.get('msg')}")
+        payload = data.get("data") or {}
+        for item in payload.get("items") or []:
+            key = field_text((item.get("fields") or {}).get(spec["field_name"]))
+            if key:
+                keys[key] = item.get("record_id")
+        if not payload.get("has_more"):
+            return keys
+        page_token = payload.get("page_token")
+
+
+def _acquire_lease(conn, name: str, seconds: int, interval: int) -> Optional[Any]:
+    """
+    距上次同步已满 interval 秒且无人持有租约时取得租约，返回同步状态行；否则返回 None
+    """
+    now = time.time()
+    conn.execute("INSERT OR IGNORE INTO sync_state (table_name, last_sync, lease_until) VALUES (?, NULL, 0)", (name,))
+    cursor = conn.execute(
+        """
+        UPDATE sync_state SET lease_until = ?
+        WHERE table_name = ? AND lease_until < ? AND (last_sync IS NULL OR last_sync <= ?)
+        """,
+        (now + seconds, name, now, now - interval),
+    )
+    if cursor.rowcount != 1:
+        return None
+    return conn.execute("SELECT last_sync, last_full_sync FROM sync_state WHERE table_name = ?", (name,)).fetchone()
+
+
+def sync_table(name: str, *, force: bool = False) -> Dict[str, Any]:
+    """
+    同步一张表：增量拉取变更记录，或定期全量对账（本地只写入差异，全量时清理已删除的记录）
+
+    多个 worker 共享 sync_state：距上次同步不足 INDEX_SYNC_INTERVAL 或租约被占用时直接跳过；
+    force 时立即全量对账
+    """
+    spec = _tables[name]
+    _ensure_schema()
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        state = _acquire_lease(conn, name, INDEX_SYNC_INTERVAL, 0 if force else INDEX_SYNC_INTERVAL)
+        if state is None:
+            if not force:
+                return {"table": name, "skipped": True}
+            state = conn.execute(
+                "SELECT last_sync, last_full_sync FROM sync_state WHERE table_name = ?", (name,)
+            ).fetchone()
+
+    started = time.time()
+    full = (
+        force
+        or not spec["modified_field"]
+        or not state["last_sync"]
+        or not state["last_full_sync"]
+        or started - state["last_full_sync"] >= INDEX_FULL_SYNC_INTERVAL
+    )
+    try:
+        if full:
+            remote = _list_keys(spec)
+        else:
+            try:
+                remote = _search_modified_keys(spec, state["last_sync"] - INDEX_INCREMENTAL_MARGIN)
+            except IndexSyncError as exc:
+                # 本轮改为全量；表中没有修改时间字段时之后也不再尝试增量
+                logging.warning("飞书索引增量同步失败，本轮改为全量 table=%s: %s", name, exc)
+                if exc.code in FIELD_NOT_FOUND_CODES:
+                    spec["modified_field"] = ""
+                full = True
+                remote = _list_keys(spec)
+    except Exception:
+        with state_db.transaction(INDEX_DB_NAME) as conn:
+            conn.execute("UPDATE sync_state SET lease_until = 0 WHERE table_name = ?", (name,))
+        raise
+
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        local = {
+            row["key"]: row["record_id"]
+            for row in conn.execute(
+                "SELECT key, record_id, updated_at FROM index_keys WHERE table_name = ?", (name,)
+            )
+            # 拉取期间新建的记录保留，避免被本轮对账误删
+            if row["updated_at"] < started
+        }
+        upserts = [(name, key, rid, started) for key, rid in remote.items() if local.get(key) != rid]
+        # 增量结果不含未变更的记录，只有全量对账才能判断删除
+        removed = [(name, key) for key in local.keys() - remote.keys()] if full else []
+        conn.executemany(
+            "INSERT OR REPLACE INTO index_keys (table_name, key, record_id, updated_at) VALUES (?, ?, ?, ?)", upserts
+        )
+        conn.executemany("DELETE FROM index_keys WHERE table_name = ? AND key = ?", removed)
+        if full:
+            conn.execute(
+                "UPDATE sync_state SET last_sync = ?, last_full_sync = ?, total = ?, lease_until = 0 WHERE table_name = ?",
+                (started, started, len(remote), name),
+            )
+        else:
+            total = conn.execute("SELECT COUNT(*) FROM index_keys WHERE table_name = ?", (name,)).fetchone()[0]
+            conn.execute(
+                "UPDATE sync_state SET last_sync = ?, total = ?, lease_until = 0 WHERE table_name = ?",
+                (started, total, name),
+            )
+
+    result = {
+        "table": name,
+        "mode": "full" if full else "incremental",
+        "fetched": len(remote),
+        "added_or_changed": len(upserts),
+        "removed": len(removed),
+        "elapsed": round(time.time() - started, 2),
+    }
+    logging.info("飞书索引同步完成: %s", result)
+    return result
+
+
+def sync_all(*, force: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    for name in list(_tables):
+        try:
+            results.append(sync_table(name, force=force))
+        except Exception as exc:
+            logging.warning("飞书索引同步失败 table=%s: %s", name, exc)
+            results.append({"table": name, "error": str(exc)})
+    return results
+
+
+def start_sync(interval: int = INDEX_SYNC_INTERVAL) -> None:
+    """启动后台同步线程（进程内只启动一次）；首次运行即完成引导"""
+    global _sync_thread
+    with _sync_lock:
+        if _sync_thread and _sync_thread.is_alive():
+            return
+
+        def _loop() -> None:
+            while True:
+                sync_all()
+                time.sleep(interval)
+
+        _sync_thread = threading.Thread(target=_loop, name="feishu-index-sync", daemon=True)
+        _sync_thread.start()
+
+
+def stats() -> List[Dict[str, Any]]:
+    _ensure_schema()
+    with state_db.transaction(INDEX_DB_NAME) as conn:
+        rows = conn.execute("SELECT table_name, last_sync, total FROM sync_state").fetchall()
+    return [{"table": row["table_name"], "last_sync": row["last_sync"], "total": row["total"]} for row in rows]
+
+
+__all__ = [
+    "register_table",
+    "find_table",
+    "field_text",
+    "lookup",
+    "remember",
+    "record_created",
+    "sync_table",
+    "sync_all",
+    "start_sync",
+    "stats",
+]
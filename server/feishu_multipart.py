@@ -0,0 +1,395 @@
+"""
+飞书分片上传（upload_part）并发执行器
+
+upload_prepare 返回的分片按 seq 独立上传：
+- 多个分片并行上传（FEISHU_UPLOAD_PART_WORKERS），共用 FeishuClient 的连接池
+- 单个分片失败只重试该分片（指数退避），不会从 upload_prepare 重新开始
+- 每个分片完成后回调进度，并统计本次上传的吞吐量
+- upload_id、分片大小与已确认的分片序号持久化到本地 SQLite（UploadSessionStore），
+  重试或进程重启后只补传缺失分片，过期会话自动丢弃
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import state_db
+from feishu_client import UPLOAD_TIMEOUT, FeishuClient, get_client
+
+UPLOAD_PART_WORKERS = int(os.getenv("FEISHU_UPLOAD_PART_WORKERS", "4"))
+PART_MAX_RETRIES = int(os.getenv("FEISHU_UPLOAD_PART_RETRIES", "3"))
+PART_RETRY_BACKOFF = 1.0
+PART_RETRY_BACKOFF_MAX = 30.0
+
+UPLOAD_SESSION_DB_NAME = "uploads.db"
+# 分片上传会话保留时长，超过后视为 upload_id 已失效，重新 upload_prepare
+UPLOAD_SESSION_TTL = int(os.getenv("FEISHU_UPLOAD_SESSION_TTL", str(6 * 3600)))
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class PartUploadError(Exception):
+    """分片重试耗尽后仍失败"""
+
+    def __init__(self, seq: int, message: str):
+        super().__init__(f"分片 {seq + 1} 上传失败: {message}")
+        self.seq = seq
+
+
+class UploadMetrics:
+    """单次分片上传的进度与吞吐统计（线程安全）"""
+
+    def __init__(self, total_bytes: int, parts_total: int):
+        self.total_bytes = total_bytes
+        self.parts_total = parts_total
+        self.uploaded_bytes = 0
+        self.parts_done = 0
+        self.retries = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def part_done(self, size: int) -> Dict[str, Any]:
+        with self._lock:
+            self.uploaded_bytes += size
+            self.parts_done += 1
+            return self.to_dict()
+
+    def retried(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "uploaded_bytes": self.uploaded_bytes,
+            "total_bytes": self.total_bytes,
+            "parts_done": self.parts_done,
+            "parts_total": self.parts_total,
+            "retries": self.retries,
+            "elapsed": round(elapsed, 3),
+            "throughput_mbps": round(self.uploaded_bytes / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class MultipartUploader:
+    """并发上传 upload_prepare 划分好的分片"""
+
+    def __init__(
+        self,
+        client: Optional[FeishuClient] = None,
+        *,
+        workers: int = UPLOAD_PART_WORKERS,
+        max_retries: int = PART_MAX_RETRIES,
+        backoff: float = PART_RETRY_BACKOFF,
+        progress_callback: Optional[ProgressCallback] = None,
+        on_part_uploaded: Optional[Callable[[int], None]] = None,
+    ):
+        self.client = client or get_client()
+        self.workers = max(1, workers)
+        self.max_retries = max(1, max_retries)
+        self.backoff = backoff
+        self.progress_callback = progress_callback
+        self.on_part_uploaded = on_part_uploaded
+        self.metrics: Optional[UploadMetrics] = None
+
+    def upload_parts(
+        self,
+        file_path: str,
+        upload_id: str,
+        block_size: int,
+        block_num: int,
+        access_token: Optional[str] = None,
+        *,
+        skip_seqs: Iterable[int] = (),
+    ) -> bool:
+        """
+        上传文件的全部分片，全部成功返回 True
+
+        skip_seqs：已确认上传过的分片（断点续传时跳过）
+        """
+        file_size = os.path.getsize(file_path)
+        skip = set(skip_seqs)
+        pending = [seq for seq in range(block_num) if seq not in skip]
+        self.metrics = UploadMetrics(file_size, block_num)
+        for seq in skip:
+            self.metrics.part_done(self._part_size(file_size, block_size, seq))
+
+        def _upload(seq: int) -> None:
+            offset = seq * block_size
+            with open(file_path, "rb") as file_handle:
+                file_handle.seek(offset)
+                chunk_data = file_handle.read(block_size)
+            if not chunk_data:
+                return
+            self.upload_part(upload_id, seq, chunk_data, access_token)
+
+        ok = self._run(pending, _upload)
+        self.metrics.finish()
+        summary = self.metrics.to_dict()
+        logging.info(
+            "分片上传%s: %s/%s 片, %.2fMB, 耗时 %.2fs, %.2fMB/s, 重试 %s 次",
+            "完成" if ok else "失败",
+            summary["parts_done"],
+            block_num,
+            summary["uploaded_bytes"] / 1024 / 1024,
+            summary["elapsed"],
+            summary["throughput_mbps"],
+            summary["retries"],
+        )
+        return ok
+
+    def upload_stream_parts(
+        self,
+        blocks: Iterable[bytes],
+        upload_id: str,
+        total_size: int,
+        block_num: int,
+        access_token: Optional[str] = None,
+    ) -> bool:
+        """
+        边读边传：blocks 依次产出与 block_size 对齐的分片数据
+
+        同时在途的分片不超过 workers 个，内存占用约为 workers × block_size。
+        数据流只能消费一次，因此不支持断点续传；单个分片仍会独立重试。
+        """
+        self.metrics = UploadMetrics(total_size, block_num)
+        in_flight = threading.BoundedSemaphore(self.workers)
+        failed = threading.Event()
+
+        def _upload(item) -> None:
+            seq, chunk_data = item
+            try:
+                if not failed.is_set():
+                    self.upload_part(upload_id, seq, chunk_data, access_token)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                in_flight.release()
+
+        def _produce() -> Iterator[Any]:
+            for seq, chunk_data in enumerate(blocks):
+                in_flight.acquire()
+                if failed.is_set():
+                    in_flight.release()
+                    return
+                yield seq, chunk_data
+
+        ok = self._run(_produce(), _upload)
+        self.metrics.finish()
+        if ok and self.metrics.parts_done != block_num:
+            logging.error("流式分片数量不符: 已上传 %s，预期 %s", self.metrics.parts_done, block_num)
+            ok = False
+        summary = self.metrics.to_dict()
+        logging.info(
+            "流式分片上传%s: %s/%s 片, %.2fMB, 耗时 %.2fs, %.2fMB/s",
+            "完成" if ok else "失败",
+            summary["parts_done"],
+            block_num,
+            summary["uploaded_bytes"] / 1024 / 1024,
+            summary["elapsed"],
+            summary["throughput_mbps"],
+        )
+        return ok
+
+    def upload_part(self, upload_id: str, seq: int, chunk_data: bytes, access_token: Optional[str] = None) -> None:
+        """上传单个分片，失败时按指数退避重试，重试耗尽抛 PartUploadError"""
+        data = {
+            "upload_id": upload_id,
+            "seq": str(seq),
+            "size": str(len(chunk_data)),
+        }
+        last_error = ""
+        for attempt in range(self.max_retries):
+            if attempt:
+                if self.metrics:
+                    self.metrics.retried()
+                delay = min(self.backoff * (2 ** (attempt - 1)), PART_RETRY_BACKOFF_MAX)
+                time.sleep(delay + random.uniform(0, delay / 2))
+            try:
+                files = {"file": (f"part_{seq}", chunk_data, "application/octet-stream")}
+                result = self.client.post(
+                    "/drive/v1/medias/upload_part",
+                    files=files,
+                    data=data,
+                    access_token=access_token,
+                    timeout=UPLOAD_TIMEOUT,
+                    # 重试只由本循环负责，客户端不再叠加一层重试（否则单个分片最多会发送 9 次）
+                    idempotent=False,
+                )
+                logging.debug("分片 %s 上传响应: %s", seq + 1, result)
+                if result.get("code") == 0:
+                    self._part_finished(seq, len(chunk_data))
+                    return
+                last_error = str(result.get("msg"))
+                logging.warning("分片 %s 上传失败（第 %s 次）: %s", seq + 1, attempt + 1, last_error)
+            except Exception as error:
+                last_error = str(error)
+                logging.warning("分片 %s 上传异常（第 %s 次）: %s", seq + 1, attempt + 1, error)
+        raise PartUploadError(seq, last_error)
+
+    def _part_finished(self, seq: int, size: int) -> None:
+        progress = self.metrics.part_done(size) if self.metrics else {}
+        # 回调异常不影响上传结果（最坏情况是续传时多传一次该分片）
+        try:
+            if self.on_part_uploaded:
+                self.on_part_uploaded(seq)
+            if self.progress_callback:
+                self.progress_callback({"seq": seq, **progress})
+        except Exception as exc:  # pragma: no cover
+            logging.warning("分片完成回调异常: %s", exc)
+
+    def _run(self, seqs: Iterable[Any], upload: Callable[[Any], None]) -> bool:
+        """并发执行分片上传，任一分片重试耗尽即取消剩余分片"""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="feishu-part") as executor:
+            futures = [executor.submit(upload, seq) for seq in seqs]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            for future in done:
+                error = future.exception()
+                if error:
+                    logging.error("%s", error)
+                    return False
+        return True
+
+    @staticmethod
+    def _part_size(file_size: int, block_size: int, seq: int) -> int:
+        return max(0, min(block_size, file_size - seq * block_size))
+
+
+def iter_blocks(chunks: Iterable[bytes], block_size: int) -> Iterator[bytes]:
+    """把任意大小的数据块重新切分为 block_size 对齐的分片（最后一片可以更小）"""
+    buffer = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.extend(chunk)
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class UploadSessionStore:
+    """
+    分片上传会话存储
+
+    会话按 文件路径 + 大小 + 修改时间 + 目标位置 生成 key，文件变化后自然失效；
+    已确认的分片序号逐个写入，进程重启后仍可续传。
+    """
+
+    def __init__(self, db_name: str = UPLOAD_SESSION_DB_NAME, ttl: int = UPLOAD_SESSION_TTL):
+        self.db_name = db_name
+        self.ttl = ttl
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS upload_sessions (
+                    key TEXT PRIMARY KEY,
+                    upload_id TEXT NOT NULL,
+                    block_size INTEGER NOT NULL,
+                    block_num INTEGER NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS upload_parts (
+                    key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (key, seq)
+                )
+                """
+            )
+
+    @staticmethod
+    def make_key(file_path: str, parent_node: str, parent_type: str) -> str:
+        stat = os.stat(file_path)
+        raw = f"{os.path.abspath(file_path)}|{stat.st_size}|{int(stat.st_mtime)}|{parent_node}|{parent_type}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """返回未过期的会话（含已确认分片集合 acked），过期会话顺带清理"""
+        self.purge_expired()
+        with state_db.transaction(self.db_name) as conn:
+            row = conn.execute("SELECT * FROM upload_sessions WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            acked = {r["seq"] for r in conn.execute("SELECT seq FROM upload_parts WHERE key = ?", (key,))}
+        return {
+            "upload_id": row["upload_id"],
+            "block_size": row["block_size"],
+            "block_num": row["block_num"],
+            "file_size": row["file_size"],
+            "created_at": row["created_at"],
+            "acked": acked,
+        }
+
+    def create(self, key: str, upload_id: str, block_size: int, block_num: int, file_size: int) -> None:
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute("DELETE FROM upload_parts WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO upload_sessions (key, upload_id, block_size, block_num, file_size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, upload_id, block_size, block_num, file_size, time.time()),
+            )
+
+    def ack(self, key: str, seq: int) -> None:
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute("INSERT OR IGNORE INTO upload_parts (key, seq) VALUES (?, ?)", (key, seq))
+
+    def delete(self, key: str) -> None:
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute("DELETE FROM upload_parts WHERE key = ?", (key,))
+            conn.execute("DELETE FROM upload_sessions WHERE key = ?", (key,))
+
+    def purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute(
+                "DELETE FROM upload_parts WHERE key IN (SELECT key FROM upload_sessions WHERE created_at < ?)",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM upload_sessions WHERE created_at < ?", (cutoff,))
+
+
+_session_store: Optional[UploadSessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_upload_session_store() -> UploadSessionStore:
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = UploadSessionStore()
+        return _session_store
+
+
+__all__ = [
+    "UPLOAD_PART_WORKERS",
+    "PartUploadError",
+    "UploadMetrics",
+    "MultipartUploader",
+    "ProgressCallback",
+    "UploadSessionStore",
+    "iter_blocks",
+    "get_upload_session_store",
+]
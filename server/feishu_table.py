@@ -3,82 +3,132 @@ from __future__ import annotations
 import logging
 import os
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Optional
 
 import requests
 from dotenv import load_dotenv
 
+import feishu_index
+from feishu_batch import BATCH_RESULT_TIMEOUT, get_batch_writer
+from feishu_client import (
+    APP_ID,
+    APP_SECRET,
+    TOKEN_INVALID_CODES,
+    UPLOAD_TIMEOUT,
+    get_client,
+    is_token_invalid,
+)
+from feishu_multipart import MultipartUploader, ProgressCallback, get_upload_session_store, iter_blocks
+
 load_dotenv()
 
-APP_ID = os.getenv("FEISHU_APP_ID", "cli_a5d2851ae93a900c")
-APP_SECRET = os.getenv("FEISHU_APP_SECRET", "hSROo4WwzjbVCdqg1aZIffLhFAGUbT0O")
 APP_TOKEN = os.getenv("FEISHU_APP_TOKEN", "Pyw7bsxDiaSkKXsBwUqc9DH4n5c")
 TABLE_ID = os.getenv("FEISHU_TABLE_ID", "tblm8VXL99Bt9lcK")
 XHS_APP_TOKEN = os.getenv("FEISHU_XHS_APP_TOKEN", "OugZbH7a5aY3Ctsqziucq2WGnGh")
 XHS_TABLE_ID = os.getenv("FEISHU_XHS_TABLE_ID", "tblS0MEBItXCaxIN")
+AUTHOR_TABLE_ID = os.getenv("FEISHU_AUTHOR_TABLE_ID", "tblgHBLpdBROo42U")
+GOODS_TABLE_ID = os.getenv("FEISHU_GOODS_TABLE_ID", "tblbfklJzKavr6dd")
 
 FIELD_ATTACHMENT = os.getenv("FEISHU_FIELD_ATTACHMENT", "视频")
 FIELD_REMARK = os.getenv("FEISHU_FIELD_REMARK", "备注")
 FIELD_VIDEO_ID = os.getenv("FEISHU_FIELD_VIDEO_ID", "video_id")
 FIELD_PRODUCT_NAME = os.getenv("FIELD_PRODUCT_NAME", "品")
 FIELD_TITLE = os.getenv("FIELD_TITLE", "原爆款标题")
+FIELD_XHS_NOTE_ID = "笔记ID"
+FIELD_GOODS_URL = "商品链接"
 
 LARGE_FILE_THRESHOLD = 20 * 1024 * 1024
+BATCH_RECORDS = os.getenv("FEISHU_BATCH_RECORDS", "1") != "0"
+
+# 本地查重索引：抖音 video_id、商品 商品链接（只登记实际有查重的表）
+feishu_index.register_table("douyin", APP_TOKEN, TABLE_ID, FIELD_VIDEO_ID)
+feishu_index.register_table("goods", APP_TOKEN, GOODS_TABLE_ID, FIELD_GOODS_URL)
 
 
 def get_tenant_access_token(app_id: Optional[str] = None, app_secret: Optional[str] = None) -> str:
-    """获取 tenant_access_token，用于后续调用所有飞书开放接口。"""
-    effective_app_id = app_id or APP_ID
-    effective_app_secret = app_secret or APP_SECRET
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    response = requests.post(url, json={"app_id": effective_app_id, "app_secret": effective_app_secret}, timeout=15)
-    data = response.json()
-    if data.get("code") != 0:
-        raise RuntimeError(f"获取tenant_access_token失败: {data.get('code')} {data.get('msg')}")
-    return data["tenant_access_token"]
+    """获取 tenant_access_token（进程内缓存，按 expire 自动刷新），用于后续调用所有飞书开放接口。"""
+    return get_client(app_id, app_secret).tenant_access_token()
 
 
-def search_record_by_video_id(
-    video_id: str,
+def invalidate_tenant_access_token(
+    token: Optional[str] = None,
+    app_id: Optional[str] = None,
+    app_secret: Optional[str] = None,
+) -> None:
+    """接口返回 token 失效（99991663/99991668）时调用，下次获取会重新请求。"""
+    get_client(app_id, app_secret).invalidate_token(token)
+
+
+def search_records_by_field(
+    field_name: str,
+    value: Any,
     *,
     page_size: int = 1,
     app_token: Optional[str] = None,
     table_id: Optional[str] = None,
     access_token: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """按照 video_id 搜索飞书多维表记录。"""
+    """
+    按单个字段精确匹配搜索飞书多维表记录，返回 {"total", "items"}，失败时附带 "error"。
+
+    若该表字段已建立本地索引（feishu_index），优先本地查询；索引未就绪或过期时才请求远程。
+    """
     effective_app_token = app_token or APP_TOKEN
     effective_table_id = table_id or TABLE_ID
-    tenant_token = access_token or get_tenant_access_token()
-
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{effective_app_token}/tables/{effective_table_id}/records/search"
-    headers = {
-        "Authorization": f"Bearer {tenant_token}",
-        "Content-Type": "application/json",
-    }
-    body = {
-        "filter": {
-            "conditions": [
-                {"field_name": FIELD_VIDEO_ID, "operator": "is", "value": [video_id]},
-            ],
-            "conjunction": "and",
-        },
-        "page_size": page_size,
-    }
+    index_name = feishu_index.find_table(effective_app_token, effective_table_id, field_name)
+    key = feishu_index.field_text(value)
+    if index_name:
+        try:
+            record_id, authoritative = feishu_index.lookup(index_name, key)
+            if record_id:
+                return {"total": 1, "items": [{"record_id": record_id, "fields": {field_name: key}}], "source": "index"}
+            if authoritative:
+                return {"total": 0, "items": [], "source": "index"}
+        except Exception as exc:  # pragma: no cover - 本地索引异常时回退远程
+            logging.warning("本地索引查询失败，回退远程搜索: %s", exc)
 
     try:
-        response = requests.post(url, headers=headers, json=body, timeout=15)
-        data = response.json()
+        data = get_client().search_records(
+            effective_app_token,
+            effective_table_id,
+            [{"field_name": field_name, "operator": "is", "value": [value]}],
+            page_size=page_size,
+            access_token=access_token,
+        )
         if data.get("code") != 0:
             logging.warning("搜索记录失败 code=%s msg=%s", data.get("code"), data.get("msg"))
             return {"total": 0, "items": [], "error": data.get("msg")}
         payload = data.get("data") or {}
-        return {"total": payload.get("total", 0), "items": payload.get("items", [])}
+        items = payload.get("items", [])
+        if index_name and items:
+            feishu_index.remember(index_name, key, items[0].get("record_id") or "")
+        return {"total": payload.get("total", 0), "items": items}
     except Exception as exc:  # pragma: no cover - 网络异常
-        logging.error("search_record_by_video_id error: %s", exc)
+        logging.error("search_records_by_field error: %s", exc)
         return {"total": 0, "items": [], "error": str(exc)}
 
 
+def search_record_by_video_id(
+    video_id: str,
+    *,
+    page_size: int = 1,
+    app_token: Optional[str] = None,
+    table_id: Optional[str] = None,
+    access_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """按照 video_id 搜索飞书多维表记录。"""
+    return search_records_by_field(
+        FIELD_VIDEO_ID,
+        video_id,
+        page_size=page_size,
+        app_token=app_token,
+        table_id=table_id,
+        access_token=access_token,
+    )
+
+
 def upload_file_to_bitable(
     file_path: str,
     file_name: str,
@@ -87,8 +137,13 @@ def upload_file_to_bitable(
     parent_type: str = "bitable_file",
     max_retries: int = 3,
     access_token: Optional[str] = None,
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> Dict[str, Any]:
-    """上传任意文件到多维表素材库（普通上传或分片上传）。"""
+    """
+    上传任意文件到多维表素材库（普通上传或分片上传）。
+
+    progress_callback 仅对分片上传生效，每完成一个分片回调一次（含已上传字节数与吞吐量）。
+    """
     if not file_path or not os.path.isfile(file_path):
         return {"success": False, "file_token": None, "message": "文件不存在或路径非法"}
 
@@ -104,6 +159,7 @@ def upload_file_to_bitable(
             parent_node=target_parent_node,
             parent_type=parent_type,
             max_retries=max_retries,
+            progress_callback=progress_callback,
         )
     else:
         file_token = _upload_small_file(
@@ -124,43 +180,133 @@ def upload_file_to_bitable(
     }
 
 
+def upload_stream_to_bitable(
+    chunks: Iterable[bytes],
+    file_name: str,
+    file_size: int,
+    *,
+    parent_node: Optional[str] = None,
+    parent_type: str = "bitable_file",
+    max_retries: int = 3,
+    access_token: Optional[str] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    不落盘上传：把数据流（如 CDN 响应体）直接上传到多维表素材库。
+
+    file_size 必须与数据流总长度一致（通常取自 Content-Length）：
+    不超过 LARGE_FILE_THRESHOLD 时读入内存走 upload_all，否则按 upload_prepare 的分片边读边传，
+    内存中只保留有限个分片。数据流只能读取一次，分片路径不支持断点续传。
+    """
+    if file_size <= 0:
+        return {"success": False, "file_token": None, "message": "文件大小未知，无法流式上传"}
+
+    tenant_token = access_token or get_tenant_access_token()
+    target_parent_node = parent_node or APP_TOKEN
+
+    if file_size <= LARGE_FILE_THRESHOLD:
+        content = b"".join(chunks)
+        if len(content) != file_size:
+            return {"success": False, "file_token": None, "message": f"数据长度不符: {len(content)}/{file_size}"}
+        file_token = _upload_small_file(
+            "",
+            file_name,
+            tenant_token,
+            parent_node=target_parent_node,
+            parent_type=parent_type,
+            max_retries=max_retries,
+            content=content,
+        )
+    else:
+        file_token = _upload_large_stream(
+            chunks,
+            file_name,
+            file_size,
+            tenant_token,
+            parent_node=target_parent_node,
+            parent_type=parent_type,
+            progress_callback=progress_callback,
+        )
+
+    upload_success = bool(file_token)
+    return {
+        "success": upload_success,
+        "file_token": file_token if upload_success else None,
+        "message": "文件上传成功" if upload_success else "文件上传失败",
+        "access_token": tenant_token if upload_success else None,
+    }
+
+
 def create_record(
     fields: Dict[str, Any],
     *,
     access_token: Optional[str] = None,
     app_token: Optional[str] = None,
     table_id: Optional[str] = None,
+    batched: bool = BATCH_RECORDS,
 ) -> Optional[Dict[str, Any]]:
-    """在指定的飞书多维表中创建记录，成功返回 record 数据。"""
+    """
+    在指定的飞书多维表中创建记录，成功返回 record 数据。
+
+    batched=True（默认，FEISHU_BATCH_RECORDS=0 关闭）时经 records/batch_create 与并发调用方合并发送，
+    此时使用缓存的 tenant_access_token，忽略 access_token 参数。
+    """
     effective_app_token = app_token or APP_TOKEN
     effective_table_id = table_id or TABLE_ID
-    tenant_token = access_token or get_tenant_access_token()
-
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{effective_app_token}/tables/{effective_table_id}/records"
-    headers = {
-        "Authorization": f"Bearer {tenant_token}",
-        "Content-Type": "application/json",
-    }
-    payload = {"fields": fields}
+    if batched:
+        future = create_record_async(fields, app_token=effective_app_token, table_id=effective_table_id)
+        try:
+            return future.result(timeout=BATCH_RESULT_TIMEOUT)
+        except Exception as exc:  # pragma: no cover - 等待超时
+            logging.error("等待批量创建结果超时: %s", exc)
+            return None
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        data = response.json()
+        data = get_client().create_record(
+            effective_app_token,
+            effective_table_id,
+            fields,
+            access_token=access_token,
+        )
         if data.get("code") != 0:
             logging.warning("创建飞书记录失败: code=%s msg=%s", data.get("code"), data.get("msg"))
             return None
-        return (data.get("data") or {}).get("record")
+        record = (data.get("data") or {}).get("record")
+        feishu_index.record_created(effective_app_token, effective_table_id, fields, record)
+        return record
     except Exception as exc:  # pragma: no cover - 网络异常
         logging.error("create_record error: %s", exc)
         return None
 
 
+def create_record_async(
+    fields: Dict[str, Any],
+    *,
+    app_token: Optional[str] = None,
+    table_id: Optional[str] = None,
+) -> Future:
+    """把记录加入批量写入缓冲区，立即返回 Future（结果为 record，失败为 None）。"""
+    return get_batch_writer().submit(fields, app_token=app_token or APP_TOKEN, table_id=table_id or TABLE_ID)
+
+
 def create_douyin_record(fields: Dict[str, Any], *, access_token: Optional[str] = None) -> bool:
     """创建抖音视频记录，返回操作是否成功。"""
     record = create_record(fields, access_token=access_token, app_token=APP_TOKEN, table_id=TABLE_ID)
     return bool(record)
 
 
+def create_douyin_record_async(fields: Dict[str, Any]) -> Future:
+    """create_douyin_record 的非阻塞版本，Future 结果为操作是否成功；关闭批量写入时同步创建后返回已完成的 Future。"""
+    if not BATCH_RECORDS:
+        future: Future = Future()
+        future.set_result(create_douyin_record(fields))
+        return future
+    pending = create_record_async(fields, app_token=APP_TOKEN, table_id=TABLE_ID)
+    result: Future = Future()
+    pending.add_done_callback(lambda done: result.set_result(bool(done.result())))
+    return result
+
+
 def create_xhs_record(fields: Dict[str, Any], *, access_token: Optional[str] = None) -> bool:
     """在小红书专用多维表中创建记录。"""
     record = create_record(fields, access_token=access_token, app_token=XHS_APP_TOKEN, table_id=XHS_TABLE_ID)
@@ -175,60 +321,76 @@ def _upload_large_file(
     parent_node: str,
     parent_type: str,
     max_retries: int = 3,
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> Optional[str]:
     file_size = os.path.getsize(file_path)
     if not file_size:
         logging.warning("文件大小为0，跳过分片上传")
         return None
 
+    client = get_client()
+    sessions = get_upload_session_store()
+    session_key = sessions.make_key(file_path, parent_node, parent_type)
     for attempt in range(max_retries):
         try:
             logging.info("开始飞书分片上传，尝试 %s/%s", attempt + 1, max_retries)
-            prepare_url = "https://open.feishu.cn/open-apis/drive/v1/medias/upload_prepare"
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}",
-            }
-            prepare_data = {
-                "file_name": file_name,
-                "parent_type": parent_type,
-                "parent_node": parent_node,
-                "size": file_size,
-            }
-            prepare_response = requests.post(prepare_url, headers=headers, json=prepare_data, timeout=30)
-            prepare_result = prepare_response.json()
-            logging.debug("分片预上传响应: %s", prepare_result)
-
-            if prepare_result.get("code") != 0:
-                logging.warning("预上传失败: %s", prepare_result.get("msg"))
-                if attempt < max_retries - 1:
-                    time.sleep((attempt + 1) * 2)
-                    continue
-                return None
+            session = sessions.load(session_key)
+            if session and session["file_size"] == file_size:
+                upload_id = session["upload_id"]
+                block_size = session["block_size"]
+                block_num = session["block_num"]
+                acked = session["acked"]
+                logging.info("续传分片上传会话 %s：已完成 %s/%s 片", upload_id, len(acked), block_num)
+            else:
+                prepare_data = {
+                    "file_name": file_name,
+                    "parent_type": parent_type,
+                    "parent_node": parent_node,
+                    "size": file_size,
+                }
+                prepare_result = client.post("/drive/v1/medias/upload_prepare", json=prepare_data, access_token=access_token)
+                logging.debug("分片预上传响应: %s", prepare_result)
 
-            upload_id = prepare_result["data"]["upload_id"]
-            block_size = prepare_result["data"]["block_size"]
-            block_num = prepare_result["data"]["block_num"]
+                if prepare_result.get("code") != 0:
+                    logging.warning("预上传失败: %s", prepare_result.get("msg"))
+                    if attempt < max_retries - 1:
+                        time.sleep((attempt + 1) * 2)
+                        continue
+                    return None
 
-            if not _upload_file_parts(file_path, upload_id, block_size, block_num, access_token):
+                upload_id = prepare_result["data"]["upload_id"]
+                block_size = prepare_result["data"]["block_size"]
+                block_num = prepare_result["data"]["block_num"]
+                acked = set()
+                sessions.create(session_key, upload_id, block_size, block_num, file_size)
+
+            uploader = MultipartUploader(
+                progress_callback=progress_callback,
+                on_part_uploaded=lambda seq: sessions.ack(session_key, seq),
+            )
+            if not uploader.upload_parts(file_path, upload_id, block_size, block_num, access_token, skip_seqs=acked):
+                # 续传会话本轮没有任何分片成功，upload_id 可能已失效，下次重新 upload_prepare
+                if acked and uploader.metrics and uploader.metrics.parts_done == len(acked):
+                    logging.warning("续传会话 %s 无进展，丢弃后重新预上传", upload_id)
+                    sessions.delete(session_key)
                 if attempt < max_retries - 1:
                     time.sleep((attempt + 1) * 2)
                     continue
                 return None
 
-            finish_url = "https://open.feishu.cn/open-apis/drive/v1/medias/upload_finish"
             finish_data = {"upload_id": upload_id, "block_num": block_num}
-            finish_response = requests.post(finish_url, headers=headers, json=finish_data, timeout=30)
-            finish_result = finish_response.json()
+            finish_result = client.post("/drive/v1/medias/upload_finish", json=finish_data, access_token=access_token)
             logging.debug("分片完成响应: %s", finish_result)
 
             if finish_result.get("code") != 0:
                 logging.warning("分片完成失败: %s", finish_result.get("msg"))
+                sessions.delete(session_key)
                 if attempt < max_retries - 1:
                     time.sleep((attempt + 1) * 2)
                     continue
                 return None
 
+            sessions.delete(session_key)
             logging.info("分片上传完成: %s", finish_result["data"].get("file_token"))
             return finish_result["data"]["file_token"]
 
@@ -242,10 +404,54 @@ def _upload_large_file(
         if attempt < max_retries - 1:
             time.sleep((attempt + 1) * 2)
 
-    logging.error("分片上传多次失败，已放弃")
+    logging.error("分片上传多次失败，已放弃（已确认的分片会在下次上传同一文件时续传）")
     return None
 
 
+def _upload_large_stream(
+    chunks: Iterable[bytes],
+    file_name: str,
+    file_size: int,
+    access_token: str,
+    *,
+    parent_node: str,
+    parent_type: str,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> Optional[str]:
+    client = get_client()
+    try:
+        prepare_data = {
+            "file_name": file_name,
+            "parent_type": parent_type,
+            "parent_node": parent_node,
+            "size": file_size,
+        }
+        prepare_result = client.post("/drive/v1/medias/upload_prepare", json=prepare_data, access_token=access_token)
+        if prepare_result.get("code") != 0:
+            logging.warning("流式预上传失败: %s", prepare_result.get("msg"))
+            return None
+
+        upload_id = prepare_result["data"]["upload_id"]
+        block_size = prepare_result["data"]["block_size"]
+        block_num = prepare_result["data"]["block_num"]
+
+        uploader = MultipartUploader(progress_callback=progress_callback)
+        if not uploader.upload_stream_parts(iter_blocks(chunks, block_size), upload_id, file_size, block_num, access_token):
+            return None
+
+        finish_data = {"upload_id": upload_id, "block_num": block_num}
+        finish_result = client.post("/drive/v1/medias/upload_finish", json=finish_data, access_token=access_token)
+        if finish_result.get("code") != 0:
+            logging.warning("流式分片完成失败: %s", finish_result.get("msg"))
+            return None
+
+        logging.info("流式分片上传完成: %s", finish_result["data"].get("file_token"))
+        return finish_result["data"]["file_token"]
+    except Exception as error:
+        logging.exception("流式分片上传异常: %s", error)
+        return None
+
+
 def _upload_small_file(
     file_path: str,
     file_name: str,
@@ -254,9 +460,11 @@ def _upload_small_file(
     parent_node: str,
     parent_type: str,
     max_retries: int = 3,
+    content: Optional[bytes] = None,
 ) -> Optional[str]:
+    """content 不为空时直接上传内存中的数据（流式传输的小文件），此时忽略 file_path"""
     try:
-        file_size = os.path.getsize(file_path)
+        file_size = len(content) if content is not None else os.path.getsize(file_path)
     except Exception:
         file_size = 0
 
@@ -264,12 +472,11 @@ def _upload_small_file(
         logging.warning("文件大小为0，跳过普通上传")
         return None
 
-    upload_url = "https://open.feishu.cn/open-apis/drive/v1/medias/upload_all"
-
+    client = get_client()
     for attempt in range(max_retries):
         try:
             logging.info("开始飞书素材上传，尝试 %s/%s", attempt + 1, max_retries)
-            with open(file_path, "rb") as file_handle:
+            with (nullcontext(content) if content is not None else open(file_path, "rb")) as file_handle:
                 files = {"file": (file_name, file_handle, "application/octet-stream")}
                 data = {
                     "file_name": file_name,
@@ -277,16 +484,13 @@ def _upload_small_file(
                     "parent_node": parent_node,
                     "size": file_size,
                 }
-                headers = {"Authorization": f"Bearer {access_token}"}
-
-                response = requests.post(
-                    upload_url,
-                    headers=headers,
+                result = client.post(
+                    "/drive/v1/medias/upload_all",
                     data=data,
                     files=files,
-                    timeout=(30, 300),
+                    access_token=access_token,
+                    timeout=UPLOAD_TIMEOUT,
                 )
-                result = response.json()
                 logging.debug("普通上传响应: %s", result)
 
                 if result.get("code") != 0:
@@ -318,44 +522,11 @@ def _upload_file_parts(
     block_size: int,
     block_num: int,
     access_token: str,
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> bool:
-    upload_part_url = "https://open.feishu.cn/open-apis/drive/v1/medias/upload_part"
-
-    with open(file_path, "rb") as file_handle:
-        for seq in range(block_num):
-            chunk_data = file_handle.read(block_size)
-            if not chunk_data:
-                break
-
-            headers = {"Authorization": f"Bearer {access_token}"}
-            files = {"file": (f"part_{seq}", chunk_data, "application/octet-stream")}
-            data = {
-                "upload_id": upload_id,
-                "seq": str(seq),
-                "size": str(len(chunk_data)),
-            }
-
-            try:
-                response = requests.post(
-                    upload_part_url,
-                    headers=headers,
-                    files=files,
-                    data=data,
-                    timeout=(30, 300),
-                )
-                result = response.json()
-                logging.debug("分片 %s 上传响应: %s", seq + 1, result)
-
-                if result.get("code") != 0:
-                    logging.warning("分片 %s 上传失败: %s", seq + 1, result.get("msg"))
-                    return False
-
-            except Exception as error:  # pragma: no cover
-                logging.exception("分片 %s 上传异常: %s", seq + 1, error)
-                return False
-
-    logging.info("所有分片上传完成")
-    return True
+    """并发上传全部分片（单个分片失败独立重试），全部成功返回 True。"""
+    uploader = MultipartUploader(progress_callback=progress_callback)
+    return uploader.upload_parts(file_path, upload_id, block_size, block_num, access_token)
 
 
 __all__ = [
@@ -365,13 +536,24 @@ __all__ = [
     "TABLE_ID",
     "XHS_APP_TOKEN",
     "XHS_TABLE_ID",
+    "AUTHOR_TABLE_ID",
+    "GOODS_TABLE_ID",
     "FIELD_ATTACHMENT",
     "FIELD_REMARK",
     "FIELD_VIDEO_ID",
+    "FIELD_XHS_NOTE_ID",
+    "FIELD_GOODS_URL",
+    "TOKEN_INVALID_CODES",
     "get_tenant_access_token",
+    "invalidate_tenant_access_token",
+    "is_token_invalid",
+    "search_records_by_field",
     "search_record_by_video_id",
     "upload_file_to_bitable",
+    "upload_stream_to_bitable",
     "create_record",
+    "create_record_async",
     "create_douyin_record",
+    "create_douyin_record_async",
     "create_xhs_record",
 ]
@@ -0,0 +1,11 @@
+# ASGI 模式：gunicorn asgi_app:app --config gunicorn_asgi_conf.py
+# 每个 worker 一个事件循环，单进程即可同时处理数百个进行中的请求
+import os
+
+bind = "0.0.0.0:5000"
+workers = int(os.getenv("ASGI_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+loglevel = "info"
+# 抖音/小红书解析与飞书上传可能较慢
+timeout = int(os.getenv("ASGI_TIMEOUT", "300"))
+graceful_timeout = 30
@@ -0,0 +1,480 @@
+"""
+异步任务队列
+请求只负责入队并返回任务ID，耗时的下载 → 上传 → 建记录链路由后台按阶段执行。
+
+- 每个阶段拥有独立的有界线程池（下载/上传/记录），网络型的上传不会排在下载后面
+- 任务状态写入 SQLite（state_db），多个 gunicorn worker 都能查询到任意任务
+- 同一 kind + key（如 video_id）同时只会有一个排队/执行中的任务
+- 活动任务记录所属 worker 实例并由心跳续约；实例崩溃后租约过期，任务被标记为失败，
+  不依赖 pid（容器重启后新 worker 常复用相同的 pid）
+"""
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_NAME = "jobs.db"
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# 活动任务的租约（秒）：所属 worker 每 JOB_HEARTBEAT_INTERVAL 秒续约，过期未续约视为 worker 已退出
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_INTERVAL = max(1, JOB_LEASE_SECONDS // 3)
+# 阶段函数返回 Future 时最长等待的秒数，超时按阶段失败处理
+JOB_FUTURE_TIMEOUT = float(os.getenv("JOB_FUTURE_TIMEOUT", "60"))
+
+DEFAULT_STAGE_WORKERS = {
+    "download": int(os.getenv("JOB_DOWNLOAD_WORKERS", "2")),
+    "upload": int(os.getenv("JOB_UPLOAD_WORKERS", "4")),
+    "record": int(os.getenv("JOB_RECORD_WORKERS", "2")),
+}
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+StageFunc = Callable[["Job", Dict[str, Any]], Optional[Future]]
+
+
+class JobError(Exception):
+    """阶段执行失败，result 会原样作为任务结果返回给调用方"""
+
+    def __init__(self, message: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.result = result
+
+
+def chain(future: Future, fn: Callable[[Any], Any]) -> Future:
+    """返回新的 Future：future 完成后以其结果调用 fn，fn 的返回值或抛出的异常写入新 Future"""
+    chained: Future = Future()
+
+    def _done(source: Future) -> None:
+        try:
+            chained.set_result(fn(source.result()))
+        except Exception as error:
+            chained.set_exception(error)
+
+    future.add_done_callback(_done)
+    return chained
+
+
+class Job:
+    """单个任务的运行时状态；context 只在内存中传递，不落库"""
+
+    def __init__(self, kind: str, key: str, stages: List[str], payload: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.stages = stages
+        self.payload = payload
+        self.context: Dict[str, Any] = {}
+        self.status = STATUS_QUEUED
+        self.stage_index = 0
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stage_timings: Dict[str, float] = {}
+        self._on_change: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def stage(self) -> str:
+        return self.stages[min(self.stage_index, len(self.stages) - 1)]
+
+    def update_progress(self, **values: Any) -> None:
+        """阶段函数上报进度（如已上传字节数），会同步写入任务库"""
+        self.progress.update(values)
+        self.updated_at = time.time()
+        if self._on_change:
+            self._on_change(self)
+
+
+class JobStore:
+    """任务状态持久化（SQLite）"""
+
+    def __init__(self, db_name: str = JOB_DB_NAME):
+        self.db_name = db_name
+        # 本 worker 实例的标识：每次进程启动都不同，不会像 pid 一样在重启后被复用
+        self.instance_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    stages TEXT,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    pid INTEGER,
+                    created_at REAL,
+                    updated_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    stage_timings TEXT,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_key ON jobs(kind, key, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+
+    def _connect(self):
+        return state_db.transaction(self.db_name)
+
+    def save(self, job: Job) -> None:
+        active = job.status in ACTIVE_STATUSES
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (id, kind, key, status, stage, stages, progress, result, error, pid,
+                     created_at, updated_at, started_at, finished_at, stage_timings, owner, lease_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.id,
+                    job.kind,
+                    job.key,
+                    job.status,
+                    job.stage,
+                    json.dumps(job.stages),
+                    json.dumps(job.progress, ensure_ascii=False, default=str),
+                    json.dumps(job.result, ensure_ascii=False, default=str) if job.result is not None else None,
+                    job.error,
+                    os.getpid(),
+                    job.created_at,
+                    job.updated_at,
+                    job.started_at,
+                    job.finished_at,
+                    json.dumps(job.stage_timings),
+                    self.instance_id,
+                    time.time() + JOB_LEASE_SECONDS if active else None,
+                ),
+            )
+
+    def renew(self, job_ids: List[str]) -> None:
+        """续约本实例仍在处理的任务"""
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND id IN ({placeholders})",
+                (time.time() + JOB_LEASE_SECONDS, self.instance_id, *job_ids),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find_active(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT * FROM jobs WHERE kind = ? AND key = ? AND status IN (?, ?) AND lease_until >= ?
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (kind, key, *ACTIVE_STATUSES, time.time()),
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, limit: int = 50, status: Optional[str] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM jobs"
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def active_counts(self) -> Dict[str, Dict[str, int]]:
+        """按阶段统计所有 worker 中排队/执行中的任务数"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, status, COUNT(*) AS n FROM jobs WHERE status IN (?, ?) GROUP BY stage, status",
+                ACTIVE_STATUSES,
+            ).fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row["stage"], {STATUS_QUEUED: 0, STATUS_RUNNING: 0})[row["status"]] = row["n"]
+        return counts
+
+    def purge(self, older_than: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+                (*ACTIVE_STATUSES, older_than),
+            )
+
+    def fail_orphans(self) -> None:
+        """把其他实例遗留、租约已过期（所属 worker 已退出）的活动任务标记为失败"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ?, lease_until = NULL
+                WHERE status IN (?, ?) AND (owner IS NULL OR owner != ?) AND (lease_until IS NULL OR lease_until < ?)
+                """,
+                (STATUS_FAILED, "worker 进程已退出，任务中断", now, now, *ACTIVE_STATUSES, self.instance_id, now),
+            )
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        def _loads(value):
+            return json.loads(value) if value else None
+
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "key": row["key"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "stages": _loads(row["stages"]) or [],
+            "progress": _loads(row["progress"]) or {},
+            "result": _loads(row["result"]),
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "stage_timings": _loads(row["stage_timings"]) or {},
+        }
+
+
+class JobManager:
+    """
+    按阶段调度任务
+
+    用法：
+        manager.register("douyin_upload", [("download", fn1), ("upload", fn2), ("record", fn3)])
+        job, created = manager.submit("douyin_upload", video_id, {"video_id": video_id})
+    阶段函数签名为 fn(job, context)，通过修改 context 向下一阶段传值，
+    失败时抛出 JobError（或任意异常），最后一个阶段把结果写入 context["result"]。
+    阶段函数也可以返回 Future（如批量写入的结果）：线程立即归还线程池，Future 完成后再推进任务，
+    Future 的异常或超过 future_timeout 秒仍未完成都按阶段失败处理。
+    """
+
+    def __init__(
+        self,
+        stage_workers: Optional[Dict[str, int]] = None,
+        store: Optional[JobStore] = None,
+        future_timeout: float = JOB_FUTURE_TIMEOUT,
+    ):
+        self.future_timeout = future_timeout
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS)
+        if stage_workers:
+            self.stage_workers.update(stage_workers)
+        self.store = store or JobStore()
+        self._pipelines: Dict[str, List[Tuple[str, StageFunc]]] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._pending: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        # 本实例未结束的任务，由心跳线程续约
+        self._active: Dict[str, Job] = {}
+        self.store.fail_orphans()
+        threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+    def register(self, kind: str, stages: List[Tuple[str, StageFunc]]) -> None:
+        for stage_name, _ in stages:
+            self._get_executor(stage_name)
+        self._pipelines[kind] = stages
+
+    def _get_executor(self, stage_name: str) -> ThreadPoolExecutor:
+        with self._lock:
+            executor = self._executors.get(stage_name)
+            if executor is None:
+                workers = max(1, self.stage_workers.get(stage_name, 2))
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{stage_name}")
+                self._executors[stage_name] = executor
+                self._pending[stage_name] = 0
+                self._running[stage_name] = 0
+            return executor
+
+    def submit(self, kind: str, key: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """入队；若相同 kind + key 的任务仍在进行中，直接返回该任务（created=False）"""
+        if kind not in self._pipelines:
+            raise KeyError(f"未注册的任务类型: {kind}")
+
+        existing = self.store.find_active(kind, key)
+        if existing:
+            return existing, False
+
+        stages = self._pipelines[kind]
+        job = Job(kind, key, [name for name, _ in stages], payload)
+        job._on_change = self.store.save
+        with self._lock:
+            self._active[job.id] = job
+        self.store.save(job)
+        self._schedule(job)
+        self._maybe_purge()
+        return self.store.get(job.id) or {}, True
+
+    def _schedule(self, job: Job) -> None:
+        stage_name = job.stage
+        with self._lock:
+            self._pending[stage_name] += 1
+        self._get_executor(stage_name).submit(self._run_stage, job)
+
+    def _run_stage(self, job: Job) -> None:
+        stage_name, stage_func = self._pipelines[job.kind][job.stage_index]
+        with self._lock:
+            self._pending[stage_name] -= 1
+            self._running[stage_name] += 1
+
+        started = time.time()
+        job.status = STATUS_RUNNING
+        job.started_at = job.started_at or started
+        job.updated_at = started
+        self.store.save(job)
+        logger.info("任务 %s [%s] 开始阶段 %s", job.id, job.key, stage_name)
+
+        try:
+            outcome = stage_func(job, job.context)
+        except Exception as error:
+            self._complete_stage(job, stage_name, started, error)
+            return
+        if isinstance(outcome, Future):
+            self._await_stage(job, stage_name, started, outcome)
+            return
+        self._complete_stage(job, stage_name, started)
+
+    def _await_stage(self, job: Job, stage_name: str, started: float, future: Future) -> None:
+        """Future 完成或等待超时时结算阶段（只结算一次），等待期间不占用线程池"""
+        settle_lock = threading.Lock()
+        settled = []
+
+        def settle(error: Optional[BaseException]) -> None:
+            with settle_lock:
+                if settled:
+                    return
+                settled.append(True)
+            timer.cancel()
+            self._complete_stage(job, stage_name, started, error)
+
+        timer = threading.Timer(
+            self.future_timeout,
+            lambda: settle(TimeoutError(f"阶段 {stage_name} 等待结果超过 {self.future_timeout:g} 秒")),
+        )
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(lambda done: settle(done.exception()))
+
+    def _complete_stage(self, job: Job, stage_name: str, started: float, error: Optional[BaseException] = None) -> None:
+        job.stage_timings[stage_name] = round(time.time() - started, 3)
+        with self._lock:
+            self._running[stage_name] -= 1
+
+        if isinstance(error, JobError):
+            self._finish(job, STATUS_FAILED, error=str(error), result=error.result)
+            return
+        if error is not None:
+            logger.error("任务 %s 阶段 %s 异常: %s", job.id, stage_name, error)
+            traceback.print_exception(type(error), error, error.__traceback__)
+            self._finish(job, STATUS_FAILED, error=f"{type(error).__name__}: {error}")
+            return
+
+        if job.stage_index + 1 < len(job.stages):
+            job.stage_index += 1
+            job.status = STATUS_QUEUED
+            job.updated_at = time.time()
+            self.store.save(job)
+            self._schedule(job)
+        else:
+            self._finish(job, STATUS_SUCCEEDED, result=job.context.get("result"))
+
+    def _finish(self, job: Job, status: str, *, error: Optional[str] = None, result: Optional[Dict[str, Any]] = None) -> None:
+        job.status = status
+        job.error = error
+        job.result = result
+        job.finished_at = job.updated_at = time.time()
+        job.context.clear()
+        with self._lock:
+            self._active.pop(job.id, None)
+        self.store.save(job)
+        logger.info("任务 %s [%s] 结束: %s %s", job.id, job.key, status, error or "")
+
+    def _heartbeat_loop(self) -> None:
+        """续约本实例的活动任务，并清理其他 worker 崩溃后遗留的任务"""
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            with self._lock:
+                job_ids = list(self._active)
+            try:
+                self.store.renew(job_ids)
+                self.store.fail_orphans()
+            except Exception as error:  # pragma: no cover - 下一轮重试
+                logger.warning("任务心跳失败: %s", error)
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge < 600:
+            return
+        self._last_purge = now
+        try:
+            self.store.purge(now - JOB_RETENTION_SECONDS)
+        except Exception as error:  # pragma: no cover - 清理失败不影响入队
+            logger.warning("清理过期任务失败: %s", error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def list_jobs(self, limit: int = 50, status: Optional[str] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.store.list(limit=limit, status=status, kind=kind)
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度：all_workers 为所有进程汇总，local 为当前进程的线程池占用"""
+        with self._lock:
+            local = {
+                name: {
+                    "workers": self._executors[name]._max_workers,
+                    STATUS_QUEUED: self._pending[name],
+                    STATUS_RUNNING: self._running[name],
+                }
+                for name in self._executors
+            }
+        return {"all_workers": self.store.active_counts(), "local": local}
+
+
+__all__ = [
+    "chain",
+    "JobError",
+    "Job",
+    "JobStore",
+    "JobManager",
+    "STATUS_QUEUED",
+    "STATUS_RUNNING",
+    "STATUS_SUCCEEDED",
+    "STATUS_FAILED",
+]
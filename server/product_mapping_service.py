@@ -1,16 +1,126 @@
 import json
+import logging
 import os
+import threading
 import time
-from typing import Any, Dict, Optional
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
 
 CONFIG_FILENAME = "product_mapping.json"
 DEFAULT_CHECK_INTERVAL_SECONDS = 30
+# 后台监视线程检查配置文件的间隔（秒）；各 worker 各自检查，写入后最多延迟该时间生效
+WATCH_INTERVAL_SECONDS = float(os.getenv("PRODUCT_MAPPING_WATCH_INTERVAL", "1"))
 
-_product_mapping_cache: Optional[Dict[str, str]] = None
-_last_config_mtime: Optional[float] = None
+logger = logging.getLogger(__name__)
+
+_snapshot: Optional["MappingSnapshot"] = None
+_adhoc_matcher: Optional["ProductMatcher"] = None
+_reload_lock = threading.Lock()
+_watch_thread: Optional[threading.Thread] = None
+# 解析失败的文件签名，文件再次变化前不重复解析
+_failed_signature: Optional[Tuple[int, int]] = None
 _last_load_timestamp: float = 0.0
 
 
+class ProductMatcher:
+    """
+    商品名称关键词匹配器（Aho-Corasick 自动机）
+
+    一次扫描找出商品名称中出现的所有关键词，与关键词数量无关。
+    命中多个关键词时取最长（最具体）的一个；长度相同取最靠前出现的，结果与映射表中的顺序无关。
+    """
+
+    def __init__(self, mapping: Mapping[str, str]):
+        # 只读视图：匹配器构建后不可修改，重载时整体替换
+        self.mapping: Mapping[str, str] = mapping if isinstance(mapping, MappingProxyType) else MappingProxyType(dict(mapping))
+        self._keywords: List[str] = [keyword for keyword in mapping if keyword]
+        # 节点 i：_goto[i] 子节点表，_fail[i] 失配指针，_best[i] 以该节点结尾的最长关键词下标（-1 表示无）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[int] = [-1]
+        self._build()
+
+    def _build(self) -> None:
+        for index, keyword in enumerate(self._keywords):
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(-1)
+                node = next_node
+            self._best[node] = index
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # 自身不是关键词结尾时，继承后缀中最长的关键词
+                if self._best[child] < 0:
+                    self._best[child] = self._best[self._fail[child]]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def find(self, text: str) -> Optional[Tuple[str, str]]:
+        """返回命中的 (关键词, 映射值)，未命中返回 None"""
+        if not text or not self._keywords:
+            return None
+        goto, fail, best, keywords = self._goto, self._fail, self._best, self._keywords
+        node = 0
+        found = -1
+        found_length = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            index = best[node]
+            # 按结束位置从左到右扫描：只有更长的关键词才替换，长度相同保留先出现的
+            if index >= 0 and len(keywords[index]) > found_length:
+                found, found_length = index, len(keywords[index])
+        if found < 0:
+            return None
+        keyword = keywords[found]
+        return keyword, self.mapping[keyword]
+
+    def map(self, product_name: str) -> str:
+        """映射商品名称，未命中时原样返回"""
+        matched = self.find(product_name)
+        return matched[1] if matched else product_name
+
+    def map_many(self, product_names: Iterable[str]) -> List[str]:
+        return [self.map(name) for name in product_names]
+
+
+class MappingSnapshot(NamedTuple):
+    """一次加载的配置：映射表、预构建的匹配器、文件签名 (mtime_ns, size) 与加载时间"""
+    matcher: ProductMatcher
+    signature: Optional[Tuple[int, int]]
+    loaded_at: float
+
+
+def _matcher_for(mapping: Mapping[str, str]) -> "ProductMatcher":
+    """复用当前配置预构建的自动机；传入其他映射表时重新构建并缓存"""
+    global _adhoc_matcher
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.matcher.mapping is mapping:
+        return snapshot.matcher
+    matcher = _adhoc_matcher
+    if matcher is None or (matcher.mapping is not mapping and dict(matcher.mapping) != dict(mapping)):
+        matcher = _adhoc_matcher = ProductMatcher(mapping)
+    return matcher
+
+
 def _get_config_path() -> str:
     current_dir = os.path.dirname(__file__)
     return os.path.join(current_dir, CONFIG_FILENAME)
@@ -25,10 +135,15 @@ def _should_reload_config(check_interval_seconds: int) -> bool:
     return False
 
 
-def _load_config_from_file(config_path: str) -> Dict[str, str]:
-    with open(config_path, "r", encoding="utf-8") as file_handle:
-        config_data = json.load(file_handle)
-    mapping = config_data.get("product_name_mapping", {})
+def _file_signature(config_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(config_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _normalize_mapping(mapping: Any) -> Dict[str, str]:
     if not isinstance(mapping, dict):
         return {}
     normalized_mapping: Dict[str, str] = {}
@@ -41,26 +156,125 @@ def _load_config_from_file(config_path: str) -> Dict[str, str]:
     return normalized_mapping
 
 
-def load_product_mapping(check_interval_seconds: int = DEFAULT_CHECK_INTERVAL_SECONDS) -> Dict[str, str]:
-    global _product_mapping_cache
-    global _last_config_mtime
+def _load_config_from_file(config_path: str) -> Dict[str, str]:
+    with open(config_path, "r", encoding="utf-8") as file_handle:
+        config_data = json.load(file_handle)
+    return _normalize_mapping(config_data.get("product_name_mapping", {}))
+
+
+def reload_product_mapping(force: bool = False) -> Dict[str, Any]:
+    """
+    文件有变化（或 force）时重新解析配置、构建匹配器并原子替换当前快照
 
+    解析失败时保留旧配置继续服务
+    """
+    global _snapshot, _failed_signature
     config_path = _get_config_path()
-    if not os.path.exists(config_path):
-        _product_mapping_cache = {}
-        _last_config_mtime = None
-        return {}
+    with _reload_lock:
+        signature = _file_signature(config_path)
+        current = _snapshot
+        if current is not None and not force and signature in (current.signature, _failed_signature):
+            return {"ok": True, "changed": False, "count": len(current.matcher)}
+        try:
+            mapping = _load_config_from_file(config_path) if signature else {}
+        except Exception as exc:
+            _failed_signature = signature
+            logger.warning("商品映射配置解析失败，继续使用旧配置: %s", exc)
+            if current is None:
+                _snapshot = MappingSnapshot(ProductMatcher({}), None, time.time())
+            return {"ok": False, "changed": False, "error": f"{type(exc).__name__}: {exc}"}
+        _snapshot = MappingSnapshot(ProductMatcher(mapping), signature, time.time())
+    logger.info("商品映射配置已加载: %s 个关键词", len(mapping))
+    return {"ok": True, "changed": True, "count": len(mapping)}
+
+
+def load_product_mapping(check_interval_seconds: int = DEFAULT_CHECK_INTERVAL_SECONDS) -> Mapping[str, str]:
+    """
+    返回当前商品映射（只读）
+
+    监视线程运行时直接返回内存中的快照；未启动监视线程时（脚本等场景）按 check_interval_seconds 检查文件变化
+    """
+    watching = _watch_thread is not None and _watch_thread.is_alive()
+    if _snapshot is None or (not watching and _should_reload_config(check_interval_seconds)):
+        reload_product_mapping()
+    snapshot = _snapshot
+    return snapshot.matcher.mapping if snapshot else {}
+
+
+def get_product_matcher() -> ProductMatcher:
+    """返回当前配置预构建的匹配器"""
+    load_product_mapping()
+    return _snapshot.matcher
+
 
+def validate_product_mapping(mapping: Any) -> Dict[str, str]:
+    """校验管理接口提交的映射表：关键词与映射值都必须是非空字符串，否则抛出 ValueError"""
+    if not isinstance(mapping, dict):
+        raise ValueError("product_name_mapping 必须是 {关键词: 产品名称} 对象")
+    invalid = [
+        keyword for keyword, mapped_value in mapping.items()
+        if not isinstance(keyword, str) or not keyword.strip()
+        or not isinstance(mapped_value, str) or not mapped_value.strip()
+    ]
+    if invalid:
+        raise ValueError(f"关键词和产品名称都不能为空: {invalid[:10]}")
+    return _normalize_mapping(mapping)
+
+
+def _write_config(config_path: str, config_data: Dict[str, Any]) -> None:
+    content = json.dumps(config_data, ensure_ascii=False, indent=2) + "\n"
+    temp_path = f"{config_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file_handle:
+        file_handle.write(content)
     try:
-        if _product_mapping_cache is None or _should_reload_config(check_interval_seconds):
-            current_mtime = os.path.getmtime(config_path)
-            if _last_config_mtime is None or current_mtime != _last_config_mtime:
-                _product_mapping_cache = _load_config_from_file(config_path)
-                _last_config_mtime = current_mtime
-        return _product_mapping_cache or {}
-    except Exception:
-        _product_mapping_cache = _product_mapping_cache or {}
-        return _product_mapping_cache
+        os.replace(temp_path, config_path)
+    except OSError:
+        # docker 以单文件挂载配置时无法替换挂载点，改为原地覆盖写入
+        os.remove(temp_path)
+        with open(config_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write(content)
+
+
+def save_product_mapping(mapping: Any) -> Dict[str, Any]:
+    """
+    校验并写入商品映射配置，随后立即在当前 worker 重载
+
+    其他 worker 的监视线程检测到文件变化后重载（延迟不超过 PRODUCT_MAPPING_WATCH_INTERVAL）
+    """
+    normalized_mapping = validate_product_mapping(mapping)
+    config_path = _get_config_path()
+    with _reload_lock:
+        try:
+            with open(config_path, "r", encoding="utf-8") as file_handle:
+                config_data = json.load(file_handle)
+            if not isinstance(config_data, dict):
+                config_data = {}
+        except (OSError, ValueError):
+            config_data = {}
+        # 保留配置文件中的其他字段
+        config_data["product_name_mapping"] = normalized_mapping
+        _write_config(config_path, config_data)
+    return reload_product_mapping(force=True)
+
+
+def start_watcher(interval: float = WATCH_INTERVAL_SECONDS) -> None:
+    """启动后台监视线程（进程内只启动一次）：配置文件变化时在请求路径之外重载"""
+    global _watch_thread
+    with _reload_lock:
+        if _watch_thread and _watch_thread.is_alive():
+            return
+
+        def _loop() -> None:
+            while True:
+                try:
+                    reload_product_mapping()
+                except Exception as exc:  # pragma: no cover
+                    logger.warning("商品映射配置重载失败: %s", exc)
+                time.sleep(interval)
+
+        _watch_thread = threading.Thread(target=_loop, name="product-mapping-watcher", daemon=True)
+        _watch_thread.start()
+
 
 def extract_product_info(aweme: Dict[str, Any])     :
     """从 aweme 字典中提取首个商品标题，如果不存在则返回 None。"""
@@ -111,19 +325,43 @@ def extract_product_info(aweme: Dict[str, Any])     :
     except Exception:
         return None
 
-def map_product_name(product_name: str, mapping: Dict[str, str]) -> str:
+def find_product_keyword(product_name: str, mapping: Mapping[str, str]) -> Optional[Tuple[str, str]]:
+    """返回商品名称命中的 (关键词, 映射值)，多个命中时取最长的关键词"""
+    if not product_name or not mapping:
+        return None
+    return _matcher_for(mapping).find(product_name)
+
+
+def map_product_name(product_name: str, mapping: Mapping[str, str]) -> str:
     if not product_name:
         return product_name
     if not mapping:
         return product_name
-    for keyword, mapped_value in mapping.items():
-        if keyword in product_name:
-            return mapped_value
-    return product_name
+    return _matcher_for(mapping).map(product_name)
+
+
+def map_many(product_names: Iterable[str], mapping: Optional[Mapping[str, str]] = None) -> List[str]:
+    """批量映射商品名称；mapping 为空时使用当前配置"""
+    if mapping is None:
+        mapping = load_product_mapping()
+    names = list(product_names)
+    if not mapping:
+        return names
+    matcher = _matcher_for(mapping)
+    return [matcher.map(name) if name else name for name in names]
 
 
 __all__ = [
+    "ProductMatcher",
+    "MappingSnapshot",
     "load_product_mapping",
+    "reload_product_mapping",
+    "save_product_mapping",
+    "validate_product_mapping",
+    "get_product_matcher",
+    "start_watcher",
+    "find_product_keyword",
     "map_product_name",
+    "map_many",
     "extract_product_info"
 ]
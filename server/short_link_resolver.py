@@ -0,0 +1,212 @@
+"""
+小红书短链接（xhslink.com）解析
+
+笔记、作者、商品三个解析器共用：
+- 只读取重定向响应的 Location 头逐跳跟随（不下载落地页），跳到非短链接域名即停止
+- 没有重定向时才读取响应体（限制大小）用正则提取 xiaohongshu.com 链接
+- 结果按短码缓存：进程内 TTL + LRU，另有 SQLite 二级缓存供多个 worker 共享（SHORT_LINK_SQLITE=0 关闭）
+- 共享带连接池的 requests.Session（keep-alive）
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+SHORT_LINK_DB_NAME = "short_links.db"
+CACHE_TTL = int(os.getenv("SHORT_LINK_CACHE_TTL", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("SHORT_LINK_CACHE_SIZE", "4096"))
+SQLITE_TIER = os.getenv("SHORT_LINK_SQLITE", "1") != "0"
+MAX_REDIRECTS = 5
+# 回退读取响应体时最多读取的字节数
+MAX_BODY_BYTES = 256 * 1024
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+LONG_URL_PATTERN = re.compile(r'https://www\.xiaohongshu\.com/[^\s"\'<>]+')
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.xiaohongshu.com/',
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_schema_ready = False
+
+
+def is_short_link(url: str) -> bool:
+    return 'xhslink.com' in (url or '').lower()
+
+
+def short_code(short_url: str) -> str:
+    """缓存键：短链接的 host + path（忽略协议、查询参数与结尾的标点）"""
+    parsed = urlparse(short_url.strip())
+    host = (parsed.netloc or '').lower()
+    path = parsed.path.rstrip('/.,;!?。，；！？')
+    return f"{host}{path}"
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+# ---------- 缓存 ----------
+
+def _cache_get(code: str) -> Optional[str]:
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(code)
+        if entry and entry[1] > now:
+            _cache.move_to_end(code)
+            return entry[0]
+        if entry:
+            del _cache[code]
+
+    if not SQLITE_TIER:
+        return None
+    try:
+        _ensure_schema()
+        with state_db.transaction(SHORT_LINK_DB_NAME) as conn:
+            row = conn.execute("SELECT url, expires_at FROM short_links WHERE code = ?", (code,)).fetchone()
+    except Exception as exc:  # pragma: no cover - 二级缓存不可用时直接解析
+        logger.warning("读取短链接缓存失败: %s", exc)
+        return None
+    if not row or row["expires_at"] <= now:
+        return None
+    _cache_put_memory(code, row["url"], row["expires_at"])
+    return row["url"]
+
+
+def _cache_put_memory(code: str, url: str, expires_at: float) -> None:
+    with _cache_lock:
+        _cache[code] = (url, expires_at)
+        _cache.move_to_end(code)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _cache_put(code: str, url: str) -> None:
+    expires_at = time.time() + CACHE_TTL
+    _cache_put_memory(code, url, expires_at)
+    if not SQLITE_TIER:
+        return
+    try:
+        _ensure_schema()
+        with state_db.transaction(SHORT_LINK_DB_NAME) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO short_links (code, url, expires_at) VALUES (?, ?, ?)",
+                (code, url, expires_at),
+            )
+            conn.execute("DELETE FROM short_links WHERE expires_at < ?", (time.time(),))
+    except Exception as exc:  # pragma: no cover
+        logger.warning("写入短链接缓存失败: %s", exc)
+
+
+def _ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    with state_db.transaction(SHORT_LINK_DB_NAME) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS short_links (
+                code TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+    _schema_ready = True
+
+
+# ---------- 解析 ----------
+
+def _follow_redirects(short_url: str, headers: Dict[str, str], timeout: float, body_fallback: bool) -> Optional[str]:
+    session = get_session()
+    url = short_url
+    for _ in range(MAX_REDIRECTS):
+        response = session.head(url, headers=headers, allow_redirects=False, timeout=timeout)
+        if response.status_code not in REDIRECT_STATUS:
+            # 部分服务不支持 HEAD：改用 GET，但只在没有重定向时才读取响应体
+            response.close()
+            response = session.get(url, headers=headers, allow_redirects=False, timeout=timeout, stream=True)
+        with response:
+            location = response.headers.get("Location")
+            if response.status_code in REDIRECT_STATUS and location:
+                url = urljoin(url, location)
+                if not is_short_link(url):
+                    return url
+                continue
+            if body_fallback and response.status_code == 200:
+                body = response.raw.read(MAX_BODY_BYTES, decode_content=True) or b""
+                match = LONG_URL_PATTERN.search(body.decode(response.encoding or "utf-8", errors="ignore"))
+                if match:
+                    return match.group(0)
+            if url != short_url:
+                # 发生过重定向但停在了短链接域名上：与 allow_redirects=True 时的 response.url 一致
+                return url
+            logger.warning(f"短链接解析失败，状态码: {response.status_code}")
+            return None
+    logger.warning(f"短链接重定向次数过多: {short_url}")
+    return None
+
+
+def resolve(
+    short_url: str,
+    cookie: Optional[str] = None,
+    timeout: float = 10,
+    body_fallback: bool = True,
+) -> Optional[str]:
+    """
+    解析短链接，返回真实的长链接（失败返回 None）
+
+    Args:
+        short_url: 短链接 (如: http://xhslink.com/o/9GubyGk1LPj)
+        cookie: 小红书cookie
+        timeout: 每一跳的请求超时时间（秒）
+        body_fallback: 没有重定向时是否从响应体中提取链接
+    """
+    code = short_code(short_url)
+    cached = _cache_get(code)
+    if cached:
+        logger.info(f"短链接命中缓存: {short_url} -> {cached}")
+        return cached
+
+    headers = dict(DEFAULT_HEADERS)
+    if cookie:
+        headers['Cookie'] = cookie
+    try:
+        final_url = _follow_redirects(short_url, headers, timeout, body_fallback)
+    except requests.exceptions.Timeout:
+        logger.error(f"短链接请求超时: {short_url}")
+        return None
+    except Exception as e:
+        logger.error(f"短链接解析异常: {e}")
+        return None
+
+    if final_url:
+        logger.info(f"短链接重定向: {short_url} -> {final_url}")
+        _cache_put(code, final_url)
+    return final_url
+
+
+__all__ = ["is_short_link", "short_code", "get_session", "resolve"]
@@ -0,0 +1,198 @@
+"""
+单飞（single-flight）请求合并
+
+同一个 key（如抖音 video_id、小红书 note_id）的并发请求只执行一次，其余请求等待并共享结果：
+- 进程内：后到的线程 / 协程等待第一个调用方的结果（异常同样共享）
+- 跨 worker（SINGLEFLIGHT_SHARED=1，默认开启）：通过 SQLite 租约选出唯一执行者，
+  其他 worker 轮询数据库拿到结果；执行者进程退出或租约过期后由等待方接手执行
+跨 worker 共享的结果需要能被 JSON 序列化（元组会以列表形式返回）。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import state_db
+
+FLIGHT_DB_NAME = "singleflight.db"
+SHARED = os.getenv("SINGLEFLIGHT_SHARED", "1") != "0"
+# 执行者租约（秒）：执行者所在进程仍存活时，等待方最多等待这么久后接手
+LEASE_SECONDS = float(os.getenv("SINGLEFLIGHT_LEASE", "600"))
+POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.5"))
+# 已完成的记录保留时间，过期后清理
+RESULT_RETENTION = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """按 key 合并并发调用（线程安全，进程内共享一个实例）"""
+
+    def __init__(self, shared: bool = SHARED, db_name: str = FLIGHT_DB_NAME):
+        self.shared = shared
+        self.db_name = db_name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn 或等待同 key 的进行中调用
+
+        返回 (结果, shared)：shared 为 True 表示结果来自其他调用方
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value, shared = self._do_shared(key, fn) if self.shared else (fn(), False)
+            return call.value, shared
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    # ---------- 跨 worker ----------
+
+    def _do_shared(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        try:
+            self._ensure_schema()
+        except Exception as exc:  # pragma: no cover - 状态库不可用时退化为进程内合并
+            logger.warning("单飞状态库不可用，仅进程内合并: %s", exc)
+            return fn(), False
+
+        owner = uuid.uuid4().hex
+        waiting_since = time.time()
+        logged = False
+        while True:
+            acquired, finished = self._acquire(key, owner, waiting_since)
+            if finished is not None:
+                return json.loads(finished), True
+            if acquired:
+                break
+            if not logged:
+                logger.info("请求合并：%s 正由其他 worker 处理，等待结果", key)
+                logged = True
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            value = fn()
+        except BaseException:
+            self._release(key, owner, None)
+            raise
+        try:
+            result = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            result = None
+        self._release(key, owner, result)
+        return value, False
+
+    def _ensure_schema(self) -> None:
+        if self._schema_ready:
+            return
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS flights (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    lease_until REAL NOT NULL,
+                    result TEXT,
+                    finished_at REAL
+                )
+                """
+            )
+        self._schema_ready = True
+
+    def _acquire(self, key: str, owner: str, since: float) -> Tuple[bool, Optional[str]]:
+        """
+        尝试成为 key 的执行者：无记录、上次已完成、租约过期或执行者进程已退出时成功
+
+        返回 (是否成为执行者, 已完成的结果)：since 之后已有调用完成并留下结果时直接返回该结果，
+        与接手判断在同一事务内，避免执行者刚完成时等待方又执行一次
+        """
+        now = time.time()
+        with state_db.transaction(self.db_name) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO flights (key, owner, pid, lease_until) VALUES (?, ?, ?, ?)",
+                (key, owner, os.getpid(), now + LEASE_SECONDS),
+            )
+            row = conn.execute(
+                "SELECT owner, pid, lease_until, result, finished_at FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+            if row["owner"] == owner:
+                return True, None
+            if row["result"] is not None and row["finished_at"] and row["finished_at"] >= since:
+                return False, row["result"]
+            in_flight = row["finished_at"] is None and row["lease_until"] > now and state_db.pid_alive(row["pid"])
+            if in_flight:
+                return False, None
+            cursor = conn.execute(
+                """
+                UPDATE flights SET owner = ?, pid = ?, lease_until = ?, result = NULL, finished_at = NULL
+                WHERE key = ? AND owner = ?
+                """,
+                (owner, os.getpid(), now + LEASE_SECONDS, key, row["owner"]),
+            )
+            return cursor.rowcount == 1, None
+
+    def _release(self, key: str, owner: str, result: Optional[str]) -> None:
+        """记录结果并释放租约；结果为空（异常或无法序列化）时删除记录，等待方自行执行"""
+        now = time.time()
+        try:
+            with state_db.transaction(self.db_name) as conn:
+                if result is None:
+                    conn.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner))
+                else:
+                    conn.execute(
+                        "UPDATE flights SET result = ?, finished_at = ?, lease_until = 0 WHERE key = ? AND owner = ?",
+                        (result, now, key, owner),
+                    )
+                conn.execute("DELETE FROM flights WHERE finished_at IS NOT NULL AND finished_at < ?", (now - RESULT_RETENTION,))
+        except Exception as exc:  # pragma: no cover - 等待方会在租约过期后接手
+            logger.warning("单飞结果写入失败 %s: %s", key, exc)
+
+
+_flight: Optional[SingleFlight] = None
+_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _flight
+    with _flight_lock:
+        if _flight is None:
+            _flight = SingleFlight()
+        return _flight
+
+
+def do(key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+    """使用进程内共享实例合并同 key 的调用，见 SingleFlight.do"""
+    return get_single_flight().do(key, fn)
+
+
+__all__ = ["SingleFlight", "get_single_flight", "do"]
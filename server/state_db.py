@@ -0,0 +1,65 @@
+"""
+本地状态存储（SQLite）
+为任务队列、上传断点等子系统提供统一的数据库目录与连接配置，
+同一台机器上的多个 gunicorn worker 通过同一个数据库文件共享状态。
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(os.path.dirname(__file__), "state"))
+
+
+def get_state_path(filename: str) -> str:
+    """返回状态目录下的文件路径，目录不存在时自动创建。"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, filename)
+
+
+def connect(filename: str, timeout: float = 30.0) -> sqlite3.Connection:
+    """
+    打开状态数据库连接
+
+    - WAL 模式：读写互不阻塞，适合多 worker 同时访问
+    - busy_timeout：写锁冲突时等待而不是立即报错
+    - 每次调用返回新连接，调用方负责关闭（不要跨线程共享连接）
+    """
+    conn = sqlite3.connect(get_state_path(filename), timeout=timeout, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+    return conn
+
+
+@contextmanager
+def transaction(filename: str) -> Iterator[sqlite3.Connection]:
+    """with 块内使用一个短连接，正常结束提交、异常回滚，最后关闭连接"""
+    conn = connect(filename)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def pid_alive(pid: int) -> bool:
+    """判断同一台机器上的某个 worker 进程是否仍存活（用于识别崩溃 worker 遗留的状态）"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+__all__ = ["STATE_DIR", "get_state_path", "connect", "transaction", "pid_alive"]
@@ -1,17 +1,15 @@
 """
 小红书作者信息上传到飞书表格
 """
-import os
 import logging
-import requests
 from typing import Dict, Any, Optional
 import feishu_table as feishu
 
 logger = logging.getLogger(__name__)
 
 # 飞书作者表格配置
-FEISHU_AUTHOR_APP_TOKEN = os.getenv("FEISHU_APP_TOKEN", "Pyw7bsxDiaSkKXsBwUqc9DH4n5c")
-FEISHU_AUTHOR_TABLE_ID = os.getenv("FEISHU_AUTHOR_TABLE_ID", "tblgHBLpdBROo42U")
+FEISHU_AUTHOR_APP_TOKEN = feishu.APP_TOKEN
+FEISHU_AUTHOR_TABLE_ID = feishu.AUTHOR_TABLE_ID
 
 
 def upload_author_to_feishu(author_data: Dict[str, Any], access_token: Optional[str] = None) -> Dict[str, Any]:
@@ -48,39 +46,25 @@ def upload_author_to_feishu(author_data: Dict[str, Any], access_token: Optional[
 
         if red_id:
             # 使用飞书搜索 API 查询
-            search_url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{FEISHU_AUTHOR_APP_TOKEN}/tables/{FEISHU_AUTHOR_TABLE_ID}/records/search"
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            }
-            search_body = {
-                "filter": {
-                    "conditions": [
-                        {"field_name": "账号ID", "operator": "is", "value": [red_id]},
-                    ],
-                    "conjunction": "and",
-                },
-                "page_size": 1,
-            }
-
-            try:
-                response = requests.post(search_url, headers=headers, json=search_body, timeout=15)
-                data = response.json()
-                if data.get("code") == 0:
-                    payload = data.get("data", {})
-                    total = payload.get("total", 0)
-                    if total > 0:
-                        items = payload.get("items", [])
-                        existing_record_id = items[0].get("record_id") if items else None
-                        logger.info(f"作者已存在，跳过上传: {red_id}")
-                        return {
-                            "ok": True,
-                            "record_id": existing_record_id,
-                            "message": "作者已存在",
-                            "action": "skipped"
-                        }
-            except Exception as search_err:
-                logger.warning(f"搜索作者失败，继续上传: {search_err}")
+            existing = feishu.search_records_by_field(
+                "账号ID",
+                red_id,
+                app_token=FEISHU_AUTHOR_APP_TOKEN,
+                table_id=FEISHU_AUTHOR_TABLE_ID,
+                access_token=access_token,
+            )
+            if existing.get("error"):
+                logger.warning(f"搜索作者失败，继续上传: {existing['error']}")
+            elif existing.get("total", 0) > 0:
+                items = existing.get("items", [])
+                existing_record_id = items[0].get("record_id") if items else None
+                logger.info(f"作者已存在，跳过上传: {red_id}")
+                return {
+                    "ok": True,
+                    "record_id": existing_record_id,
+                    "message": "作者已存在",
+                    "action": "skipped"
+                }
 
         # 准备字段数据
         fields = {}
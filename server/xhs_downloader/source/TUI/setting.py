@@ -235,6 +235,11 @@ class Setting(Screen):
                 "download_record": self.query_one("#download_record").value,
                 "author_archive": self.query_one("#author_archive").value,
                 "write_mtime": self.query_one("#write_mtime").value,
+                "concurrency": self.data.get("concurrency", 4),
+                "request_rate": self.data.get("request_rate", 1.0),
+                "request_burst": self.data.get("request_burst", 3),
+                "request_rate_min": self.data.get("request_rate_min", 0.2),
+                "request_rate_max": self.data.get("request_rate_max", 5.0),
             }
         )
 
@@ -1,4 +1,4 @@
-from asyncio import Event, Queue, QueueEmpty, create_task, gather, sleep
+from asyncio import Event, Queue, QueueEmpty, Semaphore, create_task, gather, sleep
 from contextlib import suppress
 from datetime import datetime
 from re import compile
@@ -25,7 +25,12 @@ from ..module import (
     __VERSION__,
     ERROR,
     MASTER,
+    MAX_WORKERS,
     REPOSITORY,
+    REQUEST_BURST,
+    REQUEST_RATE,
+    REQUEST_RATE_MAX,
+    REQUEST_RATE_MIN,
     ROOT,
     VERSION_BETA,
     VERSION_MAJOR,
@@ -106,6 +111,11 @@ class XHS:
         language="zh_CN",
         read_cookie: int | str = None,
         _print: bool = True,
+        concurrency: int = MAX_WORKERS,
+        request_rate: float = REQUEST_RATE,
+        request_burst: int = REQUEST_BURST,
+        request_rate_min: float = REQUEST_RATE_MIN,
+        request_rate_max: float = REQUEST_RATE_MAX,
         *args,
         **kwargs,
     ):
@@ -133,6 +143,14 @@ class XHS:
             _print,
             self.CLEANER,
         )
+        self.concurrency = max(1, int(concurrency or 1))
+        # 令牌桶在进程内共享，后创建的实例以自己的配置为准
+        self.manager.limiter.configure(
+            request_rate,
+            request_burst,
+            request_rate_min,
+            request_rate_max,
+        )
         self.mapping_data = mapping_data or {}
         self.map_recorder = MapRecorder(
             self.manager,
@@ -228,18 +246,15 @@ class XHS:
         else:
             logging(log, _("共 {0} 个小红书作品待处理...").format(len(urls)))
         # return urls  # 调试代码
-        return [
-            await self.__deal_extract(
-                i,
-                download,
-                index,
-                log,
-                bar,
-                data,
-                cookie
-            )
-            for i in urls
-        ]
+        return await self.__deal_extract_batch(
+            urls,
+            download,
+            index,
+            log,
+            bar,
+            data,
+            cookie,
+        )
 
     async def extract_cli(
         self,
@@ -264,17 +279,24 @@ class XHS:
                 data,
             )
         else:
-            [
-                await self.__deal_extract(
-                    u,
-                    download,
-                    index,
-                    log,
-                    bar,
-                    data,
-                )
-                for u in url
-            ]
+            await self.__deal_extract_batch(
+                url,
+                download,
+                index,
+                log,
+                bar,
+                data,
+            )
+
+    async def __deal_extract_batch(self, urls: list[str], *args) -> list:
+        # 按 concurrency 并发处理，结果顺序与输入链接一致；请求节奏由 Html 的按域名令牌桶控制
+        semaphore = Semaphore(self.concurrency)
+
+        async def worker(url: str):
+            async with semaphore:
+                return await self.__deal_extract(url, *args)
+
+        return list(await gather(*(worker(i) for i in urls)))
 
     def __normalize_login_redirect(self, url: str) -> str:
         if not url:
@@ -299,13 +321,19 @@ class XHS:
 
     async def extract_links(self, url: str, log) -> list:
         urls = []
-        for i in url.split():
-            if u := self.SHORT.search(i):
-                i = await self.html.request_url(
-                    u.group(),
-                    False,
-                    log,
-                )
+        semaphore = Semaphore(self.concurrency)
+
+        async def resolve(text: str) -> str:
+            if u := self.SHORT.search(text):
+                async with semaphore:
+                    return await self.html.request_url(
+                        u.group(),
+                        False,
+                        log,
+                    )
+            return text
+
+        for i in await gather(*(resolve(i) for i in url.split())):
             if not i:
                 continue
             i = self.__normalize_login_redirect(i)
@@ -487,6 +515,9 @@ class XHS:
     def stop_monitor(self):
         self.event.set()
 
+    def rate_limits(self) -> dict:
+        return self.manager.limiter.stats()
+
     async def skip_download(self, id_: str) -> bool:
         return bool(await self.id_recorder.select(id_))
 
@@ -638,6 +669,15 @@ class XHS:
                     msg = _("获取小红书作品数据失败")
             return ExtractData(message=msg, params=extract, data=data)
 
+        @server.get(
+            "/xhs/limits",
+            summary=_("查看请求速率"),
+            description=_("返回各域名当前的自适应请求速率、令牌余量、平均耗时与限流次数"),
+            tags=["API"],
+        )
+        async def limits():
+            return self.rate_limits()
+
     async def run_mcp_server(
         self,
         transport="streamable-http",
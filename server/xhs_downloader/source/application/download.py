@@ -1,19 +1,26 @@
 from asyncio import Semaphore, gather
+from json import dumps, loads
+from os import replace
 from pathlib import Path
+from time import monotonic
 from typing import TYPE_CHECKING, Any
 
 from aiofiles import open
-from httpx import HTTPError
+from httpx import HTTPError, RemoteProtocolError
 
 from ..expansion import CacheError
 
 # from ..module import WARNING
 from ..module import (
+    DOWNLOAD_SEGMENT_SAVE_INTERVAL,
+    DOWNLOAD_SEGMENT_THRESHOLD,
+    DOWNLOAD_SEGMENTS,
     ERROR,
     FILE_SIGNATURES,
     FILE_SIGNATURES_LENGTH,
     MAX_WORKERS,
     logging,
+    mark_failure,
     # sleep_time,
 )
 from ..module import retry as re_download
@@ -212,49 +219,20 @@ class Download:
     ):
         async with self._semaphore:
             headers = self.headers.copy()
-            # try:
-            #     length, suffix = await self.__head_file(
-            #         url,
-            #         headers,
-            #         format_,
-            #     )
-            # except HTTPError as error:
-            #     logging(
-            #         log,
-            #         _(
-            #             "网络异常，{0} 请求失败，错误信息: {1}").format(name, repr(error)),
-            #         ERROR,
-            #     )
-            #     return False
-            # temp = self.temp.joinpath(f"{name}.{suffix}")
             self.temp.mkdir(parents=True, exist_ok=True)
             temp = self.temp.joinpath(f"{name}.{format_}")
-            self.__update_headers_range(
-                headers,
-                temp,
-            )
             try:
-                async with self.client.stream(
-                    "GET",
+                # 只对视频尝试分段下载，图片不额外发送 HEAD 请求
+                if format_ != self.video_format or not await self.__download_segmented(
                     url,
-                    headers=headers,
-                ) as response:
-                    # await sleep_time()
-                    if response.status_code == 416:
-                        raise CacheError(
-                            _("文件 {0} 缓存异常，重新下载").format(temp.name),
-                        )
-                    response.raise_for_status()
-                    # self.__create_progress(
-                    #     bar,
-                    #     int(
-                    #         response.headers.get(
-                    #             'content-length', 0)) or None,
-                    # )
-                    async with open(temp, "ab") as f:
-                        async for chunk in response.aiter_bytes(self.chunk):
-                            await f.write(chunk)
-                            # self.__update_progress(bar, len(chunk))
+                    headers,
+                    temp,
+                ):
+                    await self.__download_stream(
+                        url,
+                        headers,
+                        temp,
+                    )
                 real = await self.__suffix_with_file(
                     temp,
                     path,
@@ -274,6 +252,7 @@ class Download:
                 return True
             except HTTPError as error:
                 # self.__create_progress(bar, None)
+                mark_failure(error)
                 logging(
                     log,
                     _("网络异常，{0} 下载失败，错误信息: {1}").format(
@@ -284,12 +263,188 @@ class Download:
                 return False
             except CacheError as error:
                 self.manager.delete(temp)
+                self.manager.delete(self.__segments_file(temp))
+                mark_failure(error)
                 logging(
                     log,
                     str(error),
                     ERROR,
                 )
 
+    async def __download_stream(
+        self,
+        url: str,
+        headers: dict[str, str],
+        temp: Path,
+    ) -> None:
+        self.__update_headers_range(
+            headers,
+            temp,
+        )
+        async with self.client.stream(
+            "GET",
+            url,
+            headers=headers,
+        ) as response:
+            # await sleep_time()
+            if response.status_code == 416:
+                raise CacheError(
+                    _("文件 {0} 缓存异常，重新下载").format(temp.name),
+                )
+            response.raise_for_status()
+            # self.__create_progress(
+            #     bar,
+            #     int(
+            #         response.headers.get(
+            #             'content-length', 0)) or None,
+            # )
+            async with open(temp, "ab") as f:
+                async for chunk in response.aiter_bytes(self.chunk):
+                    await f.write(chunk)
+                    # self.__update_progress(bar, len(chunk))
+
+    async def __download_segmented(
+        self,
+        url: str,
+        headers: dict[str, str],
+        temp: Path,
+    ) -> bool:
+        # 文件较大且服务器支持 Range 时，多个连接并行下载各分段写入预分配的缓存文件；
+        # 返回 False 表示不适用，由调用方按单连接下载
+        try:
+            length, _suffix, ranges = await self.__head_file(
+                url,
+                headers,
+                self.video_format,
+            )
+        except HTTPError:
+            return False
+        segments_file = self.__segments_file(temp)
+        if not segments_file.exists() and (
+            not ranges or length < DOWNLOAD_SEGMENT_THRESHOLD
+        ):
+            return False
+        segments = self.__load_segments(segments_file, length)
+        if segments is None:
+            if segments_file.exists():
+                # 分段记录与服务器返回的文件大小不一致，缓存作废
+                self.manager.delete(temp)
+                self.manager.delete(segments_file)
+            # 单连接下载留下的缓存视为第一段已完成的部分，从其末尾继续
+            resume = self.__get_resume_byte_position(temp)
+            if resume > length:
+                raise CacheError(
+                    _("文件 {0} 缓存异常，重新下载").format(temp.name),
+                )
+            segments = self.__plan_segments(resume, length)
+            with temp.open("r+b" if temp.exists() else "wb") as f:
+                f.truncate(length)
+            self.__save_segments(segments_file, length, segments)
+        # 等待所有分段结束后再抛出异常，避免重试时仍有分段在写入缓存文件
+        results = await gather(
+            *[
+                self.__download_segment(
+                    url,
+                    headers,
+                    temp,
+                    segments_file,
+                    length,
+                    segments,
+                    i,
+                )
+                for i in segments
+                if i[0] + i[2] <= i[1]
+            ],
+            return_exceptions=True,
+        )
+        if False in results:
+            # 服务器忽略 Range 返回了完整文件，丢弃分段缓存，改为单连接下载
+            self.manager.delete(temp)
+            self.manager.delete(segments_file)
+            return False
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        self.manager.delete(segments_file)
+        return True
+
+    async def __download_segment(
+        self,
+        url: str,
+        headers: dict[str, str],
+        temp: Path,
+        segments_file: Path,
+        length: int,
+        segments: list[list[int]],
+        segment: list[int],
+    ) -> bool:
+        start, end = segment[0], segment[1]
+        headers = headers | {"Range": f"bytes={start + segment[2]}-{end}"}
+        async with self.client.stream(
+            "GET",
+            url,
+            headers=headers,
+        ) as response:
+            response.raise_for_status()
+            if response.status_code == 200:
+                return False
+            if response.status_code != 206:
+                raise CacheError(
+                    _("文件 {0} 分段下载失败，重新下载").format(temp.name),
+                )
+            saved = monotonic()
+            try:
+                async with open(temp, "r+b") as f:
+                    await f.seek(start + segment[2])
+                    async for chunk in response.aiter_bytes(self.chunk):
+                        chunk = chunk[: end + 1 - start - segment[2]]
+                        await f.write(chunk)
+                        segment[2] += len(chunk)
+                        if monotonic() - saved >= DOWNLOAD_SEGMENT_SAVE_INTERVAL:
+                            # 先把缓冲区写入文件，保证记录的进度不超过已写入的数据
+                            await f.flush()
+                            self.__save_segments(segments_file, length, segments)
+                            saved = monotonic()
+            finally:
+                # 缓存文件关闭后记录最终进度，连接中断时重试从这里继续
+                self.__save_segments(segments_file, length, segments)
+        if start + segment[2] <= end:
+            # 连接提前结束：已下载部分保留在分段记录中，重试时继续
+            raise RemoteProtocolError(
+                _("文件 {0} 分段下载不完整").format(temp.name),
+            )
+        return True
+
+    @staticmethod
+    def __plan_segments(resume: int, length: int) -> list[list[int]]:
+        # 每个分段为 [起始字节, 结束字节（含）, 已下载字节数]
+        size = max(1, -(-(length - resume) // DOWNLOAD_SEGMENTS))
+        segments = [[0, resume - 1, resume]] if resume else []
+        for start in range(resume, length, size):
+            segments.append([start, min(start + size, length) - 1, 0])
+        return segments
+
+    @staticmethod
+    def __segments_file(temp: Path) -> Path:
+        return temp.with_name(f"{temp.name}.segments")
+
+    @staticmethod
+    def __load_segments(file: Path, length: int) -> list[list[int]] | None:
+        if not file.is_file():
+            return None
+        try:
+            data = loads(file.read_text())
+        except ValueError:
+            return None
+        return data["segments"] if data.get("length") == length else None
+
+    @staticmethod
+    def __save_segments(file: Path, length: int, segments: list[list[int]]) -> None:
+        # 先写临时文件再替换，进程中断时不会留下半截的分段记录
+        temp = file.with_name(f"{file.name}.tmp")
+        temp.write_text(dumps({"length": length, "segments": segments}))
+        replace(temp, file)
+
     @staticmethod
     def __create_progress(
         bar,
@@ -313,8 +468,7 @@ class Download:
         url: str,
         headers: dict[str, str],
         suffix: str,
-    ) -> tuple[int, str]:
-        """未使用"""
+    ) -> tuple[int, str, bool]:
         response = await self.client.head(
             url,
             headers=headers,
@@ -323,7 +477,8 @@ class Download:
         response.raise_for_status()
         suffix = self.__extract_type(response.headers.get("Content-Type")) or suffix
         length = response.headers.get("Content-Length", 0)
-        return int(length), suffix
+        ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return int(length), suffix, ranges
 
     @staticmethod
     def __get_resume_byte_position(file: Path) -> int:
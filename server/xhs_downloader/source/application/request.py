@@ -1,9 +1,10 @@
+from time import monotonic
 from typing import TYPE_CHECKING
 
-from httpx import HTTPError
+from httpx import HTTPError, TimeoutException
 from httpx import get
 
-from ..module import ERROR, Manager, logging, retry, sleep_time
+from ..module import ERROR, Manager, logging, mark_failure, retry
 from ..translation import _
 
 if TYPE_CHECKING:
@@ -21,6 +22,7 @@ class Html:
         self.client = manager.request_client
         self.headers = manager.headers
         self.timeout = manager.timeout
+        self.limiter = manager.limiter
 
     @retry
     async def request_url(
@@ -37,6 +39,8 @@ class Html:
         headers = self.update_cookie(
             cookie,
         )
+        await self.limiter.wait(url)
+        start = monotonic()
         try:
             match bool(proxy):
                 case False:
@@ -45,9 +49,6 @@ class Html:
                         headers,
                         **kwargs,
                     )
-                    await sleep_time()
-                    response.raise_for_status()
-                    return response.text if content else str(response.url)
                 case True:
                     response = await self.__request_url_get_proxy(
                         url,
@@ -55,12 +56,20 @@ class Html:
                         proxy,
                         **kwargs,
                     )
-                    await sleep_time()
-                    response.raise_for_status()
-                    return response.text if content else str(response.url)
                 case _:
                     raise ValueError
+            self.limiter.feedback(
+                url,
+                response.status_code,
+                monotonic() - start,
+                str(response.url),
+            )
+            response.raise_for_status()
+            return response.text if content else str(response.url)
         except HTTPError as error:
+            if isinstance(error, TimeoutException):
+                self.limiter.feedback(url, None, monotonic() - start)
+            mark_failure(error)
             logging(
                 log, _("网络异常，{0} 请求失败: {1}").format(url, repr(error)), ERROR
             )
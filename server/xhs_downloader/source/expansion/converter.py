@@ -1,13 +1,27 @@
+from json import JSONDecodeError, loads
+from re import compile
 from typing import Union
 
 from lxml.etree import HTML
 from yaml import safe_load
 
+try:
+    from orjson import JSONDecodeError as OrjsonDecodeError
+    from orjson import loads as orjson_loads
+except ImportError:
+    OrjsonDecodeError = JSONDecodeError
+    orjson_loads = None
+
 __all__ = ["Converter"]
 
 
 class Converter:
     INITIAL_STATE = "//script/text()"
+    STATE_PREFIX = "window.__INITIAL_STATE__"
+    SCRIPT_OPEN = "<script"
+    SCRIPT_CLOSE = "</script>"
+    # 字符串字面量原样保留，只替换字符串之外的 undefined
+    UNDEFINED = compile(r'"(?:[^"\\]|\\.)*"|\bundefined\b')
     KEYS_LINK = (
         "note",
         "noteDetailMap",
@@ -21,13 +35,48 @@ class Converter:
     def _extract_object(self, html: str) -> str:
         if not html:
             return ""
+        return self.find_script(html) or self._extract_object_tree(html)
+
+    def _extract_object_tree(self, html: str) -> str:
         html_tree = HTML(html)
         scripts = html_tree.xpath(self.INITIAL_STATE)
         return self.get_script(scripts)
 
+    @classmethod
+    def find_script(cls, html: str) -> str:
+        end = len(html)
+        while (start := html.rfind(cls.STATE_PREFIX, 0, end)) != -1:
+            end = start
+            tag_end = html.rfind(">", 0, start)
+            tag_start = html.rfind("<", 0, start)
+            if (
+                tag_end > tag_start != -1
+                and html.startswith(cls.SCRIPT_OPEN, tag_start)
+                and not html[tag_end + 1 : start].strip()
+            ):
+                close = html.find(cls.SCRIPT_CLOSE, start)
+                return html[start : close if close != -1 else len(html)].rstrip()
+        return ""
+
+    @classmethod
+    def _convert_object(cls, text: str) -> dict:
+        body = text[len(cls.STATE_PREFIX) :] if text.startswith(cls.STATE_PREFIX) else text
+        body = body.lstrip(" =").rstrip().rstrip(";")
+        try:
+            return cls.parse_json(body)
+        except (JSONDecodeError, OrjsonDecodeError, ValueError):
+            return safe_load(text.lstrip("window.__INITIAL_STATE__="))
+
+    @classmethod
+    def parse_json(cls, text: str) -> dict:
+        if "undefined" in text:
+            text = cls.UNDEFINED.sub(cls._undefined_to_null, text)
+        return orjson_loads(text) if orjson_loads else loads(text)
+
     @staticmethod
-    def _convert_object(text: str) -> dict:
-        return safe_load(text.lstrip("window.__INITIAL_STATE__="))
+    def _undefined_to_null(match) -> str:
+        token = match.group(0)
+        return "null" if token == "undefined" else token
 
     @classmethod
     def _filter_object(cls, data: dict) -> dict:
@@ -1,4 +1,4 @@
-from copy import deepcopy
+from functools import lru_cache
 from types import SimpleNamespace
 from typing import Union
 
@@ -6,8 +6,19 @@ __all__ = ["Namespace"]
 
 
 class Namespace:
+    # 路径中索引无法解析为整数时的标记，取值时直接返回默认值
+    INVALID_INDEX = object()
+
     def __init__(self, data: dict) -> None:
-        self.data: SimpleNamespace = self.generate_data_object(data)
+        self.raw = data
+        self.__data = None
+
+    @property
+    def data(self) -> SimpleNamespace:
+        # 只有调用方需要属性访问整棵树时才转换
+        if self.__data is None:
+            self.__data = self.generate_data_object(self.raw)
+        return self.__data
 
     @staticmethod
     def generate_data_object(data: dict) -> SimpleNamespace:
@@ -28,36 +39,67 @@ class Namespace:
         attribute_chain: str,
         default: Union[str, int, list, dict, SimpleNamespace] = "",
     ):
-        return self.__safe_extract(self.data, attribute_chain, default)
+        return self.__safe_extract(self.raw, attribute_chain, default)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def compile_path(attribute_chain: str) -> tuple:
+        steps = []
+        for attribute in attribute_chain.split("."):
+            if "[" in attribute:
+                parts = attribute.split("[", 1)
+                try:
+                    index = int(parts[1][:-1])
+                except ValueError:
+                    index = Namespace.INVALID_INDEX
+                steps.append((parts[0], index))
+            else:
+                steps.append((attribute, None))
+        return tuple(steps)
 
     @staticmethod
+    def __get(data, attribute: str):
+        if isinstance(data, dict):
+            return data.get(attribute)
+        return getattr(data, attribute, None)
+
+    @staticmethod
+    def __missing(data) -> bool:
+        # 旧实现在转换后的对象上判断，空字典对应的 SimpleNamespace() 为真值，不视为缺失；
+        # 中间步骤取到空字典时，下一步取值自然落空并返回默认值
+        return not data and data != {}
+
+    @classmethod
     def __safe_extract(
-        data_object: SimpleNamespace,
+        cls,
+        data_object: Union[dict, SimpleNamespace],
         attribute_chain: str,
         default: Union[str, int, list, dict, SimpleNamespace] = "",
     ):
-        data = deepcopy(data_object)
-        attributes = attribute_chain.split(".")
-        for attribute in attributes:
-            if "[" in attribute:
-                parts = attribute.split("[", 1)
-                attribute = parts[0]
-                index = parts[1][:-1]
-                try:
-                    index = int(index)
-                    data = getattr(data, attribute, None)[index]
-                except (IndexError, TypeError, ValueError):
+        data = data_object
+        for attribute, index in cls.compile_path(attribute_chain):
+            if index is None:
+                data = cls.__get(data, attribute)
+                if cls.__missing(data):
                     return default
+            elif index is cls.INVALID_INDEX:
+                return default
             else:
-                data = getattr(data, attribute, None)
-                if not data:
+                try:
+                    data = cls.__get(data, attribute)[index]
+                except (IndexError, KeyError, TypeError):
                     return default
-        return data or default
+        if cls.__missing(data):
+            return default
+        # 只转换取到的子树，调用方拿到的是独立副本，不会修改原始数据
+        if isinstance(data, (dict, list)):
+            return cls.generate_data_object(data)
+        return data
 
     @classmethod
     def object_extract(
         cls,
-        data_object: SimpleNamespace,
+        data_object: Union[dict, SimpleNamespace],
         attribute_chain: str,
         default: Union[str, int, list, dict, SimpleNamespace] = "",
     ):
@@ -81,4 +123,4 @@ class Namespace:
         }
 
     def __bool__(self):
-        return bool(vars(self.data))
+        return bool(self.raw)
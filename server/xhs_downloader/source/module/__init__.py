@@ -1,4 +1,5 @@
 from .extend import Account
+from .limiter import HostLimiter, TokenBucket
 from .manager import Manager
 from .model import (
     ExtractData,
@@ -31,10 +32,21 @@ from .static import (
     FILE_SIGNATURES,
     FILE_SIGNATURES_LENGTH,
     MAX_WORKERS,
+    DOWNLOAD_SEGMENT_THRESHOLD,
+    DOWNLOAD_SEGMENTS,
+    DOWNLOAD_SEGMENT_SAVE_INTERVAL,
+    REQUEST_RATE,
+    REQUEST_BURST,
+    REQUEST_RATE_MIN,
+    REQUEST_RATE_MAX,
     __VERSION__,
 )
 from .tools import (
     retry,
+    mark_failure,
+    RetryBudget,
+    RetryPolicy,
+    RETRY_POLICY,
     logging,
     sleep_time,
     retry_limited,
@@ -0,0 +1,205 @@
+from asyncio import sleep
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlparse
+
+from .static import (
+    REQUEST_BURST,
+    REQUEST_LATENCY_BACKOFF,
+    REQUEST_LATENCY_TARGET,
+    REQUEST_RATE,
+    REQUEST_RATE_BACKOFF,
+    REQUEST_RATE_MAX,
+    REQUEST_RATE_MIN,
+    REQUEST_RATE_STEP,
+    THROTTLE_STATUS,
+)
+
+__all__ = ["TokenBucket", "HostLimiter"]
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float = REQUEST_RATE,
+        capacity: float = REQUEST_BURST,
+        min_rate: float = REQUEST_RATE_MIN,
+        max_rate: float = REQUEST_RATE_MAX,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.decreased = 0.0
+        self.latency = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.lock = Lock()
+
+    def __refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+
+    def reserve(self) -> float:
+        # 预先扣除令牌（允许为负），返回需要等待的秒数；并发调用按到达顺序依次排开
+        with self.lock:
+            self.__refill(monotonic())
+            self.tokens -= 1
+            self.requests += 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self) -> None:
+        if (delay := self.reserve()) > 0:
+            await sleep(delay)
+
+    def success(self, latency: float) -> None:
+        # AIMD：响应正常且延迟未超过目标时加性提升速率，延迟偏高时小幅降低
+        with self.lock:
+            self.__refill(monotonic())
+            self.latency = (
+                latency if not self.latency else self.latency * 0.8 + latency * 0.2
+            )
+            if latency > REQUEST_LATENCY_TARGET:
+                self.__decrease(REQUEST_LATENCY_BACKOFF)
+            else:
+                self.rate = min(self.max_rate, self.rate + REQUEST_RATE_STEP)
+
+    def throttle(self) -> None:
+        # 被限流（429 / 461 / 验证码）时乘性降低速率并清空突发额度
+        with self.lock:
+            self.__refill(monotonic())
+            self.throttled += 1
+            self.__decrease(REQUEST_RATE_BACKOFF)
+            self.tokens = min(self.tokens, 0)
+
+    def __decrease(self, factor: float) -> None:
+        # 同一请求间隔内的多次降速只生效一次，避免并发请求同时失败时速率被连续压到下限
+        now = monotonic()
+        if now - self.decreased < 1 / self.rate:
+            return
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.decreased = now
+
+    def configure(
+        self,
+        capacity: float,
+        min_rate: float,
+        max_rate: float,
+    ) -> None:
+        with self.lock:
+            self.capacity = capacity
+            self.min_rate = min_rate
+            self.max_rate = max_rate
+            self.rate = min(max(self.rate, min_rate), max_rate)
+            self.tokens = min(self.tokens, capacity)
+
+    def stats(self) -> dict:
+        with self.lock:
+            self.__refill(monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "tokens": round(self.tokens, 3),
+                "capacity": self.capacity,
+                "latency": round(self.latency, 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+            }
+
+
+class HostLimiter:
+    __shared = None
+    __shared_lock = Lock()
+
+    def __init__(
+        self,
+        rate: float = REQUEST_RATE,
+        capacity: float = REQUEST_BURST,
+        min_rate: float = REQUEST_RATE_MIN,
+        max_rate: float = REQUEST_RATE_MAX,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.buckets: dict[str, TokenBucket] = {}
+        self.lock = Lock()
+
+    @classmethod
+    def shared(cls) -> "HostLimiter":
+        # 进程内所有 XHS 实例共用同一组令牌桶
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = cls()
+            return cls.__shared
+
+    def configure(
+        self,
+        rate: float = REQUEST_RATE,
+        capacity: float = REQUEST_BURST,
+        min_rate: float = REQUEST_RATE_MIN,
+        max_rate: float = REQUEST_RATE_MAX,
+    ) -> None:
+        # 初始速率只影响新出现的域名；已有令牌桶保留当前自适应速率，仅按新的上下限收敛
+        max_rate = max(max_rate, min_rate)
+        with self.lock:
+            self.rate = rate
+            self.capacity = capacity
+            self.min_rate = min_rate
+            self.max_rate = max_rate
+            buckets = list(self.buckets.values())
+        for bucket in buckets:
+            bucket.configure(capacity, min_rate, max_rate)
+
+    @staticmethod
+    def host(url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = self.host(url)
+        with self.lock:
+            if (bucket := self.buckets.get(host)) is None:
+                bucket = self.buckets[host] = TokenBucket(
+                    self.rate,
+                    self.capacity,
+                    self.min_rate,
+                    self.max_rate,
+                )
+            return bucket
+
+    async def wait(self, url: str) -> None:
+        if self.rate > 0:
+            await self.bucket(url).acquire()
+
+    def feedback(
+        self,
+        url: str,
+        status: int | None,
+        latency: float,
+        final_url: str = "",
+    ) -> None:
+        # status 为 None 表示请求超时，与限流同样处理
+        if self.rate <= 0:
+            return
+        bucket = self.bucket(url)
+        if self.is_throttled(status, final_url):
+            bucket.throttle()
+        elif status < 400:
+            bucket.success(latency)
+
+    @staticmethod
+    def is_throttled(status: int | None, final_url: str = "") -> bool:
+        return (
+            status is None
+            or status in THROTTLE_STATUS
+            or "captcha" in final_url.lower()
+        )
+
+    def stats(self) -> dict:
+        with self.lock:
+            buckets = dict(self.buckets)
+        return {host: bucket.stats() for host, bucket in buckets.items()}
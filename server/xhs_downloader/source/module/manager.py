@@ -14,6 +14,7 @@ from httpx import (
 from ..expansion import remove_empty_directories
 
 from ..translation import _
+from .limiter import HostLimiter
 from .static import HEADERS, USERAGENT, WARNING
 from .tools import logging
 from typing import TYPE_CHECKING
@@ -98,6 +99,7 @@ class Manager:
             _print,
         )
         self.timeout = timeout
+        self.limiter = HostLimiter.shared()
         self.request_client = AsyncClient(
             headers=self.headers
             | {
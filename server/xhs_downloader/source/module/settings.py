@@ -30,6 +30,11 @@ class Settings:
         "author_archive": False,  # 是否按作者归档
         "write_mtime": False,  # 是否写入修改时间
         "language": "zh_CN",  # 语言设置
+        "concurrency": 4,  # 多链接并发处理数量
+        "request_rate": 1.0,  # 同一域名的初始请求速率(次/秒)
+        "request_burst": 3,  # 同一域名的突发请求数量
+        "request_rate_min": 0.2,  # 自适应速率下限(次/秒)
+        "request_rate_max": 5.0,  # 自适应速率上限(次/秒)
     }
     # 根据操作系统设置编码格式
     encode = "UTF-8-SIG" if system() == "Windows" else "UTF-8"
@@ -65,6 +65,35 @@ FILE_SIGNATURES_LENGTH = max(
 )
 
 MAX_WORKERS: int = 4
+# 视频文件不小于该大小（字节）且服务器支持 Range 时分段并行下载，分段数为 DOWNLOAD_SEGMENTS
+DOWNLOAD_SEGMENT_THRESHOLD: int = 16 * 1024 * 1024
+DOWNLOAD_SEGMENTS: int = 4
+# 分段下载进度写入分段记录的最短间隔（秒）；分段结束或中断时总会写入
+DOWNLOAD_SEGMENT_SAVE_INTERVAL: float = 1.0
+# 同一域名的初始请求速率（次/秒）与突发容量，替代每次请求后固定随机休眠
+REQUEST_RATE: float = 1.0
+REQUEST_BURST: int = 3
+# 自适应速率（AIMD）：正常响应加性提升，被限流时乘性降低，速率保持在上下限之间
+REQUEST_RATE_MIN: float = 0.2
+REQUEST_RATE_MAX: float = 5.0
+REQUEST_RATE_STEP: float = 0.1
+REQUEST_RATE_BACKOFF: float = 0.5
+# 响应耗时超过目标值（秒）时小幅降速
+REQUEST_LATENCY_TARGET: float = 3.0
+REQUEST_LATENCY_BACKOFF: float = 0.8
+# 视为限流的状态码：429 Too Many Requests，461 为小红书风控
+THROTTLE_STATUS = frozenset({429, 461})
+
+# 重试退避：第 n 次重试前等待 [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^n)) 秒
+RETRY_BASE_DELAY: float = 0.5
+RETRY_MAX_DELAY: float = 8.0
+# 单次调用全部重试的退避等待总时长上限（秒），不含请求与传输本身的耗时
+RETRY_DEADLINE: float = 60.0
+# 全局重试预算：重试次数不超过调用次数的 RETRY_BUDGET_RATIO 倍，另可突发 RETRY_BUDGET_RESERVE 次
+RETRY_BUDGET_RATIO: float = 0.2
+RETRY_BUDGET_RESERVE: float = 10.0
+# 值得重试的 HTTP 状态码，其余 4xx / 5xx 视为永久性错误
+RETRY_STATUS = frozenset({408, 425, 429, 461, 500, 502, 503, 504})
 
 if __name__ == "__main__":
     print(__VERSION__)
@@ -1,21 +1,123 @@
 from asyncio import sleep
+from contextvars import ContextVar
 from random import uniform
+from threading import Lock
 
+from httpx import HTTPStatusError, TimeoutException, TransportError
 from rich import print
 from rich.text import Text
 
+from ..expansion import CacheError
 from ..translation import _
-from .static import INFO
+from .static import (
+    INFO,
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_RESERVE,
+    RETRY_DEADLINE,
+    RETRY_MAX_DELAY,
+    RETRY_STATUS,
+)
+
+# 被 retry 装饰的函数在失败分支调用 mark_failure 记录原因，供重试策略判断是否值得重试
+_failure: ContextVar[BaseException | None] = ContextVar("retry_failure", default=None)
+
+
+def mark_failure(error: BaseException) -> None:
+    _failure.set(error)
+
+
+class RetryBudget:
+    # 进程内共享的重试预算：每次调用存入 ratio 个令牌（最多积累 reserve 个），每次重试消耗 1 个，
+    # 故障期间重试量不超过调用量的 ratio 倍，避免重试成倍放大负载
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        reserve: float = RETRY_BUDGET_RESERVE,
+    ):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.exhausted = 0
+        self.lock = Lock()
+
+    def deposit(self) -> None:
+        with self.lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        deadline: float = RETRY_DEADLINE,
+        budget: RetryBudget = None,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget or RetryBudget()
+
+    @staticmethod
+    def retryable(error: BaseException | None) -> bool:
+        match error:
+            case None | CacheError() | TimeoutException():
+                # 未记录原因的失败沿用原有行为，视为可重试
+                return True
+            case HTTPStatusError():
+                # 404 / 403 等永久性错误直接放弃
+                return error.response.status_code in RETRY_STATUS
+            case TransportError():
+                return True
+        return False
+
+    def delay(self, attempt: int, error: BaseException | None) -> float:
+        # 指数退避 + 全抖动；服务端给出 Retry-After 时以其为下限
+        delay = uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if isinstance(error, HTTPStatusError):
+            after = error.response.headers.get("Retry-After", "")
+            if after.isdigit():
+                delay = max(delay, min(float(after), self.max_delay))
+        return delay
+
+
+RETRY_POLICY = RetryPolicy()
 
 
 def retry(function):
     async def inner(self, *args, **kwargs):
-        if result := await function(self, *args, **kwargs):
-            return result
-        for __ in range(self.retry):
-            if result := await function(self, *args, **kwargs):
+        policy = RETRY_POLICY
+        policy.budget.deposit()
+        # 只累计退避等待时间：长时间下载在传输中失败后仍可重试（断点续传）
+        waited = 0.0
+        attempt = 0
+        while True:
+            token = _failure.set(None)
+            try:
+                if result := await function(self, *args, **kwargs):
+                    return result
+                error = _failure.get()
+            finally:
+                _failure.reset(token)
+            if attempt >= self.retry or not policy.retryable(error):
+                return result
+            delay = policy.delay(attempt, error)
+            if waited + delay > policy.deadline:
+                return result
+            if not policy.budget.withdraw():
                 return result
-        return result
+            attempt += 1
+            waited += delay
+            await sleep(delay)
 
     return inner
 
@@ -1,18 +1,97 @@
 """
 小红书笔记统一下载工具
 适配 API 模式和 Web 模式的数据结构，统一下载逻辑
+
+下载引擎：
+- 共享带连接池的 requests.Session（keep-alive）
+- 同一 host 的并发下载数受 XHS_DOWNLOAD_PER_HOST 限制
+- 单个文件失败独立重试（XHS_DOWNLOAD_RETRIES 次，指数退避）
+- 笔记内图片并发下载，batch_download_notes 多个笔记并行处理
 """
 import os
 import re
 import json
+import time
 import logging
+import threading
 import requests
-from typing import Dict, Any, Optional, List
-from retry import retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# 全局文件下载线程数、单个 host 并发上限、笔记级并行数
+DOWNLOAD_WORKERS = int(os.getenv("XHS_DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_PER_HOST = int(os.getenv("XHS_DOWNLOAD_PER_HOST", "4"))
+NOTE_WORKERS = int(os.getenv("XHS_DOWNLOAD_NOTE_WORKERS", "3"))
+DOWNLOAD_RETRIES = int(os.getenv("XHS_DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_RETRY_DELAY = 1.0
+DOWNLOAD_TIMEOUT = (10, 30)
+
+_session: Optional[requests.Session] = None
+_download_executor: Optional[ThreadPoolExecutor] = None
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_engine_lock = threading.Lock()
+
+# 文件下载完成回调：(文件名, 文件路径)，用于下载/上传流水线
+FileReadyCallback = Callable[[str, str], None]
+
+
+def get_session() -> requests.Session:
+    """返回共享的下载 Session（连接池大小与下载线程数匹配）"""
+    global _session
+    with _engine_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _get_download_executor() -> ThreadPoolExecutor:
+    global _download_executor
+    with _engine_lock:
+        if _download_executor is None:
+            _download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="xhs-download")
+        return _download_executor
+
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _engine_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(DOWNLOAD_PER_HOST)
+        return semaphore
+
+
+def _fetch_to_file(url: str, temp_path: str, chunk_size: int) -> int:
+    """流式下载到临时文件，失败按指数退避重试，返回文件字节数"""
+    last_error: Optional[Exception] = None
+    for attempt in range(DOWNLOAD_RETRIES):
+        if attempt:
+            time.sleep(DOWNLOAD_RETRY_DELAY * (2 ** (attempt - 1)))
+        try:
+            with _host_semaphore(url):
+                with get_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    total_size = 0
+                    with open(temp_path, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                                total_size += len(chunk)
+            return total_size
+        except Exception as e:
+            last_error = e
+            logger.warning(f"下载失败（第 {attempt + 1}/{DOWNLOAD_RETRIES} 次） {url}: {e}")
+    raise last_error
+
 
 def norm_str(text: str) -> str:
     """
@@ -85,7 +164,29 @@ def check_and_create_path(path: str) -> None:
         logger.info(f"创建目录: {path}")
 
 
-@retry(tries=3, delay=1)
+def media_file_name(filename: str, media_type: str) -> str:
+    """download_media 保存的文件名（含扩展名）"""
+    return f"{filename}{'.jpg' if media_type == 'image' else '.mp4'}"
+
+
+def _download_and_notify(
+    save_path: str,
+    filename: str,
+    url: str,
+    media_type: str,
+    on_file_ready: Optional[FileReadyCallback] = None
+) -> bool:
+    """下载单个文件，成功后立即回调（流水线模式下由回调开始上传）"""
+    ok = download_media(save_path, filename, url, media_type)
+    if ok and on_file_ready:
+        name = media_file_name(filename, media_type)
+        try:
+            on_file_ready(name, os.path.join(save_path, name))
+        except Exception as e:
+            logger.warning(f"文件就绪回调失败 {name}: {e}")
+    return ok
+
+
 def download_media(save_path: str, filename: str, url: str, media_type: str) -> bool:
     """
     下载媒体文件（图片或视频）
@@ -104,30 +205,20 @@ def download_media(save_path: str, filename: str, url: str, media_type: str) ->
 
     try:
         if media_type == "image":
-            extension = ".jpg"
             chunk_size = 1024 * 1024  # 1MB
         else:  # video
-            extension = ".mp4"
             chunk_size = 1024 * 1024 * 10  # 10MB
 
-        file_path = os.path.join(save_path, f"{filename}{extension}")
+        file_path = os.path.join(save_path, media_file_name(filename, media_type))
 
         # 如果文件已存在，跳过下载
         if os.path.exists(file_path):
             logger.info(f"文件已存在，跳过下载: {file_path}")
             return True
 
-        # 下载到临时文件
+        # 下载到临时文件（单文件独立重试）
         temp_path = file_path + ".tmp"
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = 0
-        with open(temp_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    total_size += len(chunk)
+        total_size = _fetch_to_file(url, temp_path, chunk_size)
 
         logger.info(f"下载完成: {filename} ({total_size / 1024 / 1024:.2f}MB)")
 
@@ -224,7 +315,8 @@ def download_note(
     base_path: str,
     mode: str = "api",
     download_images: bool = True,
-    download_videos: bool = True
+    download_videos: bool = True,
+    on_file_ready: Optional[FileReadyCallback] = None
 ) -> Optional[str]:
     """
     统一的笔记下载方法，支持 API 和 Web 模式
@@ -235,6 +327,7 @@ def download_note(
         mode: "api" 或 "web"
         download_images: 是否下载图片
         download_videos: 是否下载视频
+        on_file_ready: 每个文件下载完成后的回调 (文件名, 文件路径)，可用于边下边传
 
     Returns:
         保存路径，失败返回 None
@@ -269,37 +362,41 @@ def download_note(
         # 保存元数据
         save_note_metadata(normalized, save_path)
 
-        # 根据笔记类型下载媒体文件
+        # 根据笔记类型下载媒体文件（同一笔记的文件并发下载）
+        executor = _get_download_executor()
         if note_type == "图文" and download_images:
             image_list = normalized.get("image_list") or []
             logger.info(f"开始下载图片，共 {len(image_list)} 张")
 
-            for img_index, img_url in enumerate(image_list):
-                if img_url:
-                    success = download_media(
-                        save_path,
-                        f"image_{img_index}",
-                        img_url,
-                        "image"
-                    )
-                    if not success:
-                        logger.warning(f"图片 {img_index} 下载失败")
+            futures = {
+                img_index: executor.submit(
+                    _download_and_notify, save_path, f"image_{img_index}", img_url, "image", on_file_ready
+                )
+                for img_index, img_url in enumerate(image_list)
+                if img_url
+            }
+            for img_index, future in futures.items():
+                if not future.result():
+                    logger.warning(f"图片 {img_index} 下载失败")
 
         elif note_type == "视频" and download_videos:
             logger.info("开始下载视频")
 
-            # 下载视频封面
+            # 视频封面与视频并发下载
             video_cover = normalized.get("video_cover")
-            if video_cover:
-                download_media(save_path, "cover", video_cover, "image")
+            cover_future = executor.submit(
+                _download_and_notify, save_path, "cover", video_cover, "image", on_file_ready
+            ) if video_cover else None
 
-            # 下载视频
             video_addr = normalized.get("video_addr")
-            if video_addr:
-                success = download_media(save_path, "video", video_addr, "video")
-                if not success:
-                    logger.error("视频下载失败")
-                    return None
+            video_ok = _download_and_notify(
+                save_path, "video", video_addr, "video", on_file_ready
+            ) if video_addr else True
+            if cover_future:
+                cover_future.result()
+            if not video_ok:
+                logger.error("视频下载失败")
+                return None
 
         logger.info(f"笔记下载完成: {save_path}")
         return save_path
@@ -334,24 +431,30 @@ def batch_download_notes(
     failed_count = 0
     saved_paths = []
 
-    logger.info(f"开始批量下载 {total} 个笔记")
-
-    for idx, note_data in enumerate(notes_data, 1):
-        logger.info(f"处理第 {idx}/{total} 个笔记")
-
-        save_path = download_note(
-            note_data,
-            base_path,
-            mode=mode,
-            download_images=download_images,
-            download_videos=download_videos
-        )
-
-        if save_path:
-            success_count += 1
-            saved_paths.append(save_path)
-        else:
-            failed_count += 1
+    logger.info(f"开始批量下载 {total} 个笔记（并行 {NOTE_WORKERS}）")
+
+    # 笔记级并行使用独立线程池，避免与文件下载线程池互相等待
+    with ThreadPoolExecutor(max_workers=max(1, NOTE_WORKERS), thread_name_prefix="xhs-note") as note_executor:
+        futures = [
+            note_executor.submit(
+                download_note,
+                note_data,
+                base_path,
+                mode=mode,
+                download_images=download_images,
+                download_videos=download_videos
+            )
+            for note_data in notes_data
+        ]
+        for idx, future in enumerate(futures, 1):
+            save_path = future.result()
+            logger.info(f"第 {idx}/{total} 个笔记处理完成")
+
+            if save_path:
+                success_count += 1
+                saved_paths.append(save_path)
+            else:
+                failed_count += 1
 
     result = {
         "total": total,
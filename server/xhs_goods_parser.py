@@ -6,6 +6,8 @@ import requests
 from typing import Optional, Dict, Any
 import logging
 
+import short_link_resolver
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,31 +49,8 @@ def resolve_goods_short_link(short_url: str, cookie: Optional[str] = None, timeo
     Returns:
         真实的商品详情链接
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Referer': 'https://www.xiaohongshu.com/',
-        }
-
-        if cookie:
-            headers['Cookie'] = cookie
-
-        response = requests.get(
-            short_url,
-            headers=headers,
-            allow_redirects=True,
-            timeout=timeout
-        )
-
-        if response.history:
-            final_url = response.url
-            logger.info(f"商品短链接重定向: {short_url} -> {final_url}")
-            return final_url
-
-        return None
-    except Exception as e:
-        logger.error(f"解析商品短链接失败: {e}")
-        return None
+    # 逐跳读取 Location，不下载落地页；结果按短码缓存
+    return short_link_resolver.resolve(short_url, cookie=cookie, timeout=timeout, body_fallback=False)
 
 
 def extract_goods_id_from_url(url: str) -> Optional[str]:
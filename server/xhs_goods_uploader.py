@@ -3,15 +3,14 @@
 """
 import os
 import logging
-import requests
 from typing import Dict, Any, Optional
 import feishu_table as feishu
 
 logger = logging.getLogger(__name__)
 
 # 飞书商品表格配置
-FEISHU_GOODS_APP_TOKEN = os.getenv("FEISHU_APP_TOKEN", "Pyw7bsxDiaSkKXsBwUqc9DH4n5c")
-FEISHU_GOODS_TABLE_ID = os.getenv("FEISHU_GOODS_TABLE_ID", "tblbfklJzKavr6dd")
+FEISHU_GOODS_APP_TOKEN = feishu.APP_TOKEN
+FEISHU_GOODS_TABLE_ID = feishu.GOODS_TABLE_ID
 
 
 def upload_goods_to_feishu(goods_data: Dict[str, Any], access_token: Optional[str] = None) -> Dict[str, Any]:
@@ -50,39 +49,25 @@ def upload_goods_to_feishu(goods_data: Dict[str, Any], access_token: Optional[st
         goods_url = goods_data.get("goods_url")
         if goods_url:
             # 使用飞书搜索 API 查询
-            search_url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{FEISHU_GOODS_APP_TOKEN}/tables/{FEISHU_GOODS_TABLE_ID}/records/search"
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            }
-            search_body = {
-                "filter": {
-                    "conditions": [
-                        {"field_name": "商品链接", "operator": "is", "value": [goods_url]},
-                    ],
-                    "conjunction": "and",
-                },
-                "page_size": 1,
-            }
-
-            try:
-                response = requests.post(search_url, headers=headers, json=search_body, timeout=15)
-                data = response.json()
-                if data.get("code") == 0:
-                    payload = data.get("data", {})
-                    total = payload.get("total", 0)
-                    if total > 0:
-                        items = payload.get("items", [])
-                        existing_record_id = items[0].get("record_id") if items else None
-                        logger.info(f"商品已存在，跳过上传: {goods_url}")
-                        return {
-                            "ok": True,
-                            "record_id": existing_record_id,
-                            "message": "商品已存在",
-                            "action": "skipped"
-                        }
-            except Exception as search_err:
-                logger.warning(f"搜索商品失败，继续上传: {search_err}")
+            existing = feishu.search_records_by_field(
+                feishu.FIELD_GOODS_URL,
+                goods_url,
+                app_token=FEISHU_GOODS_APP_TOKEN,
+                table_id=FEISHU_GOODS_TABLE_ID,
+                access_token=access_token,
+            )
+            if existing.get("error"):
+                logger.warning(f"搜索商品失败，继续上传: {existing['error']}")
+            elif existing.get("total", 0) > 0:
+                items = existing.get("items", [])
+                existing_record_id = items[0].get("record_id") if items else None
+                logger.info(f"商品已存在，跳过上传: {goods_url}")
+                return {
+                    "ok": True,
+                    "record_id": existing_record_id,
+                    "message": "商品已存在",
+                    "action": "skipped"
+                }
 
         # 准备字段数据
         fields = {}
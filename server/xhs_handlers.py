@@ -4,19 +4,32 @@
 """
 import os
 import logging
-import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from async_runtime import get_runtime, run_async
 from xhs_downloader.source import XHS
-from xhs_provider import get_xhs_apis_class
+from xhs_provider import get_xhs_api_pool
 from xhs_downloader_util import download_note as download_xhs_note
 import feishu_table as feishu
 
 logger = logging.getLogger(__name__)
 
+# 单个进程同时上传到飞书的附件数
+MEDIA_UPLOAD_WORKERS = int(os.getenv("XHS_MEDIA_UPLOAD_WORKERS", "6"))
+_media_upload_executor: Optional[ThreadPoolExecutor] = None
+_media_upload_lock = threading.Lock()
 
-def parse_note_api_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[str, Any]:
+
+def parse_note_api_mode(
+    url: str,
+    xhs_cookie: str,
+    download_dir: str,
+    pipeline: Optional["NoteUploadPipeline"] = None,
+) -> Dict[str, Any]:
     """
     API 模式解析小红书笔记
 
@@ -24,6 +37,7 @@ def parse_note_api_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[st
         url: 标准化的笔记URL
         xhs_cookie: 小红书Cookie
         download_dir: 下载目录
+        pipeline: 传入时每个文件下载完成即开始上传到飞书
 
     Returns:
         解析结果字典
@@ -32,12 +46,9 @@ def parse_note_api_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[st
         if not xhs_cookie:
             return {"ok": False, "error": "缺少 XHS_COOKIE 环境变量（需要包含 a1）"}
 
-        # 获取 API 类
-        XHS_Apis = get_xhs_apis_class()
-        api = XHS_Apis()
-
-        # 调用 API 获取笔记信息
-        success, msg, res_json = api.get_note_info(url, xhs_cookie)
+        # 从实例池借用已就绪的 XHS_Apis，调用 API 获取笔记信息
+        with get_xhs_api_pool().acquire() as api:
+            success, msg, res_json = api.get_note_info(url, xhs_cookie)
 
         if not success:
             return {"ok": False, "error": msg or "获取笔记详情失败"}
@@ -91,7 +102,8 @@ def parse_note_api_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[st
             base_path=os.path.join(download_dir, "xhs"),
             mode="api",
             download_images=True,
-            download_videos=True
+            download_videos=True,
+            on_file_ready=pipeline.on_file_ready if pipeline else None
         )
 
         if save_path:
@@ -108,21 +120,14 @@ def parse_note_api_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[st
         return {"ok": False, "error": str(e)}
 
 
-def parse_note_web_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[str, Any]:
+async def extract_note_web(url: str, xhs_cookie: str, download_dir: str) -> Dict[str, Any]:
     """
-    Web 模式解析小红书笔记
-
-    Args:
-        url: 标准化的笔记URL
-        xhs_cookie: 小红书Cookie
-        download_dir: 下载目录
+    Web 模式提取笔记数据（协程，需在常驻事件循环上执行）
 
-    Returns:
-        解析结果字典
+    XHS 实例常驻复用，按下载目录和 Cookie 区分
     """
-    async def _do_parse() -> dict:
-        """异步解析函数"""
-        async with XHS(
+    async def _create_xhs() -> XHS:
+        xhs = XHS(
             work_path=download_dir,
             folder_name="xhs",
             name_format="作品标题 发布时间 作品ID",
@@ -138,33 +143,68 @@ def parse_note_web_mode(url: str, xhs_cookie: str, download_dir: str) -> Dict[st
             download_record=False,
             language="zh_CN",
             read_cookie=None,
-        ) as xhs:
-            data = await xhs.extract(url, True, cookie=xhs_cookie)
-            return {"ok": True, "data": data}
+        )
+        await xhs.__aenter__()
+        return xhs
+
+    async def _close_xhs(xhs: XHS) -> None:
+        await xhs.__aexit__(None, None, None)
+        await xhs.close()
+
+    name = f"xhs_web:{download_dir}:{hash(xhs_cookie)}"
+    xhs = await get_runtime().resource(name, _create_xhs, _close_xhs)
+    data = await xhs.extract(url, True, cookie=xhs_cookie)
+    return {"ok": True, "data": data}
+
+
+def download_web_note_media(
+    result: Dict[str, Any],
+    download_dir: str,
+    pipeline: Optional["NoteUploadPipeline"] = None,
+) -> Dict[str, Any]:
+    """Web 模式：用统一的下载方法下载 extract_note_web 返回的笔记媒体"""
+    if result.get("ok") and isinstance(result.get("data"), list):
+        for item in result["data"]:
+            save_path = download_xhs_note(
+                note_data=item,
+                base_path=os.path.join(download_dir, "xhs"),
+                mode="web",
+                download_images=True,
+                download_videos=True,
+                on_file_ready=pipeline.on_file_ready if pipeline else None
+            )
 
+            if save_path:
+                item["文件保存路径"] = save_path
+                item["filename"] = os.path.basename(save_path)
+                logger.info(f"Web模式: 笔记媒体文件已保存到: {save_path}")
+            else:
+                logger.warning("Web模式: 笔记媒体文件下载失败")
+    return result
+
+
+def parse_note_web_mode(
+    url: str,
+    xhs_cookie: str,
+    download_dir: str,
+    pipeline: Optional["NoteUploadPipeline"] = None,
+) -> Dict[str, Any]:
+    """
+    Web 模式解析小红书笔记
+
+    Args:
+        url: 标准化的笔记URL
+        xhs_cookie: 小红书Cookie
+        download_dir: 下载目录
+        pipeline: 传入时每个文件下载完成即开始上传到飞书
+
+    Returns:
+        解析结果字典
+    """
     try:
-        # 运行异步解析
-        result = asyncio.run(_do_parse())
-
-        # 使用统一的下载方法
-        if result.get("ok") and isinstance(result.get("data"), list):
-            for item in result["data"]:
-                save_path = download_xhs_note(
-                    note_data=item,
-                    base_path=os.path.join(download_dir, "xhs"),
-                    mode="web",
-                    download_images=True,
-                    download_videos=True
-                )
-
-                if save_path:
-                    item["文件保存路径"] = save_path
-                    item["filename"] = os.path.basename(save_path)
-                    logger.info(f"Web模式: 笔记媒体文件已保存到: {save_path}")
-                else:
-                    logger.warning("Web模式: 笔记媒体文件下载失败")
-
-        return result
+        # 在常驻事件循环上执行异步解析
+        result = run_async(extract_note_web(url, xhs_cookie, download_dir))
+        return download_web_note_media(result, download_dir, pipeline)
 
     except Exception as e:
         logger.error(f"Web模式解析失败: {e}", exc_info=True)
@@ -231,17 +271,88 @@ def parse_timestamp(raw) -> Optional[int]:
         return None
 
 
-def upload_note_to_feishu(note_data: Dict[str, Any], access_token: Optional[str] = None) -> Dict[str, Any]:
+def _get_media_upload_executor() -> ThreadPoolExecutor:
+    """笔记附件上传线程池（进程内共享，限制同时上传到飞书的文件数）"""
+    global _media_upload_executor
+    with _media_upload_lock:
+        if _media_upload_executor is None:
+            _media_upload_executor = ThreadPoolExecutor(
+                max_workers=MEDIA_UPLOAD_WORKERS, thread_name_prefix="xhs-media-upload"
+            )
+        return _media_upload_executor
+
+
+def _timed(func, *args) -> Tuple[Any, float]:
+    """执行函数并返回 (结果, 耗时秒)"""
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+
+def upload_media_file(file_path: str, file_name: str, access_token: Optional[str] = None) -> Optional[str]:
+    """上传单个附件到小红书多维表素材库，返回 file_token"""
+    if not os.path.isfile(file_path):
+        return None
+
+    result = feishu.upload_file_to_bitable(
+        file_path=file_path,
+        file_name=file_name,
+        parent_node=feishu.XHS_APP_TOKEN,
+        parent_type="bitable_file",
+        access_token=access_token,
+    )
+
+    if not result.get("success"):
+        logger.warning(f"上传文件失败 {file_name}: {result.get('message')}")
+        return None
+
+    return result.get("file_token")
+
+
+class NoteUploadPipeline:
+    """
+    下载→上传流水线
+
+    作为 download_note 的 on_file_ready 回调（生产者），每个文件下载完成即提交到附件上传线程池（消费者），
+    upload_note_to_feishu 再按文件名取回已在进行中的上传结果，整体耗时约为 max(下载, 上传)。
+    """
+
+    def __init__(self, access_token: Optional[str] = None):
+        self.access_token = access_token
+        self._futures: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def on_file_ready(self, file_name: str, file_path: str) -> None:
+        with self._lock:
+            if file_name in self._futures:
+                return
+            self._futures[file_name] = _get_media_upload_executor().submit(
+                _timed, upload_media_file, file_path, file_name, self.access_token
+            )
+        logger.debug(f"流水线：{file_name} 下载完成，开始上传")
+
+    def future_for(self, file_name: str):
+        with self._lock:
+            return self._futures.get(file_name)
+
+
+def upload_note_to_feishu(
+    note_data: Dict[str, Any],
+    access_token: Optional[str] = None,
+    pipeline: Optional[NoteUploadPipeline] = None,
+) -> Dict[str, Any]:
     """
     上传笔记到飞书多维表
 
     Args:
         note_data: 笔记数据
         access_token: 飞书访问令牌（可选）
+        pipeline: 下载阶段使用的上传流水线（可选），已开始的上传直接复用
 
     Returns:
-        上传结果
+        上传结果（timings 为各阶段耗时，单位秒；images 按图片顺序给出每张的上传耗时）
     """
+    started = time.perf_counter()
+    timings: Dict[str, Any] = {}
     try:
         if not access_token:
             access_token = feishu.get_tenant_access_token()
@@ -254,65 +365,58 @@ def upload_note_to_feishu(note_data: Dict[str, Any], access_token: Optional[str]
         if not base_dir or not os.path.isdir(base_dir):
             return {"ok": False, "error": "文件保存路径无效"}
 
-        # 上传文件的辅助函数
-        def upload_file(file_path: str, file_name: str) -> Optional[str]:
-            """上传单个文件到飞书"""
-            if not os.path.isfile(file_path):
-                return None
-
-            result = feishu.upload_file_to_bitable(
-                file_path=file_path,
-                file_name=file_name,
-                parent_node=feishu.XHS_APP_TOKEN,
-                parent_type="bitable_file",
-                access_token=access_token,
-            )
-
-            if not result.get("success"):
-                logger.warning(f"上传文件失败 {file_name}: {result.get('message')}")
-                return None
+        executor = _get_media_upload_executor()
 
-            return result.get("file_token")
+        def submit_upload(file_name: str, *, reuse: bool = True):
+            """提交单个附件上传；流水线模式下复用下载完成时已开始的上传"""
+            if reuse and pipeline:
+                future = pipeline.future_for(file_name)
+                if future:
+                    return future
+            return executor.submit(_timed, upload_media_file, os.path.join(base_dir, file_name), file_name, access_token)
 
-        # 上传封面
-        cover_token = None
+        # 收集需要上传的附件（封面、按序号排列的图片、视频），并发上传后按原顺序回填
         note_type = note_data.get('作品类型')
-
+        cover_file = None
         # 优先使用专门的封面文件
-        cover_path = os.path.join(base_dir, "cover.jpg")
-        if os.path.isfile(cover_path):
-            cover_token = upload_file(cover_path, "cover.jpg")
+        if os.path.isfile(os.path.join(base_dir, "cover.jpg")):
+            cover_file = "cover.jpg"
         # 如果是图文类型且没有专门的封面，使用第一张图片作为封面
-        elif note_type == '图文':
-            first_image_path = os.path.join(base_dir, "image_0.jpg")
-            if os.path.isfile(first_image_path):
-                cover_token = upload_file(first_image_path, "image_0.jpg")
-                logger.info("图文笔记：使用第一张图片作为封面")
-
-        # 上传图片
-        img_tokens = []
+        elif note_type == '图文' and os.path.isfile(os.path.join(base_dir, "image_0.jpg")):
+            cover_file = "image_0.jpg"
+            logger.info("图文笔记：使用第一张图片作为封面")
+
+        image_files = []
         if note_type == '图文':
             i = 0
-            while True:
-                img_path = os.path.join(base_dir, f"image_{i}.jpg")
-                if not os.path.isfile(img_path):
-                    break
-                token = upload_file(img_path, f"image_{i}.jpg")
-                if token:
-                    img_tokens.append(token)
+            while os.path.isfile(os.path.join(base_dir, f"image_{i}.jpg")):
+                image_files.append(f"image_{i}.jpg")
                 i += 1
 
-        # 上传视频
-        video_token = None
-        video_path = os.path.join(base_dir, "video.mp4")
-        if os.path.isfile(video_path):
-            video_token = upload_file(video_path, "video.mp4")
+        video_file = "video.mp4" if os.path.isfile(os.path.join(base_dir, "video.mp4")) else None
+
+        upload_started = time.perf_counter()
+        # 图文笔记用 image_0 兜底封面时单独上传一份，不与图片共用 token
+        cover_future = submit_upload(cover_file, reuse=cover_file == "cover.jpg") if cover_file else None
+        image_futures = [submit_upload(name) for name in image_files]
+        video_future = submit_upload(video_file) if video_file else None
+
+        cover_token, cover_seconds = cover_future.result() if cover_future else (None, 0.0)
+        image_results = [future.result() for future in image_futures]
+        # 保持图片顺序，跳过上传失败的图片
+        img_tokens = [token for token, _ in image_results if token]
+        video_token, video_seconds = video_future.result() if video_future else (None, 0.0)
+        timings["upload"] = round(time.perf_counter() - upload_started, 3)
+        timings["cover"] = round(cover_seconds, 3)
+        timings["images"] = [round(seconds, 3) for _, seconds in image_results]
+        timings["video"] = round(video_seconds, 3)
+        timings["pipelined"] = bool(pipeline)
 
         # 组装飞书字段
         fields = {
             '标题': title,
             '笔记链接': note_data.get("作品链接") or "",
-            '笔记ID': note_data.get("作品ID") or "",
+            feishu.FIELD_XHS_NOTE_ID: note_data.get("作品ID") or "",
             '作者': note_data.get("作者昵称") or "",
             '文案': note_data.get("作品描述") or "",
         }
@@ -360,12 +464,17 @@ def upload_note_to_feishu(note_data: Dict[str, Any], access_token: Optional[str]
             ]
 
         # 创建记录
+        record_started = time.perf_counter()
         ok = feishu.create_xhs_record(fields, access_token=access_token)
+        timings["record"] = round(time.perf_counter() - record_started, 3)
+        timings["total"] = round(time.perf_counter() - started, 3)
+        logger.info(f"笔记上传耗时: {timings}")
 
         return {
             "ok": ok,
             "fields": fields,
-            "message": "上传成功" if ok else "上传失败"
+            "message": "上传成功" if ok else "上传失败",
+            "timings": timings,
         }
 
     except Exception as e:
@@ -1,7 +1,26 @@
 import importlib
+import logging
 import os
+import queue
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from types import ModuleType
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 预先创建的 XHS_Apis 实例数量，同时也是并发签名请求的上限
+API_POOL_SIZE = int(os.getenv("XHS_API_POOL_SIZE", "4"))
+# 池中实例全部被占用时的最长等待时间（秒）
+API_POOL_TIMEOUT = float(os.getenv("XHS_API_POOL_TIMEOUT", "30"))
+
+# 导入 Spider_XHS 时需要临时切换工作目录，os.chdir 是进程级的，整个导入过程串行执行
+_import_lock = threading.Lock()
+_resolved: Dict[str, Any] = {}
+_api_pool: Optional["XhsApiPool"] = None
+_pool_lock = threading.Lock()
 
 
 def _try_import(module_name: str) -> ModuleType | None:
@@ -11,79 +30,156 @@ def _try_import(module_name: str) -> ModuleType | None:
         return None
 
 
-def get_xhs_apis_class():
-    """
-    Resolve XHS_Apis class from preferred sources:
-    1) SPIDER_XHS_PATH (local clone/submodule of upstream repo)
-    2) Installed module path `apis.xhs_pc_apis` (if available)
-    """
-    # 1) Env-provided path (e.g., Spider_XHS submodule)
+def _spider_xhs_path() -> Optional[str]:
+    """SPIDER_XHS_PATH，未设置时回退到 project_root/Spider_XHS"""
     path = os.getenv("SPIDER_XHS_PATH")
     if not path:
-        # Fallback: try project_root/Spider_XHS
         current_dir = os.path.dirname(__file__)
         project_root = os.path.abspath(os.path.join(current_dir, ".."))
         submodule_path = os.path.join(project_root, "Spider_XHS")
         if os.path.isdir(submodule_path):
             path = submodule_path
+    return path if path and os.path.isdir(path) else None
 
-    if path and os.path.isdir(path):
-        # Some upstream modules expect CWD to be repo root to load static JS files.
-        # Temporarily chdir into SPIDER_XHS_PATH to import, then restore.
-        old_cwd = os.getcwd()
-        try:
-            if path not in sys.path:
-                sys.path.insert(0, path)
-            os.chdir(path)
-            mod = _try_import("apis.xhs_pc_apis")
-            if mod and hasattr(mod, "XHS_Apis"):
-                return getattr(mod, "XHS_Apis")
-        finally:
-            os.chdir(old_cwd)
 
-    # 2) Try import if installed in sys.path
-    mod = _try_import("apis.xhs_pc_apis")
-    if mod and hasattr(mod, "XHS_Apis"):
-        return getattr(mod, "XHS_Apis")
+def _resolve(module_name: str, attr: str) -> Any:
+    """
+    解析并缓存 Spider_XHS 中的类，进程内只导入一次
+
+    上游模块在导入时按相对路径加载静态 JS 文件，只在首次导入期间切换到仓库根目录；
+    之后的调用直接返回缓存，请求路径上不再 chdir
+    """
+    cache_key = f"{module_name}.{attr}"
+    cached = _resolved.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with _import_lock:
+        cached = _resolved.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # 1) Env-provided path (e.g., Spider_XHS submodule)
+        path = _spider_xhs_path()
+        if path:
+            old_cwd = os.getcwd()
+            try:
+                if path not in sys.path:
+                    sys.path.insert(0, path)
+                os.chdir(path)
+                mod = _try_import(module_name)
+                if mod and hasattr(mod, attr):
+                    _resolved[cache_key] = getattr(mod, attr)
+                    return _resolved[cache_key]
+            finally:
+                os.chdir(old_cwd)
+
+        # 2) Try import if installed in sys.path
+        mod = _try_import(module_name)
+        if mod and hasattr(mod, attr):
+            _resolved[cache_key] = getattr(mod, attr)
+            return _resolved[cache_key]
+    return None
+
+
+def get_xhs_apis_class():
+    """
+    Resolve XHS_Apis class from preferred sources (cached after the first call):
+    1) SPIDER_XHS_PATH (local clone/submodule of upstream repo)
+    2) Installed module path `apis.xhs_pc_apis` (if available)
+    """
+    cls = _resolve("apis.xhs_pc_apis", "XHS_Apis")
+    if cls is not None:
+        return cls
 
     raise ImportError(
         "Unable to import XHS_Apis. Ensure SPIDER_XHS_PATH is set to the Spider_XHS repo, "
         "or that Spider_XHS submodule exists at project root."
     )
 
+
 def get_data_spider_class():
     """
     Resolve Data_Spider from Spider_XHS `main.py` for higher-level helpers like `spider_note`.
     Priority is the same as XHS_Apis: SPIDER_XHS_PATH -> installed.
     """
-    # 1) Env-provided path (e.g., Spider_XHS submodule)
-    path = os.getenv("SPIDER_XHS_PATH")
-    if not path:
-        # Fallback: try project_root/Spider_XHS
-        current_dir = os.path.dirname(__file__)
-        project_root = os.path.abspath(os.path.join(current_dir, ".."))
-        submodule_path = os.path.join(project_root, "Spider_XHS")
-        if os.path.isdir(submodule_path):
-            path = submodule_path
+    cls = _resolve("main", "Data_Spider")
+    if cls is not None:
+        return cls
+
+    raise ImportError(
+        "Unable to import Data_Spider from Spider_XHS. Ensure SPIDER_XHS_PATH is set to the Spider_XHS repo, "
+        "or that Spider_XHS submodule exists at project root."
+    )
+
+
+class XhsApiPool:
+    """预先创建的 XHS_Apis 实例池：请求借用一个已就绪的实例，用完归还"""
 
-    if path and os.path.isdir(path):
-        old_cwd = os.getcwd()
+    def __init__(self, size: int = API_POOL_SIZE):
+        self.size = max(1, size)
+        self._instances: "queue.Queue[Any]" = queue.Queue()
+        api_class = get_xhs_apis_class()
+        with _import_lock:
+            # 实例化可能同样依赖仓库根目录下的静态文件
+            path = _spider_xhs_path()
+            old_cwd = os.getcwd()
+            try:
+                if path:
+                    os.chdir(path)
+                for _ in range(self.size):
+                    self._instances.put(api_class())
+            finally:
+                os.chdir(old_cwd)
+
+    @contextmanager
+    def acquire(self, timeout: float = API_POOL_TIMEOUT) -> Iterator[Any]:
+        try:
+            api = self._instances.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待 XHS_Apis 实例超时（{timeout}s），池大小 {self.size}") from None
         try:
-            if path not in sys.path:
-                sys.path.insert(0, path)
-            os.chdir(path)
-            mod = _try_import("main")
-            if mod and hasattr(mod, "Data_Spider"):
-                return getattr(mod, "Data_Spider")
+            yield api
         finally:
-            os.chdir(old_cwd)
+            self._instances.put(api)
 
-    # 2) Try if installed in sys.path
-    mod = _try_import("main")
-    if mod and hasattr(mod, "Data_Spider"):
-        return getattr(mod, "Data_Spider")
 
-    raise ImportError(
-        "Unable to import Data_Spider from Spider_XHS. Ensure SPIDER_XHS_PATH is set to the Spider_XHS repo, "
-        "or that Spider_XHS submodule exists at project root."
+def get_xhs_api_pool() -> XhsApiPool:
+    """返回进程内共享的 XHS_Apis 实例池（首次调用时创建）"""
+    global _api_pool
+    with _pool_lock:
+        if _api_pool is None:
+            _api_pool = XhsApiPool()
+        return _api_pool
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    启动时预热：导入 XHS_Apis（含签名 JS 加载）并创建实例池
+
+    返回各步骤耗时（秒），同时写入日志
+    """
+    started = time.perf_counter()
+    get_xhs_apis_class()
+    imported = time.perf_counter()
+    get_xhs_api_pool()
+    finished = time.perf_counter()
+    timings = {
+        "import": round(imported - started, 3),
+        "pool": round(finished - imported, 3),
+        "total": round(finished - started, 3),
+    }
+    logger.info(
+        "XHS_Apis 预热完成: 导入 %.3fs，创建 %s 个实例 %.3fs，合计 %.3fs",
+        timings["import"], API_POOL_SIZE, timings["pool"], timings["total"],
     )
+    return timings
+
+
+__all__ = [
+    "get_xhs_apis_class",
+    "get_data_spider_class",
+    "XhsApiPool",
+    "get_xhs_api_pool",
+    "warm_up",
+]
@@ -3,11 +3,12 @@
 支持多种格式的链接解析，统一转换为标准格式
 """
 import re
-import requests
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 import logging
 
+import short_link_resolver
+
 logger = logging.getLogger(__name__)
 
 
@@ -115,6 +116,30 @@ def extract_url_from_text(text: str) -> Optional[str]:
     return text.strip()
 
 
+def extract_note_urls(text: str) -> List[str]:
+    """
+    从一段文本（可能包含多条分享文案）中提取所有小红书链接，保持出现顺序并去重
+
+    没有找到链接时返回 [原始文本]，交由 extract_note_info_from_url 继续处理
+    """
+    import urllib.parse
+    try:
+        decoded_text = urllib.parse.unquote(text)
+    except Exception:
+        decoded_text = text
+
+    pattern = r'https?://(?:www\.)?(?:xiaohongshu\.com|xhslink\.com)/[^\s\u4e00-\u9fff]*'
+    urls: List[str] = []
+    for match in re.findall(pattern, decoded_text):
+        url = match.rstrip('.,;!?。，；！？')
+        if url not in urls:
+            urls.append(url)
+    if urls:
+        return urls
+    stripped = text.strip()
+    return [stripped] if stripped else []
+
+
 def extract_redirect_path(url: str) -> Optional[str]:
     """
     从登录重定向URL中提取redirectPath参数
@@ -203,46 +228,8 @@ def resolve_short_link(short_url: str, cookie: Optional[str] = None, timeout: in
     Returns:
         真实的长链接
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Referer': 'https://www.xiaohongshu.com/',
-        }
-
-        if cookie:
-            headers['Cookie'] = cookie
-
-        # 发送请求，不自动跟随重定向
-        response = requests.get(
-            short_url,
-            headers=headers,
-            allow_redirects=True,  # 自动跟随重定向
-            timeout=timeout
-        )
-
-        # 如果发生了重定向，返回最终URL
-        if response.history:
-            final_url = response.url
-            logger.info(f"短链接重定向: {short_url} -> {final_url}")
-            return final_url
-
-        # 如果没有重定向，检查响应体中是否包含链接
-        if response.status_code == 200:
-            # 尝试从响应中提取链接
-            text = response.text
-            url_match = re.search(r'https://www\.xiaohongshu\.com/[^\s"\'<>]+', text)
-            if url_match:
-                return url_match.group(0)
-
-        logger.warning(f"短链接解析失败，状态码: {response.status_code}")
-        return None
-
-    except requests.exceptions.Timeout:
-        logger.error(f"短链接请求超时: {short_url}")
-        return None
-    except Exception as e:
-        logger.error(f"短链接解析异常: {e}")
-        return None
+    # 逐跳读取 Location，不下载落地页；结果按短码缓存
+    return short_link_resolver.resolve(short_url, cookie=cookie, timeout=timeout)
 
 
 def extract_note_id(url: str) -> Optional[str]: